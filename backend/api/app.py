@@ -2,19 +2,33 @@
 FastAPI application for food necessity prediction
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Optional
+import asyncio
 import sys
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from models.predict import predict_need
+from models.predict import predict_need, predict_need_batch, predict_need_scores
+from models.registry import registry
+from models.cache import prediction_cache
+from models.history import history_index
+from models.raster import SCORES_BY_CODE, need_raster, open_raster
+from models import regional_rates
+from models.timing import stage
+from api.inference import InferencePool
+from api.coalescer import PredictionCoalescer, PREDICT_COALESCE
+from api.metrics import CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, metrics, prediction_batch_size
+from api.timing import REQUEST_TIMING, TimingMiddleware, request_profiler, stage_stats
 import os
 from dotenv import load_dotenv
+import json
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
@@ -28,6 +42,18 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Model inference runs here so it never blocks the event loop
+inference_pool = InferencePool()
+
+# Opt-in micro-batching of concurrent /predict calls (PREDICT_COALESCE=true)
+coalescer = PredictionCoalescer(inference_pool) if PREDICT_COALESCE else None
+
+# Rows scored per chunk by the streaming (NDJSON) endpoints
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '1000'))
+
+# Largest /raster/bbox slice served at once (clients downsample with `step`)
+RASTER_MAX_CELLS = int(os.getenv('RASTER_MAX_CELLS', '250000'))
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,15 +63,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage timings in a Server-Timing header and /debug, plus opt-in profiling
+if REQUEST_TIMING:
+    app.add_middleware(TimingMiddleware)
+
+# Request counts and latency for /metrics (outermost, so it times everything)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Read from the components that own them when /metrics is scraped
+metrics.gauge(
+    'model_info', 'The model being served (always 1)', ('model_version', 'checksum', 'backend'),
+    function=lambda: {
+        (status['model_version'], status['checksum'] or '', status['backend']): 1
+        for status in [registry.status()] if status['model_loaded']
+    },
+)
+metrics.counter(
+    'model_loads_total', 'Models loaded since startup, including reloads',
+    function=lambda: registry.status()['generation'],
+)
+metrics.counter(
+    'model_load_failures_total', 'Failed attempts to load or reload the model',
+    function=lambda: registry.status()['load_failures'],
+)
+metrics.gauge(
+    'model_loaded_timestamp_seconds', 'When the served model was loaded, since the Unix epoch',
+    function=lambda: registry.status()['loaded_at'],
+)
+metrics.gauge(
+    'inference_in_flight', 'Inference jobs running or waiting for a worker',
+    function=lambda: inference_pool.status()['in_flight'],
+)
+metrics.gauge(
+    'inference_capacity', 'Inference jobs admitted at once before requests are rejected',
+    function=lambda: inference_pool.capacity,
+)
+metrics.counter(
+    'inference_rejected_total', 'Requests rejected with a 503 because the inference pool was full',
+    function=lambda: inference_pool.status()['rejected'],
+)
+metrics.counter(
+    'prediction_cache_lookups_total', 'Prediction cache lookups by result', ('result',),
+    function=lambda: {('hit',): prediction_cache.hits, ('miss',): prediction_cache.misses},
+)
+
 class PredictionRequest(BaseModel):
     latitude: float = Field(..., ge=-90, le=90, description="Latitude coordinate")
     longitude: float = Field(..., ge=-180, le=180, description="Longitude coordinate")
     month: Optional[int] = Field(None, ge=1, le=12, description="Month (1-12), defaults to current month")
     food_insecurity_rate: Optional[float] = Field(None, ge=0, le=1, description="Food insecurity rate (0-1)")
     poverty_rate: Optional[float] = Field(None, ge=0, le=1, description="Poverty rate (0-1)")
-    historical_donations: Optional[int] = Field(0, ge=0, description="Number of historical donations")
-    historical_requests: Optional[int] = Field(0, ge=0, description="Number of historical requests")
-    monetary_donations: Optional[int] = Field(0, ge=0, description="Number of monetary donations")
+    historical_donations: Optional[int] = Field(None, ge=0, description="Number of historical donations, counted from collected data if omitted")
+    historical_requests: Optional[int] = Field(None, ge=0, description="Number of historical requests, counted from collected data if omitted")
+    monetary_donations: Optional[int] = Field(None, ge=0, description="Number of monetary donations, counted from collected data if omitted")
     population: Optional[int] = Field(1000, ge=0, description="Population estimate")
 
 class PredictionResponse(BaseModel):
@@ -64,8 +135,8 @@ class LocationInput(BaseModel):
     name: Optional[str] = None
     food_insecurity_rate: Optional[float] = Field(None, ge=0, le=1)
     poverty_rate: Optional[float] = Field(None, ge=0, le=1)
-    historical_donations: Optional[int] = Field(0, ge=0)
-    historical_requests: Optional[int] = Field(0, ge=0)
+    historical_donations: Optional[int] = Field(None, ge=0)
+    historical_requests: Optional[int] = Field(None, ge=0)
     population: Optional[int] = Field(1000, ge=0)
 
 class HighestNeedResponse(BaseModel):
@@ -80,6 +151,20 @@ class HighestNeedResponse(BaseModel):
     poverty_rate: Optional[float] = None
     model_version: str
 
+@app.on_event("startup")
+async def load_model_on_startup():
+    """Load the model once up front so the first request doesn't pay for it"""
+    try:
+        registry.get()
+    except FileNotFoundError:
+        print("Warning: model not found - serving simple predictions until it is trained")
+    if history_index.enabled:
+        history_index.refresh(force=True)
+
+@app.on_event("shutdown")
+async def shutdown_inference_pool():
+    inference_pool.shutdown()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -97,15 +182,31 @@ async def health():
 @app.get("/debug")
 async def debug():
     """Debug endpoint to check model configuration"""
-    from pathlib import Path
-    model_path = Path(__file__).parent.parent / "models" / "food_necessity_model.pkl"
+    # Bundle, or the pickles of a model trained before bundles existed
+    model_path = registry.bundle_path if registry.bundle_path.exists() else registry.model_path
     
     return {
         "model_exists": model_path.exists(),
         "model_path": str(model_path),
-        "status": "ready" if model_path.exists() else "model not found - run train_model.py"
+        "status": "ready" if model_path.exists() else "model not found - run train_model.py",
+        "registry": registry.status(),
+        "prediction_cache": prediction_cache.stats(),
+        "inference_pool": inference_pool.status(),
+        "coalescer": coalescer.status() if coalescer else None,
+        "need_raster": need_raster.status(),
+        "history_index": history_index.status(),
+        "regional_rates": regional_rates.status(),
+        "request_stages": stage_stats.status(),
+        "profiling": request_profiler.status(),
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Request, inference and model metrics in the Prometheus text format"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
     # Default locations to check (major US cities), takhighest likelyhood of food instability from datasets
 DEFAULT_LOCATIONS = [
     {"latitude": 40.7128, "longitude": -74.0060, "name": "New York, NY"},
@@ -125,6 +226,80 @@ DEFAULT_LOCATIONS = [
     {"latitude": 39.7392, "longitude": -104.9903, "name": "Denver, CO"},
 ]
 
+# Batch jobs run entirely on the inference pool, including rendering the
+# JSON body, so large requests don't serialize on the event loop
+
+def _predict_batch_response(requests: list) -> JSONResponse:
+    results = predict_need_batch([req.model_dump() for req in requests])
+    with stage('serialize'):
+        return JSONResponse({"predictions": results})
+
+def _predict_highest(requests: list) -> dict:
+    results = predict_need_batch([req.model_dump() for req in requests])
+    return max(results, key=lambda x: x['predicted_need_score'])
+
+def _predict_highest_all_response(requests: list) -> JSONResponse:
+    results = predict_need_batch([req.model_dump() for req in requests])
+    
+    # Sort by predicted need score (highest first)
+    sorted_results = sorted(results, key=lambda x: x['predicted_need_score'], reverse=True)
+    
+    with stage('serialize'):
+        return JSONResponse({
+            "highest": sorted_results[0],
+            "all_sorted": sorted_results,
+            "total_locations": len(sorted_results)
+        })
+
+# Ranked /highest-need result as ((month, model generation, history index
+# generation), result). The inputs are otherwise constant, so it is computed
+# once per month, model and donation history (at startup and on reload) and
+# served from memory.
+_highest_need = None
+
+# Background hot-reload check started by /highest-need (see below)
+_reload_check = None
+
+async def _check_for_new_model():
+    # On a thread of this process rather than the inference pool: with
+    # INFERENCE_EXECUTOR=process a worker's reload would never reach this
+    # process's registry, so the cache key and its listeners (this cache,
+    # the raster) would stay on the startup model
+    try:
+        await asyncio.to_thread(registry.get)
+    except FileNotFoundError:
+        # No model yet; the next request tries again
+        pass
+
+def _compute_highest_need(month: int) -> dict:
+    """Predict all default locations for a month and return the highest"""
+    # Predict food instability for all default locations in one model call
+    results = predict_need_batch({
+        'latitude': [loc['latitude'] for loc in DEFAULT_LOCATIONS],
+        'longitude': [loc['longitude'] for loc in DEFAULT_LOCATIONS],
+        'month': [month] * len(DEFAULT_LOCATIONS),
+    })
+    
+    for loc, result in zip(DEFAULT_LOCATIONS, results):
+        # Add location name and additional info
+        result['location_name'] = loc['name']
+        result['food_insecurity_rate'] = result.get('features_used', {}).get('food_insecurity_rate')
+        result['poverty_rate'] = result.get('features_used', {}).get('poverty_rate')
+    
+    # Find the location with the highest need score
+    return max(results, key=lambda x: x['predicted_need_score'])
+
+def _precompute_highest_need(loaded=None):
+    """Fill the /highest-need cache for the current month and model"""
+    global _highest_need
+    month = datetime.now().month
+    generation = loaded.generation if loaded is not None else registry.generation
+    _highest_need = ((month, generation, history_index.generation), _compute_highest_need(month))
+
+registry.add_listener(_precompute_highest_need)
+# Rebuild the map raster (in the background) whenever the model changes
+registry.add_listener(need_raster.on_model_loaded)
+
 @app.get("/highest-need", response_model=HighestNeedResponse)
 async def get_highest_need_location():
     """
@@ -133,40 +308,34 @@ async def get_highest_need_location():
     No parameters required. Uses a default set of locations and returns the one
     with the highest predicted food instability score based on today's date/season.
     
-    Uses only the ML model for predictions - no database required.
+    Uses only the ML model for predictions - no database required. The result
+    is cached per month and model version, so repeated calls are served from
+    memory.
     
     Example:
         GET /highest-need
     """
+    global _highest_need, _reload_check
     try:
-        # Predict food instability for each default location
-        results = []
-        current_month = datetime.now().month
+        # registry.generation never loads: a due hot reload happens on a
+        # background thread (in registry.get()), not here on the event loop
+        key = (datetime.now().month, registry.generation, history_index.generation)
+        cached = _highest_need
+        if cached is not None and cached[0] == key:
+            # Served from memory, so nothing here calls registry.get(); check
+            # for a new model in the background when one is due (its listener
+            # refills this cache)
+            if registry.check_due and (_reload_check is None or _reload_check.done()):
+                _reload_check = asyncio.ensure_future(_check_for_new_model())
+            return HighestNeedResponse(**cached[1])
         
-        for loc in DEFAULT_LOCATIONS:
-            result = predict_need(
-                latitude=loc['latitude'],
-                longitude=loc['longitude'],
-                month=current_month,
-                food_insecurity_rate=None,
-                poverty_rate=None,
-                historical_donations=0,
-                historical_requests=0,
-                monetary_donations=0,
-                population=1000
-            )
-            
-            # Add location name and additional info
-            result['location_name'] = loc['name']
-            result['food_insecurity_rate'] = result.get('features_used', {}).get('food_insecurity_rate')
-            result['poverty_rate'] = result.get('features_used', {}).get('poverty_rate')
-            
-            results.append(result)
-        
-        # Find the location with the highest need score
-        highest = max(results, key=lambda x: x['predicted_need_score'])
+        # Month rolled over (or first call before the model loaded)
+        highest = await inference_pool.run(_compute_highest_need, key[0])
+        _highest_need = (key, highest)
         
         return HighestNeedResponse(**highest)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding highest need location: {str(e)}")
 
@@ -181,7 +350,12 @@ async def predict(request: PredictionRequest):
     - 0.6-1.0: High need
     """
     try:
-        result = predict_need(
+        if coalescer is not None:
+            result = await coalescer.predict(request.model_dump())
+            return PredictionResponse(**result)
+        
+        result = await inference_pool.run(
+            predict_need,
             latitude=request.latitude,
             longitude=request.longitude,
             month=request.month,
@@ -194,6 +368,8 @@ async def predict(request: PredictionRequest):
         )
         
         return PredictionResponse(**result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -203,22 +379,10 @@ async def predict_batch(requests: list[PredictionRequest]):
     Predict food necessity for multiple locations
     """
     try:
-        results = []
-        for req in requests:
-            result = predict_need(
-                latitude=req.latitude,
-                longitude=req.longitude,
-                month=req.month,
-                food_insecurity_rate=req.food_insecurity_rate,
-                poverty_rate=req.poverty_rate,
-                historical_donations=req.historical_donations,
-                historical_requests=req.historical_requests,
-                monetary_donations=req.monetary_donations,
-                population=req.population
-            )
-            results.append(result)
-        
-        return {"predictions": results}
+        prediction_batch_size.observe(len(requests), '/predict/batch')
+        return await inference_pool.run(_predict_batch_response, requests)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -234,25 +398,13 @@ async def predict_highest(requests: list[PredictionRequest]):
         if not requests or len(requests) == 0:
             raise HTTPException(status_code=400, detail="At least one location is required")
         
-        results = []
-        for req in requests:
-            result = predict_need(
-                latitude=req.latitude,
-                longitude=req.longitude,
-                month=req.month,
-                food_insecurity_rate=req.food_insecurity_rate,
-                poverty_rate=req.poverty_rate,
-                historical_donations=req.historical_donations,
-                historical_requests=req.historical_requests,
-                monetary_donations=req.monetary_donations,
-                population=req.population
-            )
-            results.append(result)
-        
+        prediction_batch_size.observe(len(requests), '/predict/highest')
         # Find the location with the highest need score
-        highest = max(results, key=lambda x: x['predicted_need_score'])
+        highest = await inference_pool.run(_predict_highest, requests)
         
         return PredictionResponse(**highest)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -268,31 +420,226 @@ async def predict_highest_all(requests: list[PredictionRequest]):
         if not requests or len(requests) == 0:
             raise HTTPException(status_code=400, detail="At least one location is required")
         
-        results = []
-        for req in requests:
-            result = predict_need(
-                latitude=req.latitude,
-                longitude=req.longitude,
-                month=req.month,
-                food_insecurity_rate=req.food_insecurity_rate,
-                poverty_rate=req.poverty_rate,
-                historical_donations=req.historical_donations,
-                historical_requests=req.historical_requests,
-                monetary_donations=req.monetary_donations,
-                population=req.population
+        prediction_batch_size.observe(len(requests), '/predict/highest/all')
+        return await inference_pool.run(_predict_highest_all_response, requests)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _predict_ndjson(requests: list) -> bytes:
+    """Predict a chunk of requests and render it as newline-delimited JSON"""
+    results = predict_need_batch([req.model_dump() for req in requests])
+    with stage('serialize'):
+        return "".join(json.dumps(result, separators=(",", ":")) + "\n" for result in results).encode()
+
+def _rank_requests(requests: list, limit: Optional[int]) -> np.ndarray:
+    """
+    Indices of requests ordered by need score (highest first)
+    
+    Only scores are kept while ranking, and with a limit only the top-k
+    are sorted (argpartition) instead of the full list.
+    """
+    scores = np.concatenate([
+        predict_need_scores([req.model_dump() for req in requests[start:start + STREAM_CHUNK_SIZE]])
+        for start in range(0, len(requests), STREAM_CHUNK_SIZE)
+    ])
+    
+    if limit is not None and limit < len(scores):
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        return top[np.argsort(-scores[top], kind='stable')]
+    return np.argsort(-scores, kind='stable')
+
+@app.post("/predict/batch/stream")
+async def predict_batch_stream(requests: list[PredictionRequest]):
+    """
+    Predict food necessity for many locations as a stream
+    
+    Locations are scored in chunks of STREAM_CHUNK_SIZE and each prediction is
+    written as one line of newline-delimited JSON (application/x-ndjson), in
+    request order, so memory stays flat and clients can start consuming
+    before the whole batch is scored.
+    """
+    try:
+        prediction_batch_size.observe(len(requests), '/predict/batch/stream')
+        # Score the first chunk up front so overload/errors still get a status code
+        first_chunk = await inference_pool.run(_predict_ndjson, requests[:STREAM_CHUNK_SIZE])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def stream():
+        yield first_chunk
+        for start in range(STREAM_CHUNK_SIZE, len(requests), STREAM_CHUNK_SIZE):
+            yield await inference_pool.run_when_free(
+                _predict_ndjson, requests[start:start + STREAM_CHUNK_SIZE]
             )
-            results.append(result)
-        
-        # Sort by predicted need score (highest first)
-        sorted_results = sorted(results, key=lambda x: x['predicted_need_score'], reverse=True)
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/predict/highest/all/stream")
+async def predict_highest_all_stream(
+    requests: list[PredictionRequest],
+    limit: Optional[int] = Query(None, ge=1, description="Only return the top N locations"),
+):
+    """
+    Predict food necessity for many locations and stream them sorted by need
+    
+    Streaming equivalent of /predict/highest/all: one prediction per line of
+    newline-delimited JSON, highest need first. With `limit`, only the top N
+    locations are selected and serialized. The total number of scored
+    locations is returned in the X-Total-Locations header.
+    """
+    try:
+        if not requests or len(requests) == 0:
+            raise HTTPException(status_code=400, detail="At least one location is required")
         
-        return {
-            "highest": sorted_results[0],
-            "all_sorted": sorted_results,
-            "total_locations": len(sorted_results)
-        }
+        prediction_batch_size.observe(len(requests), '/predict/highest/all/stream')
+        order = await inference_pool.run(_rank_requests, requests, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def stream():
+        for start in range(0, len(order), STREAM_CHUNK_SIZE):
+            chunk = [requests[i] for i in order[start:start + STREAM_CHUNK_SIZE]]
+            yield await inference_pool.run_when_free(_predict_ndjson, chunk)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Total-Locations": str(len(requests))},
+    )
+
+def _current_raster():
+    raster = need_raster.get()
+    if raster is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Need raster not built yet - run scripts/build_need_raster.py",
+        )
+    return raster
+
+@app.get("/raster")
+async def raster_info():
+    """
+    Describe the precomputed need raster: bounds, cell size, grid shape and
+    the model it was built from
+    """
+    raster = _current_raster()
+    return {
+        "bounds": {
+            "south": raster.south,
+            "west": raster.west,
+            "north": raster.north,
+            "east": raster.east,
+        },
+        "resolution": raster.resolution,
+        "rows": raster.rows,
+        "cols": raster.cols,
+        "score_levels": raster.metadata['score_levels'],
+        "model_version": raster.metadata['model_version'],
+        "built_at": raster.metadata['built_at'],
+    }
+
+@app.get("/raster/point")
+async def raster_point(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Month (1-12), defaults to current month"),
+):
+    """
+    Precomputed need score of the raster cell containing a point
+    
+    A single array lookup, for map hover/tooltips. Scores are quantized to
+    1/255 and use default inputs (no donation history); use /predict for a
+    full prediction.
+    """
+    raster = _current_raster()
+    month = month or datetime.now().month
+    score = raster.score(latitude, longitude, month)
+    if score is None:
+        raise HTTPException(status_code=404, detail="Location is outside the need raster")
+    return {
+        "predicted_need_score": score,
+        "latitude": latitude,
+        "longitude": longitude,
+        "month": month,
+        "model_version": raster.metadata['model_version'],
+    }
+
+def _raster_bbox_json(path, checksum: str, rows: slice, cols: slice, month: int, step: int) -> JSONResponse:
+    # Reopened by path: the Raster's memory map must not be pickled to a worker process
+    raster = open_raster(path, checksum)
+    codes = raster.codes_in(rows, cols, month, step)
+    return JSONResponse({
+        "month": month,
+        "model_version": raster.metadata['model_version'],
+        "latitudes": np.round(raster.latitudes(rows.start, rows.stop, step), 6).tolist(),
+        "longitudes": np.round(raster.longitudes(cols.start, cols.stop, step), 6).tolist(),
+        "scores": np.round(SCORES_BY_CODE[codes], 4).tolist(),
+    })
+
+@app.get("/raster/bbox")
+async def raster_bbox(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Month (1-12), defaults to current month"),
+    step: int = Query(1, ge=1, description="Return every step-th cell in each direction"),
+    output: str = Query("json", alias="format", pattern="^(json|binary)$"),
+):
+    """
+    Precomputed need scores of the raster cells overlapping a bounding box
+    
+    Served straight from the memory-mapped raster, O(1) per cell. Rows run
+    south to north, columns west to east.
+    
+    - format=json: cell-center `latitudes`, `longitudes` and a
+      rows x cols `scores` matrix
+    - format=binary: the raw uint8 codes (score * 255), row-major, with the
+      grid described by the X-Raster-Shape (rows,cols), X-Raster-Origin
+      (first cell center lat,lng) and X-Raster-Step (degrees) headers
+    
+    At most RASTER_MAX_CELLS cells are returned; zoomed-out views should
+    pass a larger `step`.
+    """
+    if south >= north or west >= east:
+        raise HTTPException(status_code=400, detail="Expected south < north and west < east")
+    raster = _current_raster()
+    window = raster.window(south, west, north, east)
+    if window is None:
+        raise HTTPException(status_code=404, detail="Bounding box is outside the need raster")
+    rows, cols = window
+    shape = (
+        len(range(rows.start, rows.stop, step)),
+        len(range(cols.start, cols.stop, step)),
+    )
+    if shape[0] * shape[1] > RASTER_MAX_CELLS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{shape[0] * shape[1]} cells requested, at most {RASTER_MAX_CELLS}; use a larger step",
+        )
+    month = month or datetime.now().month
+    
+    if output == "json":
+        return await inference_pool.run(_raster_bbox_json, raster.path, raster.checksum, rows, cols, month, step)
+    
+    codes = raster.codes_in(rows, cols, month, step)
+    return Response(
+        content=codes.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Raster-Shape": f"{shape[0]},{shape[1]}",
+            "X-Raster-Origin": f"{raster.latitudes(rows.start)[0]:.6f},{raster.longitudes(cols.start)[0]:.6f}",
+            "X-Raster-Step": f"{raster.resolution * step:g}",
+            "X-Raster-Score-Levels": str(raster.metadata['score_levels']),
+            "X-Model-Version": raster.metadata['model_version'],
+        },
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,132 @@
+"""
+Micro-batching coalescer for single-location /predict calls
+
+Concurrent requests that arrive within a short window are scored together
+with one predict_need_batch call, trading a few milliseconds of latency for
+much higher throughput per core.
+"""
+
+import asyncio
+import os
+
+from api.metrics import prediction_batch_size
+from models.predict import predict_need_batch
+from models.timing import activate, current_timer, stage
+
+PREDICT_COALESCE = os.getenv('PREDICT_COALESCE', 'false').lower() in ('1', 'true', 'yes')
+PREDICT_COALESCE_WINDOW_MS = float(os.getenv('PREDICT_COALESCE_WINDOW_MS', '3'))
+PREDICT_COALESCE_MAX_BATCH = int(os.getenv('PREDICT_COALESCE_MAX_BATCH', '64'))
+
+
+class PredictionCoalescer:
+    """
+    Collects /predict rows for up to `window_ms` (or `max_batch` rows) and
+    runs them as one vectorized model call on the inference pool
+
+    All state is touched only from the event loop thread, so no locking is
+    needed.
+    """
+
+    def __init__(
+        self,
+        inference_pool,
+        window_ms: float = PREDICT_COALESCE_WINDOW_MS,
+        max_batch: int = PREDICT_COALESCE_MAX_BATCH,
+    ):
+        self.inference_pool = inference_pool
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        # Batch size metrics: power-of-two buckets up to max_batch
+        self._bucket_bounds = []
+        bound = 1
+        while bound < self.max_batch:
+            self._bucket_bounds.append(bound)
+            bound *= 2
+        self._bucket_bounds.append(self.max_batch)
+        self._bucket_counts = [0] * len(self._bucket_bounds)
+        self._batches = 0
+        self._rows = 0
+        self._max_seen = 0
+
+    async def predict(self, row: dict) -> dict:
+        """Queue one location and wait for its prediction"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        stage_timer = current_timer()
+        if stage_timer is None:
+            return await future
+        stage_timer.inference_started()
+        with stage('coalesce'):
+            result = await future
+        stage_timer.inference_finished()
+        return result
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self._record(len(batch))
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        # The batch serves many requests; don't time it as part of the one
+        # whose context started this task
+        activate(None)
+        try:
+            results = await self.inference_pool.run(
+                predict_need_batch, [row for row, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # The caller may have disconnected and cancelled its future
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size: int):
+        self._batches += 1
+        self._rows += size
+        self._max_seen = max(self._max_seen, size)
+        for i, bound in enumerate(self._bucket_bounds):
+            if size <= bound:
+                self._bucket_counts[i] += 1
+                break
+        prediction_batch_size.observe(size, '/predict')
+
+    def status(self) -> dict:
+        """Describe settings and achieved batch sizes (used by the /debug endpoint)"""
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'batches': self._batches,
+            'rows': self._rows,
+            'mean_batch_size': self._rows / self._batches if self._batches else 0.0,
+            'max_batch_size': self._max_seen,
+            'batch_size_histogram': {
+                f"le_{bound}": count
+                for bound, count in zip(self._bucket_bounds, self._bucket_counts)
+            },
+        }
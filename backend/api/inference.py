@@ -0,0 +1,168 @@
+"""
+Bounded worker pool for running model inference off the asyncio event loop
+"""
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+
+from api.metrics import inference_duration, inference_wait
+from api.timing import start_profiler, stop_profiler
+from models.timing import StageTimer, activate, current_timer, deactivate
+
+# 'thread' or 'process'
+INFERENCE_EXECUTOR = os.getenv('INFERENCE_EXECUTOR', 'thread')
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', os.cpu_count() or 1))
+# Jobs allowed to wait for a free worker before requests are rejected
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', '32'))
+# Seconds clients are told to wait before retrying a rejected request
+INFERENCE_RETRY_AFTER = int(os.getenv('INFERENCE_RETRY_AFTER', '1'))
+
+
+def _run_job(fn, args: tuple, kwargs: dict, timed: bool, profile: bool) -> tuple:
+    """
+    Run fn(*args, **kwargs) on a worker
+
+    Returns:
+        (result, seconds it took, its stage timings if timed, its cProfile
+        stats if profiled)
+    """
+    timer = StageTimer() if timed else None
+    token = activate(timer)
+    profiler = start_profiler() if profile else None
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        stats = stop_profiler(profiler)
+        deactivate(token)
+    return result, seconds, timer.stages if timer else None, stats
+
+
+class InferencePool:
+    """
+    Runs CPU-bound inference on a thread or process pool
+
+    At most `workers + queue_size` jobs are admitted at once. Beyond that,
+    run() fails fast with a 503 so latency stays bounded under overload and
+    the event loop stays free for /health and other cheap endpoints.
+    """
+
+    def __init__(
+        self,
+        executor: str = INFERENCE_EXECUTOR,
+        workers: int = INFERENCE_WORKERS,
+        queue_size: int = INFERENCE_QUEUE_SIZE,
+    ):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown inference executor: {executor}")
+        self.executor_type = executor
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor: Optional[Executor] = None
+        self._admitted = 0
+        self._rejected = 0
+        self._slot_freed: Optional[asyncio.Event] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so process workers are forked after app startup
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='inference'
+                )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and await its result
+
+        Must be called from the event loop thread; the admission counter
+        relies on that instead of a lock.
+
+        Raises:
+            HTTPException: 503 if the pool and its queue are full
+        """
+        if self._admitted >= self.capacity:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Prediction service is busy, please retry",
+                headers={"Retry-After": str(INFERENCE_RETRY_AFTER)},
+            )
+
+        return await self._submit(fn, *args, **kwargs)
+
+    async def run_when_free(self, fn, *args, **kwargs):
+        """
+        Like run(), but waits for a free slot instead of failing
+
+        Used for the later chunks of a streaming response, where the status
+        line has already been sent and a 503 is no longer possible.
+        """
+        while self._admitted >= self.capacity:
+            if self._slot_freed is None:
+                self._slot_freed = asyncio.Event()
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+        return await self._submit(fn, *args, **kwargs)
+
+    async def _submit(self, fn, *args, **kwargs):
+        self._admitted += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Stage timer of the request being served, if any (api/timing.py)
+            timer = current_timer()
+            if timer is not None:
+                timer.inference_started()
+            start = time.perf_counter()
+            result, seconds, stages, stats = await loop.run_in_executor(
+                self._get_executor(),
+                functools.partial(
+                    _run_job, fn, args, kwargs, timer is not None, timer is not None and timer.profile
+                ),
+            )
+            # Recorded here, on the event loop thread, rather than by the workers
+            job = getattr(fn, '__name__', 'job')
+            wait = max(0.0, time.perf_counter() - start - seconds)
+            inference_duration.observe(seconds, job)
+            inference_wait.observe(wait, job)
+            if timer is not None:
+                timer.add('queue', wait)
+                timer.add('inference', seconds)
+                timer.merge(stages)
+                if stats:
+                    timer.profiles.append(stats)
+                timer.inference_finished()
+            return result
+        finally:
+            self._admitted -= 1
+            if self._slot_freed is not None:
+                self._slot_freed.set()
+
+    def status(self) -> dict:
+        """Describe the pool state (used by the /debug endpoint)"""
+        return {
+            'executor': self.executor_type,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': self._admitted,
+            'rejected': self._rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
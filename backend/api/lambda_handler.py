@@ -3,141 +3,235 @@ AWS Lambda handler for food necessity prediction
 """
 
 import json
+import math
+import os
 import sys
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from models.predict import predict_need
+# Lambda mode: serve the self-contained compiled export (no pickles, no
+# sklearn import) and skip hot-reload checks, since a deploy replaces the
+# container anyway. Both can still be overridden in the function config.
+if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    os.environ.setdefault('INFERENCE_BACKEND', 'compiled')
+    os.environ.setdefault('MODEL_RELOAD_INTERVAL', '-1')
+
+from models.predict import predict_need, predict_need_batch
+from models.registry import registry
+
+# Load the model during module init so warm invocations reuse it
+if os.getenv('LAMBDA_PRELOAD_MODEL', 'true').lower() in ('1', 'true', 'yes'):
+    try:
+        registry.get()
+    except FileNotFoundError:
+        print("Warning: model not found - serving simple predictions")
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+# Allowed range of each numeric input (None = unbounded), as in the API's
+# request models (api/app.py)
+INPUT_RANGES = {
+    'latitude': (-90, 90),
+    'longitude': (-180, 180),
+    'month': (1, 12),
+    'food_insecurity_rate': (0, 1),
+    'poverty_rate': (0, 1),
+    'historical_donations': (0, None),
+    'historical_requests': (0, None),
+    'monetary_donations': (0, None),
+    'population': (0, None),
+}
+INTEGER_INPUTS = {'month', 'historical_donations', 'historical_requests', 'monetary_donations', 'population'}
+
+def _response(status_code: int, body) -> dict:
+    return {
+        'statusCode': status_code,
+        'headers': HEADERS,
+        'body': json.dumps(body)
+    }
+
+def _parse_body(event: dict) -> dict:
+    """Request body of an API Gateway-style event (or the event itself)"""
+    if 'body' in event:
+        return json.loads(event['body']) if isinstance(event['body'], str) else event['body']
+    return event
+
+def _record_body(record: dict) -> dict:
+    """Request body carried by one queue/topic record (SQS, SNS or plain dict)"""
+    if 'Sns' in record:
+        return json.loads(record['Sns']['Message'])
+    return _parse_body(record)
+
+def _validate_location(location: dict) -> dict:
+    """
+    Checked inputs of one location, as predict_need keyword arguments
+    
+    Args:
+        location: one location of a request
+    
+    Returns:
+        dict of the inputs that were given, counts and month as ints
+    
+    Raises:
+        ValueError: if latitude or longitude is missing, a value is not a
+            finite number, not whole where it must be, or out of range
+    """
+    if not isinstance(location, dict):
+        raise ValueError('each location must be an object')
+    if location.get('latitude') is None or location.get('longitude') is None:
+        raise ValueError('latitude and longitude are required')
+    
+    inputs = {}
+    for key, (low, high) in INPUT_RANGES.items():
+        value = location.get(key)
+        if value is None:
+            continue
+        # bool is a subclass of int, but true/false is never a valid input
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f'{key} must be a number')
+        if key in INTEGER_INPUTS:
+            if not float(value).is_integer():
+                raise ValueError(f'{key} must be a whole number')
+            value = int(value)
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ValueError(f'{key} must be between {low} and {high}' if high is not None
+                             else f'{key} must be at least {low}')
+        inputs[key] = value
+    return inputs
+
+def _request_locations(body: dict) -> list:
+    """
+    Locations to score for one request body
+    
+    A single-location request becomes a one-item list.
+    
+    Raises:
+        ValueError: if the body or any of its locations is invalid (see
+            _validate_location)
+    """
+    if not isinstance(body, dict):
+        raise ValueError('request body must be an object')
+    locations = body.get('locations') or [body]
+    if not isinstance(locations, list):
+        raise ValueError('locations must be a list')
+    return [_validate_location(location) for location in locations]
+
+def _result_body(body: dict, results: list):
+    """Response body for one request, given its predictions in input order"""
+    # Single location prediction
+    if not body.get('locations'):
+        return results[0]
+    
+    endpoint = body.get('endpoint', 'predict')  # 'predict', 'batch', 'highest'
+    
+    # Return highest if requested
+    if endpoint == 'highest':
+        return max(results, key=lambda x: x['predicted_need_score'])
+    
+    # Return all results sorted by need (highest first)
+    if endpoint == 'highest/all':
+        sorted_results = sorted(results, key=lambda x: x['predicted_need_score'], reverse=True)
+        return {
+            'highest': sorted_results[0],
+            'all_sorted': sorted_results,
+            'total_locations': len(sorted_results)
+        }
+    
+    # Return all results
+    return {
+        'predictions': results
+    }
+
+def _handle_records(records: list) -> dict:
+    """
+    Score every location of every record in one vectorized pass
+    
+    Records are parsed and every location validated individually before
+    the model call, so one malformed record only fails itself (with a 400).
+    If scoring itself fails, every valid record gets a 500. Failed records'
+    messageIds (when present) are reported in batchItemFailures for SQS
+    partial batch responses, so only they are retried.
+    """
+    requests = []  # (record index, body, first location index, location count)
+    record_results = [None] * len(records)
+    locations = []
+    
+    for i, record in enumerate(records):
+        try:
+            body = _record_body(record)
+            record_locations = _request_locations(body)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            record_results[i] = {'statusCode': 400, 'body': {'error': str(e)}}
+            continue
+        requests.append((i, body, len(locations), len(record_locations)))
+        locations.extend(record_locations)
+    
+    try:
+        results = predict_need_batch(locations)
+    except Exception as e:
+        results = None
+        error = str(e)
+    
+    for i, body, start, count in requests:
+        if results is None:
+            record_results[i] = {'statusCode': 500, 'body': {'error': error}}
+            continue
+        record_results[i] = {
+            'statusCode': 200,
+            'body': _result_body(body, results[start:start + count])
+        }
+    
+    failures = []
+    for record, result in zip(records, record_results):
+        if 'messageId' in record:
+            result['messageId'] = record['messageId']
+            if result['statusCode'] != 200:
+                failures.append({'itemIdentifier': record['messageId']})
+    
+    response = _response(200, {
+        'results': record_results,
+        'total_records': len(records),
+        'total_locations': len(locations)
+    })
+    response['batchItemFailures'] = failures
+    return response
 
 def lambda_handler(event, context):
     """
     AWS Lambda handler function
     Supports single prediction, batch prediction, and finding highest need location
+    
+    Events with a `Records` array (SQS/SNS triggers) may carry any of those
+    requests per record; all their locations are scored with one model call
+    and the responses are returned per record, in order.
     """
     try:
-        # Parse request
-        if 'body' in event:
-            body = json.loads(event['body']) if isinstance(event['body'], str) else event['body']
-        else:
-            body = event
+        if 'Records' in event:
+            return _handle_records(event['Records'])
         
-        # Check if this is a batch request (list of locations)
-        locations = body.get('locations', [])
-        endpoint = body.get('endpoint', 'predict')  # 'predict', 'batch', 'highest'
+        # Parse and validate request
+        body = _parse_body(event)
+        try:
+            locations = _request_locations(body)
+        except ValueError as e:
+            return _response(400, {
+                'error': str(e)
+            })
         
         # Single location prediction
-        if not locations:
-            latitude = body.get('latitude')
-            longitude = body.get('longitude')
-            month = body.get('month')
-            food_insecurity_rate = body.get('food_insecurity_rate')
-            poverty_rate = body.get('poverty_rate')
-            historical_donations = body.get('historical_donations', 0)
-            historical_requests = body.get('historical_requests', 0)
-            monetary_donations = body.get('monetary_donations', 0)
-            population = body.get('population', 1000)
-            
-            if latitude is None or longitude is None:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'error': 'latitude and longitude are required'
-                    })
-                }
-            
-            # Make prediction
-            result = predict_need(
-                latitude=latitude,
-                longitude=longitude,
-                month=month,
-                food_insecurity_rate=food_insecurity_rate,
-                poverty_rate=poverty_rate,
-                historical_donations=historical_donations,
-                historical_requests=historical_requests,
-                monetary_donations=monetary_donations,
-                population=population
-            )
-            
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps(result)
-            }
-        
-        # Batch prediction
-        results = []
-        for loc in locations:
-            result = predict_need(
-                latitude=loc.get('latitude'),
-                longitude=loc.get('longitude'),
-                month=loc.get('month'),
-                food_insecurity_rate=loc.get('food_insecurity_rate'),
-                poverty_rate=loc.get('poverty_rate'),
-                historical_donations=loc.get('historical_donations', 0),
-                historical_requests=loc.get('historical_requests', 0),
-                monetary_donations=loc.get('monetary_donations', 0),
-                population=loc.get('population', 1000)
-            )
-            results.append(result)
-        
-        # Return highest if requested
-        if endpoint == 'highest':
-            highest = max(results, key=lambda x: x['predicted_need_score'])
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps(highest)
-            }
-        
-        # Return all results sorted by need (highest first)
-        if endpoint == 'highest/all':
-            sorted_results = sorted(results, key=lambda x: x['predicted_need_score'], reverse=True)
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'highest': sorted_results[0],
-                    'all_sorted': sorted_results,
-                    'total_locations': len(sorted_results)
-                })
-            }
+        if not body.get('locations'):
+            return _response(200, predict_need(**locations[0]))
         
-        # Return all results
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'predictions': results
-            })
-        }
+        # Batch prediction (one vectorized model call for all locations)
+        results = predict_need_batch(locations)
+        return _response(200, _result_body(body, results))
     
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
-
+        return _response(500, {
+            'error': str(e)
+        })
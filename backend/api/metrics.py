@@ -0,0 +1,258 @@
+"""
+Prometheus-style metrics for the prediction API, served at /metrics
+
+A small dependency-free implementation of counters, gauges and histograms
+and of the Prometheus text exposition format. Recording a value is a dict
+lookup and an addition. Everything is recorded from the event loop thread
+(the ASGI middleware, the inference pool's await points and the request
+handlers), so no locks are needed; values owned by other components (the
+model registry, the prediction cache) are read only when /metrics is
+scraped.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Seconds; the small buckets cover cached and coalesced /predict calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1000, 2500, 5000, 10000, 50000)
+
+# Starlette appends the charset
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [
+        name + '="' + str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(float(value))
+    return str(int(value))
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), function: Optional[Callable] = None):
+        """
+        Args:
+            name: metric name
+            help: one-line description
+            labels: label names; values are passed positionally when recording
+            function: called at scrape time instead of recording values; returns
+                a number (no labels) or a dict of label-value tuples to numbers
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.function = function
+        self.values = {}
+
+    def _current(self) -> dict:
+        if self.function is None:
+            return self.values
+        value = self.function()
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self._current().items():
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count"""
+
+    type = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down"""
+
+    type = 'gauge'
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            # Per-bucket counts (the last one is +Inf) and the running sum
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics exported by this process, in registration order"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = (), function: Optional[Callable] = None) -> Counter:
+        return self._add(Counter(name, help, labels, function))
+
+    def gauge(self, name: str, help: str, labels: tuple = (), function: Optional[Callable] = None) -> Gauge:
+        return self._add(Gauge(name, help, labels, function))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken scrape-time function shouldn't hide every other metric
+                print(f"Error collecting metric {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every importer in this process
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by method, route and status code',
+    ('method', 'route', 'status'),
+)
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Time from receiving a request to sending the last byte of its response',
+    ('method', 'route'),
+)
+http_requests_in_flight = metrics.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled',
+)
+inference_duration = metrics.histogram(
+    'inference_duration_seconds', 'Time spent running a job on an inference worker',
+    ('job',),
+)
+inference_wait = metrics.histogram(
+    'inference_wait_seconds', 'Time a job spent waiting for and handing off to an inference worker',
+    ('job',),
+)
+prediction_batch_size = metrics.histogram(
+    'prediction_batch_size', 'Locations scored per batch, by endpoint',
+    ('endpoint',), buckets=BATCH_SIZE_BUCKETS,
+)
+process_start_time = metrics.gauge(
+    'process_start_time_seconds', 'Start time of the process since the Unix epoch',
+)
+process_start_time.set(time.time())
+
+
+# Endpoint function -> route template
+_route_templates = {}
+
+def route_template(scope) -> str:
+    """
+    Route template (e.g. /raster/point) of a handled request, for labels
+
+    Raw paths would give an unbounded number of series; paths that match no
+    route are labelled "unmatched".
+    """
+    # The router stores the matched endpoint in the (shared) scope
+    endpoint = scope.get('endpoint')
+    if endpoint is None:
+        return 'unmatched'
+    route = _route_templates.get(endpoint)
+    if route is None:
+        app = scope.get('app')
+        route = next(
+            (r.path for r in getattr(app, 'routes', ()) if getattr(r, 'endpoint', None) is endpoint),
+            'unmatched',
+        )
+        _route_templates[endpoint] = route
+    return route
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency and in-flight
+    requests, labelled by route template
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            route = route_template(scope)
+            http_requests.inc(scope['method'], route, status)
+            http_request_duration.observe(duration, scope['method'], route)
@@ -0,0 +1,282 @@
+"""
+Per-request stage timing and opt-in profiling
+
+TimingMiddleware starts a StageTimer (models/timing.py) for every request
+and returns the stages in a Server-Timing header (milliseconds, shown by
+browser dev tools); /debug aggregates them per route. The stages are:
+- validate: parsing and validating the request body, from the last body
+  byte received until the first inference job
+- queue: waiting for an inference worker
+- inference: time on the worker, of which
+  - features: input defaults, regional rates, historical counts and the
+    feature matrix
+  - model: model.predict
+  - serialize: building the response (on the worker for the batch endpoints)
+- serialize: building the response on the event loop, after the last job
+- coalesce: a coalesced /predict call waiting for its batch to be scored
+- total: until the response headers are sent
+
+Streaming responses send their headers after the first chunk, so later
+chunks only show up in the /debug totals.
+
+Profiling is opt-in: a PROFILE_SAMPLE_RATE fraction of requests, or any
+request with an `X-Profile` header equal to PROFILE_TOKEN, runs under
+cProfile (on the event loop and on the inference workers it uses). The
+hot spots are saved to PROFILE_DIR as text, with a .prof file for pstats
+or snakeviz, and the most recent are listed in /debug.
+"""
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from api.metrics import route_template
+from models.timing import StageTimer, activate, deactivate
+
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'true').lower() in ('1', 'true', 'yes')
+# Fraction of requests to profile (0 = only on request, see PROFILE_TOKEN)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+# Requests with an `X-Profile: <token>` header are profiled (unset = header ignored)
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', Path(__file__).parent.parent / "profiles"))
+# Functions listed per saved profile, and saved profiles kept
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '25'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+
+# Builtins where a profiled thread waits rather than works (the event loop
+# polling for I/O while a worker scores), left out of the /debug hot spots
+IDLE_FUNCTIONS = (
+    "<method 'poll' of", "<method 'select' of", "<method 'control' of",
+    "<method 'acquire' of '_thread.lock'",
+)
+
+
+def server_timing(stages: dict) -> str:
+    """Server-Timing header value for stage durations in seconds"""
+    return ', '.join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items())
+
+
+def start_profiler() -> Optional[cProfile.Profile]:
+    """A running cProfile profiler for the calling thread, or None if one can't be started"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows only one active profiler per process
+        return None
+    return profiler
+
+
+def stop_profiler(profiler: Optional[cProfile.Profile]) -> Optional[dict]:
+    """Stop a profiler and return its raw stats (plain data, so it can leave a worker process)"""
+    if profiler is None:
+        return None
+    profiler.disable()
+    profiler.create_stats()
+    return profiler.stats or None
+
+
+class _RawStats:
+    """Adapts raw profiler stats to what pstats.Stats loads"""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class StageStats:
+    """Per-route totals of each stage (used by the /debug endpoint)"""
+
+    def __init__(self):
+        # route -> [requests, {stage: [requests, total seconds, max seconds]}]
+        self._routes = {}
+
+    def record(self, route: str, stages: dict):
+        totals = self._routes.get(route)
+        if totals is None:
+            totals = self._routes[route] = [0, {}]
+        totals[0] += 1
+        for name, seconds in stages.items():
+            entry = totals[1].get(name)
+            if entry is None:
+                entry = totals[1][name] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def status(self) -> dict:
+        return {
+            route: {
+                'requests': requests,
+                'stages_ms': {
+                    name: {
+                        'requests': count,
+                        'mean': round(total / count * 1000, 3),
+                        'max': round(longest * 1000, 3),
+                    }
+                    for name, (count, total, longest) in stages.items()
+                },
+            }
+            for route, (requests, stages) in self._routes.items()
+        }
+
+
+class RequestProfiler:
+    """Chooses requests to profile and saves their hot spots"""
+
+    def __init__(
+        self,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        token: str = PROFILE_TOKEN,
+        directory: Path = PROFILE_DIR,
+        top: int = PROFILE_TOP,
+        keep: int = PROFILE_KEEP,
+    ):
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+        self.directory = Path(directory)
+        self.top = top
+        self.keep = keep
+        self.saved = 0
+        self.recent = deque(maxlen=10)
+        # cProfile hooks the whole event loop thread, so one request at a time
+        self._loop_profiling = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.token)
+
+    def wanted(self, scope) -> bool:
+        if self.token:
+            for name, value in scope['headers']:
+                if name == b'x-profile' and value == self.token:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start_loop(self) -> Optional[cProfile.Profile]:
+        if self._loop_profiling:
+            return None
+        profiler = start_profiler()
+        self._loop_profiling = profiler is not None
+        return profiler
+
+    def stop_loop(self, profiler: Optional[cProfile.Profile]) -> Optional[dict]:
+        if profiler is None:
+            return None
+        self._loop_profiling = False
+        return stop_profiler(profiler)
+
+    def save(self, method: str, route: str, stages: dict, profiles: list):
+        """Write the combined profiles of one request to PROFILE_DIR (runs off the event loop)"""
+        profiles = [_RawStats(stats) for stats in profiles if stats]
+        if not profiles:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{method.lower()}{route.replace('/', '_')}"
+            path = self.directory / f"{name}.txt"
+
+            output = io.StringIO()
+            stats = pstats.Stats(*profiles, stream=output)
+            stats.dump_stats(self.directory / f"{name}.prof")
+            output.write(f"{method} {route}\nServer-Timing: {server_timing(stages)}\n")
+            stats.sort_stats('tottime').print_stats(self.top)
+            stats.sort_stats('cumulative').print_stats(self.top)
+            path.write_text(output.getvalue())
+
+            busy = [
+                item for item in stats.stats.items()
+                if not (item[0][0] == '~' and item[0][2].startswith(IDLE_FUNCTIONS))
+            ]
+            hot_spots = sorted(busy, key=lambda item: item[1][2], reverse=True)[:5]
+            self.recent.append({
+                'path': str(path),
+                'route': f"{method} {route}",
+                'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()},
+                'hot_spots': [
+                    f"{Path(file).name}:{line}({function}) {own * 1000:.1f}ms"
+                    for (file, line, function), (_, _, own, _, _) in hot_spots
+                ],
+            })
+            self.saved += 1
+            self._prune()
+        except Exception as e:
+            print(f"Error saving request profile: {e}")
+
+    def _prune(self):
+        saved = sorted(self.directory.glob("*.txt"))
+        for path in saved[:max(0, len(saved) - self.keep)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.prof').unlink(missing_ok=True)
+
+    def status(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'header': bool(self.token),
+            'directory': str(self.directory),
+            'saved': self.saved,
+            'recent': list(self.recent),
+        }
+
+
+# Shared by every importer in this process
+stage_stats = StageStats()
+request_profiler = RequestProfiler()
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware timing the stages of each request (see the module docstring)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer(profile=request_profiler.enabled and request_profiler.wanted(scope))
+        token = activate(timer)
+        loop_profiler = request_profiler.start_loop() if timer.profile else None
+
+        async def receive_with_timing():
+            message = await receive()
+            if message['type'] == 'http.request' and not message.get('more_body', False):
+                timer.received = time.perf_counter()
+            return message
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                now = time.perf_counter()
+                if timer.mark is not None:
+                    timer.add('serialize', now - timer.mark)
+                timer.stages['total'] = now - timer.start
+                message = dict(message, headers=[
+                    *message.get('headers', ()),
+                    (b'server-timing', server_timing(timer.stages).encode()),
+                ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_timing, send_with_timing)
+        finally:
+            deactivate(token)
+            route = route_template(scope)
+            stage_stats.record(route, timer.stages)
+            if timer.profile:
+                profiles = [request_profiler.stop_loop(loop_profiler), *timer.profiles]
+                asyncio.get_running_loop().run_in_executor(
+                    None, request_profiler.save, scope['method'], route, dict(timer.stages), profiles
+                )
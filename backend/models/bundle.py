@@ -0,0 +1,214 @@
+"""
+Single-file, versioned model bundle
+
+Everything needed to serve a trained model lives in one file: the native
+model (pickled), the compiled ensemble arrays, feature_columns, the season
+classes, metrics and version. Layout:
+
+    MAGIC | header length (uint64) | JSON header | arrays...
+
+The header holds the metadata and the dtype, shape, offset and SHA-256 of
+every array; the bundle checksum is the SHA-256 of those. Arrays start on
+64-byte boundaries, so loading maps the file read-only and returns NumPy
+views of it instead of copies: workers serving the same bundle share its
+pages through the OS page cache. Only the native model is unpickled into private
+memory, and only if the inference backend needs it.
+
+save_bundle writes a temporary file next to the target and renames it into
+place, so readers see either the previous bundle or the new one, never a
+mix of both. The layout itself (write_arrays/map_arrays) works for any
+named arrays and is also used for the need raster (models/raster.py).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+from models.compiled import CompiledEnsemble
+
+MAGIC = b'PTPMODEL'
+BUNDLE_FORMAT = 1
+ALIGNMENT = 64
+
+# CompiledEnsemble constructor arguments stored in the header
+_COMPILED_PARAMS = ['max_depth', 'base_score', 'scale', 'strict', 'n_features', 'model_type']
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _bundle_checksum(layout: dict) -> str:
+    digest = hashlib.sha256()
+    for name, spec in layout.items():
+        digest.update(f"{name}:{spec['sha256']}".encode())
+    return digest.hexdigest()
+
+
+class ModelBundle:
+    """
+    A loaded bundle; arrays are read-only views of the mapped file
+
+    Each array is checked against its checksum the first time it is used,
+    so serving the compiled ensemble never reads the pickled native model.
+    """
+
+    def __init__(self, path: Path, metadata: dict, arrays: dict, layout: dict,
+                 checksum: str, verify: bool = True):
+        self.path = path
+        self.metadata = metadata
+        self.arrays = arrays
+        self.layout = layout
+        self.checksum = checksum
+        self.verify = verify
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Raises:
+            ValueError: if the array fails its checksum
+        """
+        array = self.arrays[name]
+        if self.verify and hashlib.sha256(array.data).hexdigest() != self.layout[name]['sha256']:
+            raise ValueError(f"Model bundle checksum mismatch in '{name}': {self.path}")
+        return array
+
+    def compiled(self) -> CompiledEnsemble:
+        """The compiled ensemble, backed by the mapped arrays"""
+        arrays = {
+            name[len('compiled.'):]: self.array(name)
+            for name in self.arrays
+            if name.startswith('compiled.')
+        }
+        return CompiledEnsemble(**arrays, **self.metadata['compiled'], metadata=self.metadata)
+
+    def load_model(self):
+        """Unpickle the native (sklearn/XGBoost) model"""
+        return pickle.loads(self.array('native_model'))
+
+
+def write_arrays(path: Path, arrays: dict, metadata: dict) -> str:
+    """
+    Atomically write named arrays and JSON metadata in the bundle layout
+
+    Also used for other large artifacts served by memory-mapping (see
+    models/raster.py).
+
+    Returns:
+        the file's checksum
+    """
+    path = Path(path)
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = arrays[name] = np.ascontiguousarray(array)
+        layout[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'sha256': hashlib.sha256(array.data).hexdigest(),
+        }
+        offset = _aligned(offset + array.nbytes)
+    checksum = _bundle_checksum(layout)
+
+    header = json.dumps({
+        'format': BUNDLE_FORMAT,
+        'metadata': metadata,
+        'arrays': layout,
+        'sha256': checksum,
+    }).encode()
+    prefix = MAGIC + len(header).to_bytes(8, 'little') + header
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(prefix + b'\0' * (_aligned(len(prefix)) - len(prefix)))
+            for array in arrays.values():
+                f.write(array.data)
+                f.write(b'\0' * (_aligned(array.nbytes) - array.nbytes))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    return checksum
+
+
+def save_bundle(path: Path, model, compiled: CompiledEnsemble, metadata: dict) -> str:
+    """
+    Atomically write a bundle
+
+    Args:
+        model: the fitted native model (pickled into the bundle)
+        compiled: its compile_ensemble() export
+        metadata: JSON-serializable serving metadata (feature_columns,
+            season_classes, metrics, model_version, ...)
+
+    Returns:
+        the bundle's SHA-256 checksum
+    """
+    compiled_arrays = compiled.to_arrays()
+    arrays = {f'compiled.{name}': compiled_arrays[name]
+              for name in ['feature', 'threshold', 'left', 'right', 'value', 'roots', 'children']}
+    arrays['native_model'] = np.frombuffer(pickle.dumps(model, protocol=5), dtype=np.uint8)
+    metadata = dict(metadata, compiled={name: getattr(compiled, name) for name in _COMPILED_PARAMS})
+    return write_arrays(path, arrays, metadata)
+
+
+def map_arrays(path: Path, verify: bool = True) -> ModelBundle:
+    """
+    Map a file written by write_arrays into memory
+
+    Args:
+        verify: check the checksums (of each array when it is first used)
+
+    Raises:
+        FileNotFoundError: if the file does not exist
+        ValueError: if it is not in the bundle layout, has an unsupported
+            format or fails the checksum
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a model bundle: {path}")
+    header_start = len(MAGIC) + 8
+    header_length = int.from_bytes(buffer[len(MAGIC):header_start], 'little')
+    header = json.loads(buffer[header_start:header_start + header_length])
+    if header['format'] != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported model bundle format {header['format']}: {path}")
+
+    data_start = _aligned(header_start + header_length)
+    if verify and _bundle_checksum(header['arrays']) != header['sha256']:
+        raise ValueError(f"Model bundle checksum mismatch: {path}")
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset'])
+        arrays[name] = array.reshape(spec['shape'])
+
+    return ModelBundle(path, header['metadata'], arrays, header['arrays'], header['sha256'], verify)
+
+
+def load_bundle(path: Path, verify: bool = True) -> ModelBundle:
+    """
+    Map a model bundle into memory
+
+    Args:
+        verify: check the checksums (of each array when it is first used)
+
+    Raises:
+        FileNotFoundError: if the bundle does not exist
+        ValueError: if it is not a bundle, has an unsupported format or
+            fails the checksum
+    """
+    return map_arrays(path, verify)
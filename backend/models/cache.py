@@ -0,0 +1,125 @@
+"""
+Bounded LRU/TTL cache of model need scores
+
+Keys are the full feature tuple plus the model generation, so a reloaded
+model never serves stale scores. Coordinates are keyed exactly unless
+PREDICTION_CACHE_PRECISION is set.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# Maximum number of cached scores; 0 disables the cache
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '10000'))
+# Seconds a cached score stays valid
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+# Decimal places coordinates are rounded to before scoring and caching
+# (e.g. 6 = ~0.1 m; unset = exact coordinates)
+PREDICTION_CACHE_PRECISION = (
+    int(os.getenv('PREDICTION_CACHE_PRECISION')) if os.getenv('PREDICTION_CACHE_PRECISION') else None
+)
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with per-entry TTL
+
+    Only the clamped need score is stored; callers rebuild the response from
+    their own inputs. By default coordinates are keyed exactly, so a hit is
+    byte-identical to an uncached call. With a precision, callers score the
+    quantized coordinates as well as keying on them: nearby locations then
+    share entries, and a hit still equals recomputing that entry.
+    """
+
+    def __init__(
+        self,
+        max_size: int = PREDICTION_CACHE_SIZE,
+        ttl: float = PREDICTION_CACHE_TTL,
+        precision: Optional[int] = PREDICTION_CACHE_PRECISION,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.precision = precision
+
+        self._entries = OrderedDict()  # key -> (need_score, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def quantize(self, values):
+        """Round coordinates (scalar or array) to the cache precision, if any"""
+        if self.precision is None:
+            return values
+        return np.round(values, self.precision)
+
+    def get_many(self, keys: list) -> list:
+        """Look up scores for keys, returning None for each miss"""
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[0])
+        return results
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def put_many(self, keys: list, scores: list):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._entries[key] = (score, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key, score: float):
+        self.put_many([key], [score])
+
+    def clear(self, *args):
+        """Drop all entries (also used as a model reload listener)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for sizing the cache (used by the /debug endpoint)"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'precision': self.precision,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+# Shared by every importer in this process
+prediction_cache = PredictionCache()
@@ -0,0 +1,305 @@
+"""
+Flat-array representation of the trained tree ensemble
+
+compile_ensemble() flattens a RandomForest, GradientBoosting or XGBoost
+regressor into contiguous per-node arrays (feature index, threshold,
+children, leaf value). CompiledEnsemble.predict() evaluates all trees for a
+batch of rows with plain NumPy, avoiding the per-call overhead of the
+original framework.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+# Rows evaluated at once; small chunks keep the (rows x trees) node index
+# matrix in cache
+PREDICT_CHUNK_ROWS = 256
+
+
+class CompiledEnsemble:
+    """
+    A tree ensemble as flat node arrays
+
+    Every tree lives in the same arrays; `roots` holds the index of each
+    tree's root node. Leaves point to themselves with an infinite threshold,
+    so evaluation is a fixed number of branch-free steps:
+
+        node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+
+    (`<` instead of `<=` for XGBoost), done as flat `take` gathers over all
+    rows and trees at once. The prediction is
+    `base_score + scale * sum(value[leaf] for each tree)`.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        base_score: float,
+        scale: float,
+        strict: bool,
+        n_features: int,
+        model_type: str,
+        metadata: dict = None,
+        children: np.ndarray = None,
+    ):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.base_score = float(base_score)
+        self.scale = float(scale)
+        self.strict = bool(strict)
+        self.n_features = int(n_features)
+        self.model_type = model_type
+        # JSON-serializable serving metadata (feature_columns, season_classes,
+        # model_version, ...) so the export can be served on its own
+        self.metadata = metadata
+        # Interleaved [left, right] pairs, indexed by 2 * node + went_right
+        if children is None:
+            children = np.stack([self.left, self.right], axis=1).ravel()
+        self._children = np.ascontiguousarray(children, dtype=np.int32)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict(self, X) -> np.ndarray:
+        """Predict a 2D array of rows (columns in training order)"""
+        # Both sklearn and XGBoost compare features as float32
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected rows with {self.n_features} features, got shape {X.shape}")
+
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            chunk = X[start:start + PREDICT_CHUNK_ROWS]
+            out[start:start + len(chunk)] = self._predict_chunk(chunk)
+        return out
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        # Offset of each row in the flattened X
+        row_offsets = (np.arange(len(X), dtype=np.int32) * self.n_features)[:, None]
+        flat_X = X.ravel()
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            threshold = self.threshold.take(nodes)
+            went_right = x >= threshold if self.strict else x > threshold
+            nodes = self._children.take(2 * nodes + went_right)
+
+        return self.base_score + self.scale * self.value.take(nodes).sum(axis=1)
+
+    def to_arrays(self) -> dict:
+        """Arrays and scalars needed to rebuild the ensemble"""
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'roots': self.roots,
+            'children': self._children,
+            'max_depth': np.int64(self.max_depth),
+            'base_score': np.float64(self.base_score),
+            'scale': np.float64(self.scale),
+            'strict': np.bool_(self.strict),
+            'n_features': np.int64(self.n_features),
+            'model_type': np.str_(self.model_type),
+            'metadata_json': np.str_(json.dumps(self.metadata)),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'CompiledEnsemble':
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            value=arrays['value'],
+            roots=arrays['roots'],
+            max_depth=int(arrays['max_depth']),
+            base_score=float(arrays['base_score']),
+            scale=float(arrays['scale']),
+            strict=bool(arrays['strict']),
+            n_features=int(arrays['n_features']),
+            model_type=str(arrays['model_type']),
+            metadata=json.loads(str(arrays['metadata_json'])) if 'metadata_json' in arrays else None,
+            children=arrays['children'] if 'children' in arrays else None,
+        )
+
+    def save(self, path: Path):
+        """Write the ensemble as an uncompressed .npz file"""
+        with open(path, 'wb') as f:
+            np.savez(f, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path: Path) -> 'CompiledEnsemble':
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls.from_arrays(arrays)
+
+
+class HybridEnsemble:
+    """
+    Serves small batches with the compiled ensemble and large ones with the
+    native model, which has more per-call overhead but is faster per row
+    """
+
+    def __init__(self, native, compiled: CompiledEnsemble, max_rows: int):
+        self.native = native
+        self.compiled = compiled
+        self.max_rows = max_rows
+
+    def predict(self, X) -> np.ndarray:
+        if len(X) <= self.max_rows:
+            return self.compiled.predict(X)
+        return self.native.predict(X)
+
+
+class _TreeArrays:
+    """Accumulates trees into the flat node arrays"""
+
+    def __init__(self):
+        self.feature, self.threshold = [], []
+        self.left, self.right, self.value = [], [], []
+        self.roots = []
+        self.max_depth = 0
+        self.n_nodes = 0
+
+    def add_tree(self, feature, threshold, left, right, value, depth):
+        """Append one tree; child indices are local, -1 marks a leaf"""
+        offset = self.n_nodes
+        feature = np.asarray(feature, dtype=np.int64)
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        is_leaf = left < 0
+        local = np.arange(len(feature))
+
+        self.feature.append(np.where(is_leaf, 0, feature))
+        self.threshold.append(np.where(is_leaf, np.inf, threshold))
+        self.left.append(np.where(is_leaf, local, left) + offset)
+        self.right.append(np.where(is_leaf, local, right) + offset)
+        self.value.append(np.where(is_leaf, value, 0.0))
+        self.roots.append(offset)
+        self.max_depth = max(self.max_depth, depth)
+        self.n_nodes += len(feature)
+
+    def build(self, **params) -> CompiledEnsemble:
+        return CompiledEnsemble(
+            feature=np.concatenate(self.feature),
+            threshold=np.concatenate(self.threshold),
+            left=np.concatenate(self.left),
+            right=np.concatenate(self.right),
+            value=np.concatenate(self.value),
+            roots=np.array(self.roots),
+            max_depth=self.max_depth,
+            **params,
+        )
+
+
+def _add_sklearn_tree(trees: _TreeArrays, estimator):
+    tree = estimator.tree_
+    trees.add_tree(
+        feature=tree.feature,
+        threshold=tree.threshold,
+        left=tree.children_left,
+        right=tree.children_right,
+        value=tree.value[:, 0, 0],
+        depth=tree.max_depth,
+    )
+
+
+def _xgb_tree_depth(left, right) -> int:
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c >= 0]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def compile_ensemble(model) -> CompiledEnsemble:
+    """
+    Flatten a fitted RandomForestRegressor, GradientBoostingRegressor or
+    XGBRegressor into a CompiledEnsemble
+
+    Raises:
+        TypeError: for any other model type
+    """
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+    trees = _TreeArrays()
+
+    if isinstance(model, RandomForestRegressor):
+        for estimator in model.estimators_:
+            _add_sklearn_tree(trees, estimator)
+        return trees.build(
+            base_score=0.0,
+            scale=1.0 / len(model.estimators_),
+            strict=False,
+            n_features=model.n_features_in_,
+            model_type='random_forest',
+        )
+
+    if isinstance(model, GradientBoostingRegressor):
+        if model.init_ == 'zero':
+            base_score = 0.0
+        else:
+            base_score = float(np.ravel(model.init_.constant_)[0])
+        for estimator in model.estimators_[:, 0]:
+            _add_sklearn_tree(trees, estimator)
+        return trees.build(
+            base_score=base_score,
+            scale=model.learning_rate,
+            strict=False,
+            n_features=model.n_features_in_,
+            model_type='gradient_boosting',
+        )
+
+    try:
+        import xgboost as xgb
+    except ImportError:
+        xgb = None
+
+    if xgb is not None and isinstance(model, xgb.XGBRegressor):
+        config = json.loads(model.get_booster().save_raw('json'))['learner']
+        objective = config['objective']['name']
+        if objective != 'reg:squarederror':
+            raise TypeError(f"Unsupported XGBoost objective: {objective}")
+
+        for tree in config['gradient_booster']['model']['trees']:
+            left = tree['left_children']
+            right = tree['right_children']
+            trees.add_tree(
+                feature=tree['split_indices'],
+                # Leaf values are stored in split_conditions
+                threshold=np.float32(tree['split_conditions']),
+                left=left,
+                right=right,
+                value=np.float32(tree['split_conditions']),
+                depth=_xgb_tree_depth(left, right),
+            )
+        return trees.build(
+            base_score=float(config['learner_model_param']['base_score']),
+            scale=1.0,
+            strict=True,
+            n_features=int(config['learner_model_param']['num_feature']),
+            model_type='xgboost',
+        )
+
+    raise TypeError(f"Cannot compile model of type {type(model).__name__}")
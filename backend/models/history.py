@@ -0,0 +1,415 @@
+"""
+Server-side historical counts from a spatial index of collected data
+
+Clients rarely know how many donations, requests and monetary donations a
+location has seen, so predictions fill the counts they leave out from the
+rows collect_data.py ingested (data/snapshots).
+
+Counts follow training (scripts/collect_data.py): rows are bucketed into
+0.01 degree (~1 km) cells, and a cell counts once per month and year it had
+activity. A query snaps the location to the same grid and sums the cells
+within HISTORY_RADIUS_KM; the default of 0.5 km only reaches the
+location's own cell (below ~60 degrees latitude), so serving sees exactly
+the feature values the model was trained on. Larger radii pool
+neighbouring cells.
+
+GridIndex buckets points into square cells the size of the radius and keeps
+them sorted by (month, cell row, cell column), so the candidates of every
+query are a few contiguous ranges found with one vectorized searchsorted.
+Inserts are appended and merged in on the next query.
+"""
+
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+# Local copy of the ingested tables (see scripts/ingest.py)
+HISTORY_SNAPSHOT_DIR = Path(os.getenv('INGEST_SNAPSHOT_DIR', DATA_DIR / "snapshots"))
+# Fill historical counts the client leaves out from the snapshot
+HISTORY_INDEX = os.getenv('HISTORY_INDEX', 'true').lower() in ('1', 'true', 'yes')
+# Radius around a location whose cells are counted
+HISTORY_RADIUS_KM = float(os.getenv('HISTORY_RADIUS_KM', '0.5'))
+# Seconds between checks of the snapshot for new rows (-1 = load once)
+HISTORY_REFRESH_INTERVAL = float(os.getenv('HISTORY_REFRESH_INTERVAL', '60'))
+
+KM_PER_DEGREE = 111.32
+# Queries handled per vectorized pass (bounds the candidate arrays)
+QUERY_CHUNK_SIZE = 8192
+
+# Count column filled from each snapshot table, and the table's coordinates
+HISTORY_TABLES = {
+    'donations': ('historical_donations', 'latitude', 'longitude'),
+    'requests': ('historical_requests', 'latitude', 'longitude'),
+    'monetary_donations': ('monetary_donations', 'to_latitude', 'to_longitude'),
+}
+COUNT_COLUMNS = [column for column, _, _ in HISTORY_TABLES.values()]
+
+
+class GridIndex:
+    """
+    Points (latitude, longitude, month, kind) bucketed into a lat/lng grid
+
+    Supports appending points and counting, per kind, the points of a given
+    month within a radius of many query locations at once. Longitudes are
+    not wrapped at the antimeridian.
+    """
+
+    def __init__(self, radius_km: float, kinds: int):
+        self.radius_km = radius_km
+        self.kinds = kinds
+        self.cell_degrees = max(radius_km, 0.01) / KM_PER_DEGREE
+        self.rows = math.ceil(180 / self.cell_degrees) + 1
+        self.cols = math.ceil(360 / self.cell_degrees) + 1
+
+        # Merged points as (keys, latitude, longitude, kind), sorted by key;
+        # replaced as a whole so queries never see a partial merge
+        empty = np.empty(0)
+        self._points = (empty.astype(np.int64), empty, empty, empty.astype(np.int8))
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points[0]) + sum(len(batch[0]) for batch in self._pending)
+
+    def _cells(self, latitude: np.ndarray, longitude: np.ndarray) -> tuple:
+        row = np.clip(((latitude + 90) / self.cell_degrees).astype(np.int64), 0, self.rows - 1)
+        col = np.clip(((longitude + 180) / self.cell_degrees).astype(np.int64), 0, self.cols - 1)
+        return row, col
+
+    def _keys(self, month: np.ndarray, row: np.ndarray, col: np.ndarray) -> np.ndarray:
+        return (month.astype(np.int64) * self.rows + row) * self.cols + col
+
+    def insert(self, latitude, longitude, month, kind):
+        """Append points (array-likes of equal length)"""
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        keys = self._keys(np.asarray(month), *self._cells(latitude, longitude))
+        with self._lock:
+            self._pending.append((keys, latitude, longitude, np.asarray(kind, dtype=np.int8)))
+
+    def _merged(self) -> tuple:
+        if self._pending:
+            with self._lock:
+                if self._pending:
+                    parts = list(zip(self._points, *self._pending))
+                    merged = [np.concatenate(part) for part in parts]
+                    order = np.argsort(merged[0], kind='stable')
+                    self._points = tuple(values[order] for values in merged)
+                    self._pending = []
+        return self._points
+
+    def count_within(self, latitude, longitude, month) -> np.ndarray:
+        """
+        Number of points of each kind in the query's month within radius_km
+
+        Args:
+            latitude, longitude, month: array-likes, one entry per query
+
+        Returns:
+            int64 array of shape (queries, kinds)
+        """
+        latitude = np.asarray(latitude, dtype=np.float64).reshape(-1)
+        longitude = np.asarray(longitude, dtype=np.float64).reshape(-1)
+        month = np.asarray(month).reshape(-1)
+        counts = np.zeros((len(latitude), self.kinds), dtype=np.int64)
+        points = self._merged()
+        if len(points[0]) == 0:
+            return counts
+        for start in range(0, len(latitude), QUERY_CHUNK_SIZE):
+            chunk = slice(start, start + QUERY_CHUNK_SIZE)
+            counts[chunk] = self._count_chunk(points, latitude[chunk], longitude[chunk], month[chunk])
+        return counts
+
+    def count_at(self, latitude: float, longitude: float, month: int) -> list:
+        """count_within for a single location, without the batch overhead"""
+        keys, point_lat, point_lng, point_kind = self._merged()
+        counts = [0] * self.kinds
+        if len(keys) == 0:
+            return counts
+
+        row = min(max(int((latitude + 90) / self.cell_degrees), 0), self.rows - 1)
+        col = min(max(int((longitude + 180) / self.cell_degrees), 0), self.cols - 1)
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        col_span = math.ceil(self.radius_km / (KM_PER_DEGREE * cos_lat * self.cell_degrees))
+        first_col, last_col = max(col - col_span, 0), min(col + col_span, self.cols - 1)
+        rows = sorted({min(max(row + offset, 0), self.rows - 1) for offset in (-1, 0, 1)})
+        bounds = []
+        for r in rows:
+            base = (month * self.rows + r) * self.cols
+            bounds += [base + first_col, base + last_col + 1]
+        positions = keys.searchsorted(bounds).tolist()
+        ranges = [(lo, hi) for lo, hi in zip(positions[::2], positions[1::2]) if hi > lo]
+        if not ranges:
+            return counts
+
+        candidates = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+        dy = (point_lat[candidates] - latitude) * KM_PER_DEGREE
+        dx = (point_lng[candidates] - longitude) * (KM_PER_DEGREE * cos_lat)
+        within = dx * dx + dy * dy <= self.radius_km ** 2 + 1e-9
+        return np.bincount(point_kind[candidates[within]], minlength=self.kinds).tolist()
+
+    def _count_chunk(self, points, latitude, longitude, month) -> np.ndarray:
+        keys, point_lat, point_lng, point_kind = points
+        n = len(latitude)
+
+        # Rows within the radius, and in each row the run of columns within
+        # it (wider away from the equator); each run is one key range
+        row, col = self._cells(latitude, longitude)
+        cos_lat = np.maximum(np.cos(np.radians(latitude)), 1e-6)
+        col_span = np.ceil(self.radius_km / (KM_PER_DEGREE * cos_lat * self.cell_degrees)).astype(np.int64)
+        row_offsets = np.arange(-1, 2)
+        rows = np.clip(row[:, None] + row_offsets, 0, self.rows - 1)
+        first = self._keys(month[:, None], rows, np.maximum(col - col_span, 0)[:, None])
+        last = self._keys(month[:, None], rows, np.minimum(col + col_span, self.cols - 1)[:, None])
+
+        lo = np.searchsorted(keys, first.ravel(), side='left')
+        hi = np.searchsorted(keys, last.ravel(), side='right')
+        lengths = hi - lo
+        # Rows clipped at the poles repeat; count each once
+        repeated = np.zeros(rows.shape, dtype=bool)
+        repeated[:, 1:] = rows[:, 1:] == rows[:, :-1]
+        lengths[repeated.ravel()] = 0
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros((n, self.kinds), dtype=np.int64)
+
+        # Expand the ranges into candidate positions and their query
+        query = np.repeat(np.repeat(np.arange(n), len(row_offsets)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        candidates = np.arange(total) - np.repeat(starts - lo, lengths)
+
+        dy = (point_lat[candidates] - latitude[query]) * KM_PER_DEGREE
+        dx = (point_lng[candidates] - longitude[query]) * KM_PER_DEGREE * cos_lat[query]
+        within = dx * dx + dy * dy <= self.radius_km ** 2 + 1e-9
+
+        bins = query[within] * self.kinds + point_kind[candidates[within]]
+        return np.bincount(bins, minlength=n * self.kinds).reshape(n, self.kinds)
+
+
+class HistoryIndex:
+    """
+    Historical counts around locations, loaded from the ingest snapshot
+
+    The snapshot CSVs are append-only, so each refresh reads just the bytes
+    added since the previous one and inserts them into the grid.
+    """
+
+    def __init__(
+        self,
+        snapshot_dir: Path = HISTORY_SNAPSHOT_DIR,
+        radius_km: float = HISTORY_RADIUS_KM,
+        refresh_interval: float = HISTORY_REFRESH_INTERVAL,
+        enabled: bool = HISTORY_INDEX,
+    ):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.radius_km = radius_km
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        # Bumped whenever counts can have changed (for callers caching results)
+        self.generation = 0
+
+        self._reset()
+        self._last_check = None
+        self._refresh_lock = threading.Lock()
+        self._last_error = None
+
+    def _reset(self):
+        self._grid = GridIndex(self.radius_km, len(COUNT_COLUMNS))
+        # Codes of the (cell, month, year, kind) buckets already inserted
+        self._seen = np.empty(0, dtype=np.int64)
+        # table -> (bytes consumed, CSV column names)
+        self._offsets = {}
+        self.generation += 1
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Insert snapshot rows added since the last refresh
+
+        Returns:
+            number of new (cell, month, year) buckets inserted
+        """
+        if not force:
+            if self._last_check is not None and (
+                self.refresh_interval < 0
+                or time.monotonic() - self._last_check < self.refresh_interval
+            ):
+                return 0
+        # Requests never wait on a refresh already running in another thread
+        if not self._refresh_lock.acquire(blocking=force):
+            return 0
+        try:
+            self._last_check = time.monotonic()
+            if self._truncated():
+                # Snapshot deleted and re-fetched: start over
+                self._reset()
+            inserted = 0
+            for table in HISTORY_TABLES:
+                inserted += self._load_table(table)
+            if inserted:
+                self.generation += 1
+            self._last_error = None
+            return inserted
+        except Exception as e:
+            self._last_error = str(e)
+            print(f"Error refreshing history index: {e}")
+            return 0
+        finally:
+            self._refresh_lock.release()
+
+    def _truncated(self) -> bool:
+        for table, (offset, _) in self._offsets.items():
+            path = self.snapshot_dir / f"{table}.csv"
+            if not path.exists() or path.stat().st_size < offset:
+                return True
+        return False
+
+    def _read_new_rows(self, table: str):
+        path = self.snapshot_dir / f"{table}.csv"
+        if not path.exists():
+            return None
+        offset, names = self._offsets.get(table, (0, None))
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Leave a row still being appended for the next refresh
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None
+        data = data[:end]
+        if names is None:
+            header, data = data.split(b'\n', 1)
+            names = header.decode().strip().split(',')
+        self._offsets[table] = (offset + end, names)
+        if not data:
+            return None
+
+        import io
+        import pandas as pd
+        return pd.read_csv(io.BytesIO(data), header=None, names=names)
+
+    def _load_table(self, table: str) -> int:
+        rows = self._read_new_rows(table)
+        if rows is None:
+            return 0
+
+        _, lat_col, lng_col = HISTORY_TABLES[table]
+        # The snapshot stores created_at as UTC ISO 8601 (Snapshot.append),
+        # so year and month are its first characters; much cheaper than
+        # parsing the timestamps with their offsets
+        created_at = rows['created_at'].astype(str)
+        valid = (
+            rows[lat_col].notna() & rows[lng_col].notna()
+            & created_at.str.match(r'\d{4}-\d{2}')
+        ).to_numpy()
+        created_at = created_at[valid]
+        # Same ~1 km cells as scripts/collect_data.py
+        lat_cell = np.round(rows[lat_col][valid].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        lng_cell = np.round(rows[lng_col][valid].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        month = created_at.str.slice(5, 7).to_numpy(dtype=np.int64)
+        year = np.clip(created_at.str.slice(0, 4).to_numpy(dtype=np.int64) - 1970, 0, 255)
+        kind = list(HISTORY_TABLES).index(table)
+
+        codes = np.unique(
+            ((((lat_cell + 9000) * 36001 + (lng_cell + 18000)) * 13 + month) * 256 + year) * 4 + kind
+        )
+        position = np.searchsorted(self._seen, codes)
+        seen = position < len(self._seen)
+        seen[seen] = self._seen[position[seen]] == codes[seen]
+        codes = codes[~seen]
+        if len(codes) == 0:
+            return 0
+        self._seen = np.union1d(self._seen, codes)
+
+        bucket = codes // 4 // 256
+        month = bucket % 13
+        cell = bucket // 13
+        self._grid.insert(
+            (cell // 36001 - 9000) / 100,
+            (cell % 36001 - 18000) / 100,
+            month,
+            np.full(len(codes), kind),
+        )
+        return len(codes)
+
+    def counts(self, latitude, longitude, month) -> dict:
+        """
+        Historical counts around locations
+
+        Args:
+            latitude, longitude, month: array-likes, one entry per location
+
+        Returns:
+            dict of count column (historical_donations, ...) to int64 array
+        """
+        self.refresh()
+        counts = self._grid.count_within(
+            np.round(np.asarray(latitude, dtype=np.float64), 2),
+            np.round(np.asarray(longitude, dtype=np.float64), 2),
+            month,
+        )
+        return {column: counts[:, i] for i, column in enumerate(COUNT_COLUMNS)}
+
+    def fill(self, columns: dict):
+        """
+        Fill NaN count entries of batch columns in place (0 when disabled)
+
+        Args:
+            columns: float64 arrays keyed by feature name, including
+                latitude, longitude, month and the count columns
+        """
+        missing = np.zeros(len(columns['latitude']), dtype=bool)
+        for column in COUNT_COLUMNS:
+            missing |= np.isnan(columns[column])
+        if not missing.any():
+            return
+
+        idx = np.flatnonzero(missing)
+        counts = None
+        if self.enabled:
+            counts = self.counts(columns['latitude'][idx], columns['longitude'][idx], columns['month'][idx])
+        for column in COUNT_COLUMNS:
+            values = columns[column]
+            nan = np.isnan(values[idx])
+            values[idx[nan]] = counts[column][nan] if counts is not None else 0
+
+    def fill_row(self, latitude: float, longitude: float, month: int, counts: tuple) -> tuple:
+        """
+        Replace the None entries of one location's counts
+
+        Args:
+            counts: (historical_donations, historical_requests,
+                monetary_donations), None where not provided
+
+        Returns:
+            the counts as ints
+        """
+        if None not in counts:
+            return counts
+        found = [0] * len(COUNT_COLUMNS)
+        if self.enabled:
+            self.refresh()
+            # Snapped like np.round(values, 2) in counts()
+            found = self._grid.count_at(round(latitude * 100) / 100, round(longitude * 100) / 100, month)
+        return tuple(found[i] if value is None else value for i, value in enumerate(counts))
+
+    def status(self) -> dict:
+        """Describe the index state (used by the /debug endpoint)"""
+        return {
+            'enabled': self.enabled,
+            'snapshot_dir': str(self.snapshot_dir),
+            'radius_km': self.radius_km,
+            'buckets': len(self._grid),
+            'generation': self.generation,
+            'refresh_interval': self.refresh_interval,
+            'last_error': self._last_error,
+        }
+
+
+# Shared by every importer in this process
+history_index = HistoryIndex()
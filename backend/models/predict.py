@@ -2,18 +2,49 @@
 Prediction functions for food necessity model
 """
 
-import joblib
 import numpy as np
-import pandas as pd
-from pathlib import Path
+from datetime import datetime
 import os
-from dotenv import load_dotenv
+import threading
+import warnings
+from typing import NamedTuple
 
-load_dotenv()
+# Load .env before the registry/cache read their settings; Lambda gets its
+# configuration from the function environment, so skip the import there
+if not os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    from dotenv import load_dotenv
+    load_dotenv()
 
-MODELS_DIR = Path(__file__).parent
-MODEL_PATH = MODELS_DIR / "food_necessity_model.pkl"
-METADATA_PATH = MODELS_DIR / "model_metadata.pkl"
+from models.registry import registry
+from models.cache import prediction_cache
+from models.history import history_index
+from models.regional_rates import lookup_rate, lookup_rates
+from models.timing import stage
+
+# Cached scores belong to the model that produced them
+registry.add_listener(prediction_cache.clear)
+
+# Inference feeds plain NumPy rows in training column order; sklearn would
+# otherwise warn on every call that the model was fitted with column names
+warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+
+# Order in which features are computed; FeaturePlan maps it to training order
+FEATURE_NAMES = [
+    'latitude',
+    'longitude',
+    'month',
+    'season_encoded',
+    'food_insecurity_rate',
+    'poverty_rate',
+    'historical_donations',
+    'historical_requests',
+    'monetary_donations',
+    'population',
+    'donation_ratio',
+    'donation_deficit',
+    'month_sin',
+    'month_cos',
+]
 
 def get_season(month: int) -> str:
     """Get season from month"""
@@ -27,17 +58,58 @@ def get_season(month: int) -> str:
         return 'winter'
 
 def load_model():
-    """Load trained model and metadata"""
-    if not MODEL_PATH.exists():
-        raise FileNotFoundError(f"Model not found: {MODEL_PATH}. Please train the model first.")
-    
-    if not METADATA_PATH.exists():
-        raise FileNotFoundError(f"Metadata not found: {METADATA_PATH}")
-    
-    model = joblib.load(MODEL_PATH)
-    metadata = joblib.load(METADATA_PATH)
-    
-    return model, metadata
+    """
+    Get the trained model and metadata from the process-wide registry
+
+    The model bundle is only loaded on first use or after train_model.py
+    writes a new one.
+    """
+    loaded = registry.get()
+    return loaded.model, loaded.metadata
+
+# Season name for each month, indexed by month number (index 0 unused)
+SEASONS_BY_MONTH = np.array([get_season(max(m, 1)) for m in range(13)])
+
+class FeaturePlan(NamedTuple):
+    """Per-model lookup tables precomputed from the training metadata"""
+    generation: int
+    order: tuple                        # FEATURE_NAMES index of each training column
+    season_codes: dict                  # season name -> LabelEncoder code
+    season_codes_by_month: np.ndarray   # month number -> LabelEncoder code
+
+_plan = None
+_row_buffers = threading.local()
+
+def get_feature_plan(loaded) -> FeaturePlan:
+    """Return the FeaturePlan for a registry snapshot, building it once per model"""
+    global _plan
+    plan = _plan
+    if plan is None or plan.generation != loaded.generation:
+        metadata = loaded.metadata
+        # LabelEncoder codes are positions in its sorted classes_; compiled
+        # artifacts store the classes directly (see scripts/train_model.py)
+        if 'season_classes' in metadata:
+            season_classes = metadata['season_classes']
+        else:
+            season_classes = metadata['label_encoder_season'].classes_
+        season_codes = {season: float(code) for code, season in enumerate(season_classes)}
+        plan = FeaturePlan(
+            generation=loaded.generation,
+            order=tuple(FEATURE_NAMES.index(col) for col in metadata['feature_columns']),
+            season_codes=season_codes,
+            season_codes_by_month=np.array([season_codes[season] for season in SEASONS_BY_MONTH]),
+        )
+        _plan = plan
+    return plan
+
+def _row_buffer(plan: FeaturePlan) -> np.ndarray:
+    """Preallocated (1, n_features) float64 row, one per thread and model"""
+    buffer = getattr(_row_buffers, 'row', None)
+    if buffer is None or getattr(_row_buffers, 'generation', None) != plan.generation:
+        buffer = np.empty((1, len(plan.order)), dtype=np.float64)
+        _row_buffers.row = buffer
+        _row_buffers.generation = plan.generation
+    return buffer
 
 def predict_need(
     latitude: float,
@@ -45,9 +117,9 @@ def predict_need(
     month: int = None,
     food_insecurity_rate: float = None,
     poverty_rate: float = None,
-    historical_donations: int = 0,
-    historical_requests: int = 0,
-    monetary_donations: int = 0,
+    historical_donations: int = None,
+    historical_requests: int = None,
+    monetary_donations: int = None,
     population: int = 1000
 ) -> dict:
     """
@@ -59,16 +131,28 @@ def predict_need(
         month: Month (1-12), defaults to current month
         food_insecurity_rate: Food insecurity rate (0-1), estimated if not provided
         poverty_rate: Poverty rate (0-1), estimated if not provided
-        historical_donations: Number of historical donations
-        historical_requests: Number of historical requests
-        monetary_donations: Number of monetary donations
+        historical_donations: Number of historical donations, counted from
+            the collected data (models/history.py) if not provided
+        historical_requests: Number of historical requests, likewise
+        monetary_donations: Number of monetary donations, likewise
         population: Population estimate
     
     Returns:
         dict with prediction and metadata
     """
+    # Use current month if not provided
+    if month is None:
+        month = datetime.now().month
+    
+    # Count donation history near the location if not provided
+    with stage('features'):
+        historical_donations, historical_requests, monetary_donations = history_index.fill_row(
+            latitude, longitude, month,
+            (historical_donations, historical_requests, monetary_donations),
+        )
+    
     try:
-        model, metadata = load_model()
+        loaded = registry.get()
     except FileNotFoundError as e:
         # Fallback to simple prediction if model not trained
         return predict_need_simple(
@@ -78,57 +162,54 @@ def predict_need(
             monetary_donations, population
         )
     
-    # Use current month if not provided
-    if month is None:
-        month = pd.Timestamp.now().month
+    metadata = loaded.metadata
+    plan = get_feature_plan(loaded)
     
     season = get_season(month)
-    le_season = metadata['label_encoder_season']
-    season_encoded = le_season.transform([season])[0]
     
-    # Estimate rates if not provided
+    # Estimate rates if not provided (USDA rate of the region, see
+    # models/regional_rates.py)
+    if food_insecurity_rate is None:
+        with stage('features'):
+            food_insecurity_rate = lookup_rate(latitude, longitude)
     if food_insecurity_rate is None:
         food_insecurity_rate = 0.12  # Default estimate
     if poverty_rate is None:
         poverty_rate = food_insecurity_rate * 1.2
     
-    # Feature engineering
-    donation_ratio = historical_donations / (historical_requests + 1)
-    donation_deficit = historical_requests - historical_donations
-    month_sin = np.sin(2 * np.pi * month / 12)
-    month_cos = np.cos(2 * np.pi * month / 12)
-    
-    # Create feature vector
-    features = pd.DataFrame([{
-        'latitude': latitude,
-        'longitude': longitude,
-        'month': month,
-        'season_encoded': season_encoded,
-        'food_insecurity_rate': food_insecurity_rate,
-        'poverty_rate': poverty_rate,
-        'historical_donations': historical_donations,
-        'historical_requests': historical_requests,
-        'monetary_donations': monetary_donations,
-        'population': population,
-        'donation_ratio': donation_ratio,
-        'donation_deficit': donation_deficit,
-        'month_sin': month_sin,
-        'month_cos': month_cos,
-    }])
-    
-    # Ensure feature order matches training
-    feature_columns = metadata['feature_columns']
-    features = features[feature_columns]
+    # Serve repeated inputs from the prediction cache (see models/cache.py);
+    # with PREDICTION_CACHE_PRECISION set the quantized coordinates are both
+    # keyed and scored, so a hit equals a recomputation
+    need_score = None
+    cache_key = None
+    model_latitude, model_longitude = latitude, longitude
+    if prediction_cache.enabled:
+        model_latitude = float(prediction_cache.quantize(latitude))
+        model_longitude = float(prediction_cache.quantize(longitude))
+        cache_key = (
+            loaded.generation,
+            model_latitude,
+            model_longitude,
+            month,
+            food_insecurity_rate, poverty_rate, historical_donations,
+            historical_requests, monetary_donations, population,
+        )
+        need_score = prediction_cache.get(cache_key)
     
-    # Predict
-    need_score = model.predict(features)[0]
-    need_score = max(0, min(1, need_score))  # Clamp to [0, 1]
+    if need_score is None:
+        need_score = _predict_row(
+            loaded, plan, model_latitude, model_longitude, month, season,
+            food_insecurity_rate, poverty_rate, historical_donations,
+            historical_requests, monetary_donations, population,
+        )
+        if cache_key is not None:
+            prediction_cache.put(cache_key, need_score)
     
     # Calculate confidence (based on data availability)
     confidence = 0.9 if food_insecurity_rate else 0.7
     
     return {
-        'predicted_need_score': float(need_score),
+        'predicted_need_score': need_score,
         'confidence': confidence,
         'month': month,
         'season': season,
@@ -144,15 +225,288 @@ def predict_need(
         }
     }
 
+def _predict_row(
+    loaded, plan: FeaturePlan, latitude, longitude, month, season,
+    food_insecurity_rate, poverty_rate, historical_donations,
+    historical_requests, monetary_donations, population,
+) -> float:
+    """Score one location with the model, returning the clamped need score"""
+    with stage('features'):
+        # Feature engineering
+        donation_ratio = historical_donations / (historical_requests + 1)
+        donation_deficit = historical_requests - historical_donations
+        month_sin = np.sin(2 * np.pi * month / 12)
+        month_cos = np.cos(2 * np.pi * month / 12)
+        
+        # Write the feature vector straight into a preallocated row, in training order
+        features = (
+            latitude,
+            longitude,
+            month,
+            plan.season_codes[season],
+            food_insecurity_rate,
+            poverty_rate,
+            historical_donations,
+            historical_requests,
+            monetary_donations,
+            population,
+            donation_ratio,
+            donation_deficit,
+            month_sin,
+            month_cos,
+        )
+        row = _row_buffer(plan)
+        row[0] = [features[i] for i in plan.order]
+    
+    # Predict
+    with stage('model'):
+        need_score = loaded.model.predict(row)[0]
+    need_score = max(0, min(1, need_score))  # Clamp to [0, 1]
+    return float(need_score)
+
+# Inputs accepted by predict_need_batch and their defaults (None = estimated,
+# or counted from the collected data for the historical counts)
+BATCH_INPUT_DEFAULTS = {
+    'latitude': None,
+    'longitude': None,
+    'month': None,
+    'food_insecurity_rate': None,
+    'poverty_rate': None,
+    'historical_donations': None,
+    'historical_requests': None,
+    'monetary_donations': None,
+    'population': 1000,
+}
+
+@stage('features')
+def _batch_columns(locations) -> dict:
+    """
+    Normalize batch input into float64 column arrays with defaults applied
+
+    Accepts a DataFrame, a mapping of column name to array-like, or a list of
+    per-location dicts. Missing columns and None/NaN values get the same
+    defaults and estimates as predict_need.
+    """
+    if hasattr(locations, 'columns') and hasattr(locations, 'to_numpy'):
+        # pandas DataFrame (checked by duck typing to keep pandas off the
+        # inference import path)
+        raw = {col: locations[col].to_numpy() for col in BATCH_INPUT_DEFAULTS if col in locations}
+        n = len(locations)
+    elif isinstance(locations, dict):
+        raw = {col: locations[col] for col in BATCH_INPUT_DEFAULTS if col in locations}
+        n = len(np.atleast_1d(raw.get('latitude', [])))
+    else:
+        locations = list(locations)
+        raw = {
+            col: [loc.get(col) for loc in locations]
+            for col in BATCH_INPUT_DEFAULTS
+        }
+        n = len(locations)
+    
+    columns = {}
+    for col, default in BATCH_INPUT_DEFAULTS.items():
+        if col in raw:
+            values = np.array(raw[col], dtype=np.float64).reshape(-1)
+            if len(values) != n:
+                raise ValueError(f"Column '{col}' has {len(values)} values, expected {n}")
+        else:
+            values = np.full(n, np.nan)
+        if default is not None:
+            values = np.where(np.isnan(values), default, values)
+        columns[col] = values
+    
+    if np.isnan(columns['latitude']).any() or np.isnan(columns['longitude']).any():
+        raise ValueError("latitude and longitude are required for every location")
+    
+    # Use current month if not provided
+    columns['month'] = np.where(
+        np.isnan(columns['month']), datetime.now().month, columns['month']
+    ).astype(np.int64)
+    
+    # Estimate rates if not provided (USDA rate of the region, see
+    # models/regional_rates.py)
+    missing = np.isnan(columns['food_insecurity_rate'])
+    if missing.any():
+        columns['food_insecurity_rate'][missing] = lookup_rates(
+            columns['latitude'][missing], columns['longitude'][missing]
+        )
+    columns['food_insecurity_rate'] = np.where(
+        np.isnan(columns['food_insecurity_rate']), 0.12, columns['food_insecurity_rate']
+    )
+    columns['poverty_rate'] = np.where(
+        np.isnan(columns['poverty_rate']),
+        columns['food_insecurity_rate'] * 1.2,
+        columns['poverty_rate'],
+    )
+    
+    # Count donation history near each location if not provided (one
+    # batched radius query)
+    history_index.fill(columns)
+    
+    for col in ('historical_donations', 'historical_requests', 'monetary_donations', 'population'):
+        columns[col] = columns[col].astype(np.int64)
+    
+    return columns
+
+@stage('features')
+def _batch_features(columns: dict, plan: FeaturePlan) -> np.ndarray:
+    """Build the float64 model feature matrix column-wise, in training order"""
+    month = columns['month']
+    historical_donations = columns['historical_donations']
+    historical_requests = columns['historical_requests']
+    
+    features = (
+        columns['latitude'],
+        columns['longitude'],
+        month,
+        plan.season_codes_by_month[month],
+        columns['food_insecurity_rate'],
+        columns['poverty_rate'],
+        historical_donations,
+        historical_requests,
+        columns['monetary_donations'],
+        columns['population'],
+        historical_donations / (historical_requests + 1),
+        historical_requests - historical_donations,
+        np.sin(2 * np.pi * month / 12),
+        np.cos(2 * np.pi * month / 12),
+    )
+    
+    X = np.empty((len(month), len(plan.order)), dtype=np.float64)
+    for j, i in enumerate(plan.order):
+        X[:, j] = features[i]
+    return X
+
+def predict_need_batch(locations) -> list:
+    """
+    Predict food necessity scores for many locations with one model call
+    
+    Args:
+        locations: DataFrame, mapping of column name to array-like, or list of
+            dicts using the predict_need argument names. Missing values are
+            defaulted/estimated exactly as in predict_need.
+    
+    Returns:
+        list of dicts, one per location, in the same format as predict_need
+    """
+    columns = _batch_columns(locations)
+    n = len(columns['latitude'])
+    if n == 0:
+        return []
+    
+    try:
+        loaded = registry.get()
+    except FileNotFoundError:
+        # Fallback to simple prediction if model not trained
+        return [
+            predict_need_simple(**row)
+            for row in _iter_rows(columns)
+        ]
+    
+    metadata = loaded.metadata
+    need_scores = _batch_scores(loaded, columns)
+    
+    # Calculate confidence (based on data availability)
+    confidences = np.where(columns['food_insecurity_rate'] != 0, 0.9, 0.7)
+    model_version = metadata.get('model_version', '1.0.0')
+    
+    with stage('serialize'):
+        results = []
+        for row, need_score, confidence in zip(_iter_rows(columns), need_scores.tolist(), confidences.tolist()):
+            results.append({
+                'predicted_need_score': float(need_score),
+                'confidence': confidence,
+                'month': row['month'],
+                'season': get_season(row['month']),
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'model_version': model_version,
+                'features_used': {
+                    'food_insecurity_rate': row['food_insecurity_rate'],
+                    'poverty_rate': row['poverty_rate'],
+                    'historical_donations': row['historical_donations'],
+                    'historical_requests': row['historical_requests'],
+                    'population': row['population'],
+                }
+            })
+    
+    return results
+
+def predict_need_scores(locations, loaded=None, use_cache: bool = True) -> np.ndarray:
+    """
+    Predict only the need scores for many locations
+    
+    Cheaper than predict_need_batch when the caller just needs to rank
+    locations (e.g. top-k selection); accepts the same inputs.
+    
+    Args:
+        loaded: registry snapshot to score with (default: the current model)
+        use_cache: read and fill the prediction cache; bulk jobs that score
+            each location once (e.g. models/raster.py) turn it off
+    """
+    columns = _batch_columns(locations)
+    if len(columns['latitude']) == 0:
+        return np.empty(0)
+    
+    if loaded is None:
+        try:
+            loaded = registry.get()
+        except FileNotFoundError:
+            return np.array([
+                predict_need_simple(**row)['predicted_need_score']
+                for row in _iter_rows(columns)
+            ])
+    
+    return _batch_scores(loaded, columns, use_cache)
+
+def _batch_scores(loaded, columns: dict, use_cache: bool = True) -> np.ndarray:
+    """Clamped need scores for batch columns, scoring only cache misses"""
+    plan = get_feature_plan(loaded)
+    if not (use_cache and prediction_cache.enabled):
+        features = _batch_features(columns, plan)
+        with stage('model'):
+            return np.clip(loaded.model.predict(features), 0, 1)  # Clamp to [0, 1]
+    
+    # Quantized coordinates (if PREDICTION_CACHE_PRECISION is set) are both
+    # keyed and scored, so a hit equals a recomputation
+    columns = dict(
+        columns,
+        latitude=prediction_cache.quantize(columns['latitude']),
+        longitude=prediction_cache.quantize(columns['longitude']),
+    )
+    keys = list(zip(
+        [loaded.generation] * len(columns['latitude']),
+        *(columns[name].tolist() for name in BATCH_INPUT_DEFAULTS),
+    ))
+    cached = prediction_cache.get_many(keys)
+    misses = [i for i, score in enumerate(cached) if score is None]
+    
+    need_scores = np.array([np.nan if score is None else score for score in cached])
+    if misses:
+        idx = np.array(misses)
+        features = _batch_features({name: values[idx] for name, values in columns.items()}, plan)
+        with stage('model'):
+            miss_scores = np.clip(loaded.model.predict(features), 0, 1)  # Clamp to [0, 1]
+        need_scores[idx] = miss_scores
+        prediction_cache.put_many([keys[i] for i in misses], miss_scores.tolist())
+    
+    return need_scores
+
+def _iter_rows(columns: dict):
+    """Yield per-location dicts of plain Python values from batch columns"""
+    names = list(BATCH_INPUT_DEFAULTS)
+    for values in zip(*(columns[name].tolist() for name in names)):
+        yield dict(zip(names, values))
+
 def predict_need_simple(
     latitude: float,
     longitude: float,
     month: int = None,
     food_insecurity_rate: float = None,
     poverty_rate: float = None,
-    historical_donations: int = 0,
-    historical_requests: int = 0,
-    monetary_donations: int = 0,
+    historical_donations: int = None,
+    historical_requests: int = None,
+    monetary_donations: int = None,
     population: int = 1000
 ) -> dict:
     """
@@ -160,7 +514,12 @@ def predict_need_simple(
     Used when ML model is not available
     """
     if month is None:
-        month = pd.Timestamp.now().month
+        month = datetime.now().month
+    
+    historical_donations, historical_requests, monetary_donations = history_index.fill_row(
+        latitude, longitude, month,
+        (historical_donations, historical_requests, monetary_donations),
+    )
     
     season = get_season(month)
     seasonal_multiplier = {
@@ -170,6 +529,8 @@ def predict_need_simple(
         'summer': 0.9
     }[season]
     
+    if food_insecurity_rate is None:
+        food_insecurity_rate = lookup_rate(latitude, longitude)
     if food_insecurity_rate is None:
         food_insecurity_rate = 0.12
     if poverty_rate is None:
@@ -178,7 +539,12 @@ def predict_need_simple(
     donation_factor = max(0.1, 1 - (historical_donations / 20))
     population_factor = min(1, population / 10000)
     
-need_score = ( food_insecurity_rate * 0.38 + poverty_rate * 0.33 + donation_factor * 0.21 + population_factor * 0.08 ) * seasonal_multiplier
+    need_score = (
+        food_insecurity_rate * 0.38 +
+        poverty_rate * 0.33 +
+        donation_factor * 0.21 +
+        population_factor * 0.08
+    ) * seasonal_multiplier
     
     need_score = max(0, min(1, need_score))
     
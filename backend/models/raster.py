@@ -0,0 +1,348 @@
+"""
+Precomputed need-score raster for the map
+
+Scores a regular lat/lng grid (at cell centers) for every month with the
+current model and stores the scores as uint8 codes (score * 255) in an
+array of shape (12, rows, cols), rows running south to north. The file uses
+the bundle layout (models/bundle.py), so it is memory-mapped: point
+lookups and bounding-box slices are plain array indexing, O(1) per cell,
+and every worker shares the same pages.
+
+The raster records the model it was built from. When the registry loads a
+different model, RasterStore rebuilds it in a background thread and keeps
+serving the previous raster until the new one is in place. Processes
+sharing the file (uvicorn workers) take turns on a lock file: the first
+builds, and the others map what it wrote instead of building again.
+
+A Raster holds a memory map, so it is never sent to another process: pass
+its path and checksum and call open_raster there.
+
+Usage:
+    python scripts/build_need_raster.py
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): every process builds its own raster
+    fcntl = None
+
+from models.bundle import map_arrays, write_arrays
+from models.regional_rates import get_regional_rates
+from models.registry import MODELS_DIR
+
+RASTER_PATH = Path(os.getenv('RASTER_PATH', MODELS_DIR / "need_raster.bundle"))
+# south,west,north,east in degrees (default: the contiguous US, where the
+# training data is)
+RASTER_BOUNDS = os.getenv('RASTER_BOUNDS', '24,-125,50,-66')
+# Cell size in degrees
+RASTER_RESOLUTION = float(os.getenv('RASTER_RESOLUTION', '0.1'))
+# Rebuild the raster in the background whenever a new model is loaded
+RASTER_AUTO_BUILD = os.getenv('RASTER_AUTO_BUILD', 'true').lower() in ('1', 'true', 'yes')
+
+SCORE_LEVELS = 255
+# Score of each uint8 code
+SCORES_BY_CODE = np.arange(256) / SCORE_LEVELS
+
+
+def parse_bounds(text: str) -> tuple:
+    """
+    Raises:
+        ValueError: unless text is 'south,west,north,east' with south < north
+            and west < east
+    """
+    south, west, north, east = (float(value) for value in text.split(','))
+    if not (-90 <= south < north <= 90 and -180 <= west < east <= 180):
+        raise ValueError(f"Invalid raster bounds: {text}")
+    return south, west, north, east
+
+
+def model_key(loaded) -> str:
+    """Identifies the model (and regional rates) a raster was built from"""
+    metadata = loaded.metadata
+    key = metadata.get('checksum') or f"{metadata.get('model_version')} {metadata.get('trained_at')}"
+    # Cells without a food insecurity rate use the regional one
+    rates = get_regional_rates()
+    return f"{key} {rates.checksum}" if rates is not None else key
+
+
+class Raster:
+    """A memory-mapped need raster"""
+
+    def __init__(self, mapped):
+        self.path = mapped.path
+        self.checksum = mapped.checksum
+        self.metadata = mapped.metadata
+        self.codes = mapped.array('codes')
+        self.south, self.west, self.north, self.east = self.metadata['bounds']
+        self.resolution = self.metadata['resolution']
+        _, self.rows, self.cols = self.codes.shape
+
+    def latitudes(self, start: int = 0, stop: int = None, step: int = 1) -> np.ndarray:
+        """Cell-center latitudes of rows start:stop:step"""
+        return self.south + (np.arange(self.rows)[start:stop:step] + 0.5) * self.resolution
+
+    def longitudes(self, start: int = 0, stop: int = None, step: int = 1) -> np.ndarray:
+        """Cell-center longitudes of columns start:stop:step"""
+        return self.west + (np.arange(self.cols)[start:stop:step] + 0.5) * self.resolution
+
+    def cell(self, latitude: float, longitude: float) -> Optional[tuple]:
+        """(row, col) of the cell containing a point, or None outside the raster"""
+        row = math.floor((latitude - self.south) / self.resolution)
+        col = math.floor((longitude - self.west) / self.resolution)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def score(self, latitude: float, longitude: float, month: int) -> Optional[float]:
+        """Need score of the cell containing a point, or None outside the raster"""
+        cell = self.cell(latitude, longitude)
+        if cell is None:
+            return None
+        return float(SCORES_BY_CODE[self.codes[month - 1, cell[0], cell[1]]])
+
+    def window(self, south: float, west: float, north: float, east: float) -> Optional[tuple]:
+        """Row and column slices of the cells overlapping a bounding box, or None"""
+        row_start = max(0, math.floor((south - self.south) / self.resolution))
+        row_stop = min(self.rows, math.ceil((north - self.south) / self.resolution))
+        col_start = max(0, math.floor((west - self.west) / self.resolution))
+        col_stop = min(self.cols, math.ceil((east - self.west) / self.resolution))
+        if row_start >= row_stop or col_start >= col_stop:
+            return None
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def codes_in(self, rows: slice, cols: slice, month: int, step: int = 1) -> np.ndarray:
+        """uint8 codes of a window (a view of the mapped file), every step-th cell"""
+        return self.codes[month - 1, rows.start:rows.stop:step, cols.start:cols.stop:step]
+
+
+def build_raster(
+    loaded,
+    path: Path = RASTER_PATH,
+    bounds: tuple = None,
+    resolution: float = RASTER_RESOLUTION,
+) -> Raster:
+    """
+    Score the grid for all 12 months with a model and write the raster
+
+    Args:
+        loaded: registry snapshot (models.registry.registry.get())
+        bounds: (south, west, north, east) (default: RASTER_BOUNDS)
+        resolution: cell size in degrees
+
+    Returns:
+        the new raster, mapped from path
+    """
+    from models.predict import predict_need_scores
+
+    start = time.perf_counter()
+    south, west, north, east = bounds or parse_bounds(RASTER_BOUNDS)
+    rows = math.ceil(round((north - south) / resolution, 6))
+    cols = math.ceil(round((east - west) / resolution, 6))
+
+    latitude = south + (np.arange(rows) + 0.5) * resolution
+    longitude = west + (np.arange(cols) + 0.5) * resolution
+    grid_lat, grid_lng = (values.ravel() for values in np.meshgrid(latitude, longitude, indexing='ij'))
+
+    codes = np.empty((12, rows, cols), dtype=np.uint8)
+    zeros = np.zeros(len(grid_lat))
+    for month in range(1, 13):
+        # Default inputs only: no donation history, so the raster depends on
+        # the model alone
+        scores = predict_need_scores(
+            {
+                'latitude': grid_lat,
+                'longitude': grid_lng,
+                'month': np.full(len(grid_lat), month),
+                'historical_donations': zeros,
+                'historical_requests': zeros,
+                'monetary_donations': zeros,
+            },
+            loaded=loaded,
+            use_cache=False,
+        )
+        codes[month - 1] = np.rint(scores * SCORE_LEVELS).reshape(rows, cols)
+
+    write_arrays(path, {'codes': codes}, {
+        'bounds': [south, west, north, east],
+        'resolution': resolution,
+        'score_levels': SCORE_LEVELS,
+        'model_key': model_key(loaded),
+        'model_version': loaded.metadata.get('model_version', '1.0.0'),
+        'built_at': datetime.now().isoformat(),
+        'build_seconds': time.perf_counter() - start,
+    })
+    return Raster(map_arrays(path))
+
+
+class RasterStore:
+    """
+    The raster currently being served, rebuilt when the model changes
+
+    Like ModelRegistry, readers never wait for a rebuild: the previous
+    raster keeps serving until the new file is written and mapped.
+    """
+
+    def __init__(
+        self,
+        path: Path = RASTER_PATH,
+        bounds: str = RASTER_BOUNDS,
+        resolution: float = RASTER_RESOLUTION,
+        auto_build: bool = RASTER_AUTO_BUILD,
+    ):
+        self.path = Path(path)
+        self.bounds = parse_bounds(bounds)
+        self.resolution = resolution
+        self.auto_build = auto_build
+
+        self._current: Optional[Raster] = None
+        self._opened = False
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending = None
+        self._last_error = None
+        # Rasters this process built, rather than mapped from another's build
+        self._built = 0
+
+    @property
+    def lock_path(self) -> Path:
+        return self.path.with_name(f".{self.path.name}.lock")
+
+    @contextmanager
+    def _build_lock(self):
+        """Exclusive lock, across processes, on building the raster file"""
+        if fcntl is None:
+            yield
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _map_file(self) -> Optional[Raster]:
+        """The raster file as it is on disk now, or None if it is missing or unreadable"""
+        try:
+            return Raster(map_arrays(self.path))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading need raster: {e}")
+            return None
+
+    def get(self) -> Optional[Raster]:
+        """The current raster, or None if none has been built yet"""
+        if not self._opened:
+            with self._lock:
+                if not self._opened:
+                    self._opened = True
+                    try:
+                        self._current = Raster(map_arrays(self.path))
+                    except FileNotFoundError:
+                        pass
+                    except Exception as e:
+                        print(f"Error loading need raster: {e}")
+        return self._current
+
+    def is_current(self, raster: Optional[Raster], loaded) -> bool:
+        """Whether raster was built from this model with the configured grid"""
+        return (
+            raster is not None
+            and raster.metadata['model_key'] == model_key(loaded)
+            and tuple(raster.metadata['bounds']) == self.bounds
+            and raster.metadata['resolution'] == self.resolution
+        )
+
+    def on_model_loaded(self, loaded):
+        """Registry listener: rebuild in the background if the model changed"""
+        if not self.auto_build or self.is_current(self.get(), loaded):
+            return
+        with self._lock:
+            # A build already running picks up the newest model when it ends
+            self._pending = loaded
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build_pending, name='need-raster', daemon=True).start()
+
+    def _build_pending(self):
+        while True:
+            with self._lock:
+                loaded, self._pending = self._pending, None
+                if loaded is None:
+                    self._building = False
+                    return
+            if self.is_current(self._current, loaded):
+                continue
+            try:
+                with self._build_lock():
+                    # Another process may have built it while this one waited
+                    raster = self._map_file()
+                    built = not self.is_current(raster, loaded)
+                    if built:
+                        raster = build_raster(loaded, self.path, self.bounds, self.resolution)
+                        self._built += 1
+                self._current = raster
+                self._opened = True
+                self._last_error = None
+                if built:
+                    print(f"Need raster rebuilt for model {raster.metadata['model_version']} "
+                          f"in {raster.metadata['build_seconds']:.1f}s")
+                else:
+                    print(f"Need raster for model {raster.metadata['model_version']} "
+                          f"mapped from {self.path}")
+            except Exception as e:
+                self._last_error = str(e)
+                print(f"Error building need raster: {e}")
+
+    def status(self) -> dict:
+        """Describe the raster state (used by the /debug endpoint)"""
+        raster = self._current
+        return {
+            'available': raster is not None,
+            'building': self._building,
+            'model_version': raster.metadata['model_version'] if raster else None,
+            'built_at': raster.metadata['built_at'] if raster else None,
+            'shape': [raster.rows, raster.cols] if raster else None,
+            'built_here': self._built,
+            'last_error': self._last_error,
+        }
+
+
+# Shared by every importer in this process
+need_raster = RasterStore()
+
+# Rasters mapped by open_raster, by path
+_opened_rasters = {}
+
+
+def open_raster(path: Path, checksum: Optional[str] = None) -> Raster:
+    """
+    The raster at path, mapped once per process
+
+    For jobs on inference workers, which get the path and checksum rather
+    than the Raster and its memory map. The served raster is reused when it
+    matches; otherwise the file is mapped again if it changed.
+
+    Raises:
+        FileNotFoundError: if there is no raster at path
+    """
+    path = Path(path)
+    for raster in (need_raster._current, _opened_rasters.get(path)):
+        if raster is not None and raster.path == path and checksum in (None, raster.checksum):
+            return raster
+    raster = _opened_rasters[path] = Raster(map_arrays(path))
+    return raster
@@ -0,0 +1,194 @@
+"""
+Regional food insecurity rates from USDA data, looked up by coordinates
+
+scripts/build_regional_rates.py turns the USDA state (and, when
+available, county) rates into a lat/lng grid: every cell holds the region
+whose centroid is nearest to the cell center, within
+RATES_MAX_DISTANCE_KM. The grid is stored in the bundle layout
+(models/bundle.py), so a lookup is two multiplications and an array index
+into a memory-mapped file, for a single location or a whole batch.
+
+Training (scripts/collect_data.py) and inference (models/predict.py) both
+use it for locations without a food_insecurity_rate, so they see the same
+values without any network calls. Locations outside the grid, or too far
+from every centroid, get NaN and fall back to the previous estimates.
+"""
+
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from models.bundle import map_arrays, write_arrays
+from models.registry import MODELS_DIR
+
+REGIONAL_RATES_PATH = Path(os.getenv('REGIONAL_RATES_PATH', MODELS_DIR / "regional_rates.bundle"))
+# south,west,north,east in degrees (default: the 50 states and Puerto Rico)
+RATES_BOUNDS = os.getenv('RATES_BOUNDS', '17,-180,72,-64')
+# Cell size in degrees
+RATES_RESOLUTION = float(os.getenv('RATES_RESOLUTION', '0.05'))
+# Cells farther than this from every region centroid have no rate
+RATES_MAX_DISTANCE_KM = float(os.getenv('RATES_MAX_DISTANCE_KM', '500'))
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class RegionalRates:
+    """A memory-mapped grid of regional food insecurity rates"""
+
+    def __init__(self, mapped):
+        self.path = mapped.path
+        self.metadata = mapped.metadata
+        self.checksum = mapped.checksum
+        # Region of each cell (-1 = none) and the rate of each region
+        self.cells = mapped.array('cells')
+        self.region_rates = mapped.array('rates')
+        # Rate of each cell, NaN where there is none
+        self.cell_rates = np.append(self.region_rates, np.nan)
+        self.south, self.west, self.north, self.east = self.metadata['bounds']
+        self.resolution = self.metadata['resolution']
+        self.rows, self.cols = self.cells.shape
+
+    def rate(self, latitude: float, longitude: float) -> Optional[float]:
+        """Rate at one location, or None if it has none"""
+        row = math.floor((latitude - self.south) / self.resolution)
+        col = math.floor((longitude - self.west) / self.resolution)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        region = self.cells[row, col]
+        return None if region < 0 else float(self.region_rates[region])
+
+    def rates(self, latitude, longitude) -> np.ndarray:
+        """
+        Rates at many locations
+
+        Args:
+            latitude, longitude: array-likes, one entry per location
+
+        Returns:
+            float64 array, NaN where a location has no rate
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        row = np.floor((latitude - self.south) / self.resolution)
+        col = np.floor((longitude - self.west) / self.resolution)
+        inside = (row >= 0) & (row < self.rows) & (col >= 0) & (col < self.cols)
+        region = np.full(latitude.shape, -1, dtype=np.int64)
+        region[inside] = self.cells[row[inside].astype(np.int64), col[inside].astype(np.int64)]
+        return self.cell_rates[region]
+
+
+def _unit_vectors(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    lat, lng = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)])
+
+
+def build_regional_rates(
+    regions: list,
+    path: Path = REGIONAL_RATES_PATH,
+    bounds: tuple = None,
+    resolution: float = RATES_RESOLUTION,
+    max_distance_km: float = RATES_MAX_DISTANCE_KM,
+    source: str = '',
+) -> RegionalRates:
+    """
+    Assign every grid cell the rate of the region with the nearest centroid
+
+    Args:
+        regions: dicts with name, level ('state' or 'county'), latitude,
+            longitude (centroid), food_insecurity_rate (0-1) and year
+        bounds: (south, west, north, east) (default: RATES_BOUNDS)
+        resolution: cell size in degrees
+        max_distance_km: cells farther than this from every centroid get no rate
+        source: description of the input files (stored in the metadata)
+
+    Returns:
+        the new grid, mapped from path
+    """
+    from scipy.spatial import cKDTree
+
+    if not regions:
+        raise ValueError("No regions with a food insecurity rate and a centroid")
+    if len(regions) >= np.iinfo(np.int16).max:
+        raise ValueError(f"Too many regions: {len(regions)}")
+
+    south, west, north, east = bounds or tuple(float(value) for value in RATES_BOUNDS.split(','))
+    rows = math.ceil(round((north - south) / resolution, 6))
+    cols = math.ceil(round((east - west) / resolution, 6))
+
+    centroids = _unit_vectors(
+        np.array([region['latitude'] for region in regions]),
+        np.array([region['longitude'] for region in regions]),
+    )
+    tree = cKDTree(centroids)
+    # Chord length on the unit sphere of max_distance_km
+    max_chord = 2 * math.sin(min(max_distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+
+    cells = np.empty((rows, cols), dtype=np.int16)
+    longitude = west + (np.arange(cols) + 0.5) * resolution
+    for row in range(rows):
+        latitude = np.full(cols, south + (row + 0.5) * resolution)
+        distance, nearest = tree.query(_unit_vectors(latitude, longitude), distance_upper_bound=max_chord)
+        cells[row] = np.where(np.isinf(distance), -1, nearest)
+
+    write_arrays(path, {
+        'cells': cells,
+        'rates': np.array([region['food_insecurity_rate'] for region in regions], dtype=np.float64),
+    }, {
+        'bounds': [south, west, north, east],
+        'resolution': resolution,
+        'max_distance_km': max_distance_km,
+        'regions': [[region['name'], region['level'], region.get('year')] for region in regions],
+        'source': source,
+    })
+    return RegionalRates(map_arrays(path))
+
+
+_rates = None
+_opened = False
+_lock = threading.Lock()
+
+def get_regional_rates() -> Optional[RegionalRates]:
+    """The process-wide grid, mapped on first use; None if it was never built"""
+    global _rates, _opened
+    if not _opened:
+        with _lock:
+            if not _opened:
+                try:
+                    _rates = RegionalRates(map_arrays(REGIONAL_RATES_PATH))
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"Error loading regional food insecurity rates: {e}")
+                _opened = True
+    return _rates
+
+def lookup_rates(latitude, longitude) -> np.ndarray:
+    """Rates at many locations, NaN where there is none (or no grid)"""
+    rates = get_regional_rates()
+    if rates is None:
+        return np.full(np.shape(latitude), np.nan)
+    return rates.rates(latitude, longitude)
+
+def lookup_rate(latitude: float, longitude: float) -> Optional[float]:
+    """Rate at one location, or None"""
+    rates = get_regional_rates()
+    return rates.rate(latitude, longitude) if rates is not None else None
+
+def status() -> dict:
+    """Describe the grid (used by the /debug endpoint)"""
+    rates = get_regional_rates()
+    if rates is None:
+        return {'available': False, 'path': str(REGIONAL_RATES_PATH)}
+    levels = [level for _, level, _ in rates.metadata['regions']]
+    return {
+        'available': True,
+        'path': str(rates.path),
+        'states': levels.count('state'),
+        'counties': levels.count('county'),
+        'resolution': rates.resolution,
+        'source': rates.metadata['source'],
+    }
@@ -0,0 +1,268 @@
+"""
+Process-wide registry for the trained food necessity model
+
+The model is loaded once per process and shared by every caller (FastAPI
+app, Lambda handler, scripts). The bundle on disk is watched and a new
+model is swapped in atomically when train_model.py writes one.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+from models.bundle import load_bundle
+from models.compiled import CompiledEnsemble, HybridEnsemble, compile_ensemble
+
+MODELS_DIR = Path(__file__).parent
+# Single-file model bundle written by train_model.py (see models/bundle.py)
+BUNDLE_PATH = MODELS_DIR / "food_necessity_model.bundle"
+# Artifacts of models trained before the bundle, still loaded if no bundle exists
+MODEL_PATH = MODELS_DIR / "food_necessity_model.pkl"
+METADATA_PATH = MODELS_DIR / "model_metadata.pkl"
+# Flat-array export of the model (see models/compiled.py)
+COMPILED_MODEL_PATH = MODELS_DIR / "food_necessity_model.npz"
+# Written by train_model.py after both pickles were in place
+VERSION_MARKER_PATH = MODELS_DIR / "model.version"
+
+# Seconds between artifact checks; a negative value disables hot reload
+DEFAULT_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '5'))
+
+# 'native' serves the trained sklearn/XGBoost model, 'compiled' the pure-NumPy
+# CompiledEnsemble equivalent, and 'auto' the compiled one for batches of up
+# to COMPILED_MAX_ROWS rows and the native one above that
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'native')
+COMPILED_MAX_ROWS = int(os.getenv('COMPILED_MAX_ROWS', '64'))
+
+
+class LoadedModel(NamedTuple):
+    """An immutable snapshot of the model currently being served"""
+    model: Any
+    metadata: dict
+    generation: int
+    loaded_at: float
+
+
+class ModelRegistry:
+    """
+    Loads the model once and hot-reloads it when the artifacts change
+
+    Readers never block on a reload: the current snapshot keeps serving until
+    the replacement is fully loaded, then a single reference is swapped.
+    Missing artifacts are remembered, so callers falling back to
+    predict_need_simple don't stat the filesystem on every call.
+    """
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        metadata_path: Path = METADATA_PATH,
+        marker_path: Path = VERSION_MARKER_PATH,
+        reload_interval: float = DEFAULT_RELOAD_INTERVAL,
+        backend: str = INFERENCE_BACKEND,
+        compiled_path: Path = COMPILED_MODEL_PATH,
+        bundle_path: Path = BUNDLE_PATH,
+    ):
+        if backend not in ('native', 'compiled', 'auto'):
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.model_path = Path(model_path)
+        self.metadata_path = Path(metadata_path)
+        self.marker_path = Path(marker_path)
+        self.reload_interval = reload_interval
+        self.backend = backend
+        self.compiled_path = Path(compiled_path)
+        self.bundle_path = Path(bundle_path)
+
+        self._current: Optional[LoadedModel] = None
+        self._signature = None
+        self._missing = False
+        self._last_check = None
+        self._generation = 0
+        self._load_failures = 0
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[LoadedModel], None]] = []
+
+    def get(self) -> LoadedModel:
+        """
+        Return the current model snapshot
+
+        Raises:
+            FileNotFoundError: if no model has been trained yet
+        """
+        if self._should_check() or (self._current is None and not self._missing):
+            # Until the first load settles, wait for it rather than reporting
+            # the model as missing
+            self._refresh(block=self._current is None)
+
+        current = self._current
+        if current is None:
+            raise FileNotFoundError(
+                f"Model not found: {self.bundle_path}. Please train the model first."
+            )
+        return current
+
+    @property
+    def generation(self) -> int:
+        """
+        Generation of the loaded model, 0 before the first load
+
+        Never checks the artifacts or loads anything, so it is safe to read
+        on the event loop; reloads happen in get(), on the inference workers.
+        """
+        current = self._current
+        return current.generation if current is not None else 0
+
+    @property
+    def check_due(self) -> bool:
+        """Whether the next get() will check the artifacts for a new model"""
+        return self._should_check()
+
+    def reload(self) -> Optional[LoadedModel]:
+        """Force a check of the artifacts, loading them if they changed"""
+        self._refresh(block=True, force=True)
+        return self._current
+
+    def add_listener(self, callback: Callable[[LoadedModel], None]):
+        """Register a callback invoked with the new snapshot after each (re)load"""
+        self._listeners.append(callback)
+
+    def status(self) -> dict:
+        """Describe the registry state (used by the /debug endpoint)"""
+        current = self._current
+        return {
+            'model_loaded': current is not None,
+            'model_missing': self._missing,
+            'generation': current.generation if current else 0,
+            'load_failures': self._load_failures,
+            'model_version': current.metadata.get('model_version', '1.0.0') if current else None,
+            'checksum': current.metadata.get('checksum') if current else None,
+            'loaded_at': current.loaded_at if current else None,
+            'reload_interval': self.reload_interval,
+            'backend': self.backend,
+        }
+
+    def _should_check(self) -> bool:
+        if self._last_check is None:
+            return True
+        if self.reload_interval < 0:
+            return False
+        return time.monotonic() - self._last_check >= self.reload_interval
+
+    def _is_fresh(self) -> bool:
+        settled = self._current is not None or self._missing
+        return settled and not self._should_check()
+
+    def _artifact_signature(self):
+        """Cheap fingerprint of the artifacts, or None if they are missing"""
+        try:
+            if self.bundle_path.exists():
+                # Replaced by rename, so a new bundle is a new inode
+                st = self.bundle_path.stat()
+                return ('bundle', st.st_ino, st.st_mtime_ns, st.st_size)
+            if self.marker_path.exists():
+                return ('marker', self.marker_path.read_text().strip())
+            if self.backend == 'compiled' and self.compiled_path.exists():
+                paths = [self.compiled_path]
+            else:
+                paths = [self.model_path, self.metadata_path]
+            stats = [path.stat() for path in paths]
+        except FileNotFoundError:
+            return None
+        return ('mtime',) + tuple((st.st_mtime_ns, st.st_size) for st in stats)
+
+    def _compiled_is_current(self) -> bool:
+        """Whether the .npz export is at least as new as the pickled model"""
+        try:
+            compiled_mtime = self.compiled_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        try:
+            return compiled_mtime >= self.model_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            # Deployed with only the compiled artifact (e.g. Lambda)
+            return True
+
+    def _load(self):
+        """Load (model, metadata) for the configured backend"""
+        if self.bundle_path.exists():
+            return self._load_bundle()
+
+        if self.backend == 'compiled' and self._compiled_is_current():
+            # Self-contained export: skips unpickling and importing sklearn
+            compiled = CompiledEnsemble.load(self.compiled_path)
+            if compiled.metadata is not None:
+                return compiled, compiled.metadata
+
+        import joblib
+
+        model = joblib.load(self.model_path)
+        metadata = joblib.load(self.metadata_path)
+        if self.backend != 'native':
+            if self._compiled_is_current():
+                compiled = CompiledEnsemble.load(self.compiled_path)
+            else:
+                compiled = compile_ensemble(model)
+            if self.backend == 'compiled':
+                model = compiled
+            else:
+                model = HybridEnsemble(model, compiled, COMPILED_MAX_ROWS)
+        return model, metadata
+
+    def _load_bundle(self):
+        bundle = load_bundle(self.bundle_path)
+        metadata = dict(bundle.metadata, checksum=bundle.checksum)
+        # The compiled arrays stay memory-mapped; the native model is only
+        # unpickled when the backend serves it
+        compiled = bundle.compiled()
+        if self.backend == 'compiled':
+            return compiled, metadata
+        model = bundle.load_model()
+        if self.backend == 'auto':
+            model = HybridEnsemble(model, compiled, COMPILED_MAX_ROWS)
+        return model, metadata
+
+    def _refresh(self, block: bool, force: bool = False):
+        if not self._lock.acquire(blocking=block):
+            # Another thread is already reloading; keep serving the current model
+            return
+        try:
+            if not force and self._is_fresh():
+                # Another thread checked while we were waiting for the lock
+                return
+            self._last_check = time.monotonic()
+
+            signature = self._artifact_signature()
+            if signature is None:
+                # Keep serving a previously loaded model if the files disappear
+                self._missing = self._current is None
+                return
+            if signature == self._signature:
+                return
+
+            try:
+                model, metadata = self._load()
+            except Exception as e:
+                # Most likely a partially written artifact; retry on the next check
+                print(f"Error loading model: {e}")
+                self._load_failures += 1
+                self._missing = self._current is None
+                return
+
+            self._generation += 1
+            loaded = LoadedModel(model, metadata, self._generation, time.time())
+            self._current = loaded
+            self._signature = signature
+            self._missing = False
+        finally:
+            self._lock.release()
+
+        for callback in list(self._listeners):
+            try:
+                callback(loaded)
+            except Exception as e:
+                print(f"Error in model reload listener: {e}")
+
+
+# Shared by every importer in this process
+registry = ModelRegistry()
@@ -0,0 +1,91 @@
+"""
+Per-request stage timers
+
+The API (api/timing.py) starts a StageTimer for each request, and the
+inference pool starts one for each job on its workers; code on the request
+path wraps its phases in `with stage('model'):` and the elapsed time is
+added to the active timer. Without an active timer (scripts, Lambda,
+training) stage() only looks up a context variable.
+"""
+
+import functools
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+class StageTimer:
+    """Seconds spent in each named stage of one request or inference job"""
+
+    __slots__ = ('start', 'received', 'mark', 'stages', 'profile', 'profiles')
+
+    def __init__(self, profile: bool = False):
+        self.start = time.perf_counter()
+        # When the request body was fully read and the last inference job ended
+        self.received = None
+        self.mark = None
+        self.stages = {}
+        # Whether to profile this request, and the profiles of its jobs
+        self.profile = profile
+        self.profiles = []
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, stages: dict):
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+
+    def inference_started(self):
+        """Close the 'validate' stage (body parsing and validation) at the first inference job"""
+        if 'validate' not in self.stages:
+            self.stages['validate'] = time.perf_counter() - (self.received or self.start)
+
+    def inference_finished(self):
+        self.mark = time.perf_counter()
+
+
+_timer: ContextVar[Optional[StageTimer]] = ContextVar('stage_timer', default=None)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _timer.get()
+
+def activate(timer: Optional[StageTimer]):
+    """Make timer the active one in this context; returns a token for deactivate()"""
+    return _timer.set(timer)
+
+def deactivate(token):
+    _timer.reset(token)
+
+class stage:
+    """
+    Add the time spent in a block to the active timer, if any
+
+    Used as `with stage('model'):`, or as a decorator to time every call of
+    a function. A class rather than @contextmanager, which costs a few
+    microseconds per block even without an active timer.
+    """
+
+    __slots__ = ('name', 'timer', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timer = _timer.get()
+        if self.timer is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            self.timer.add(self.name, time.perf_counter() - self.start)
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return timed
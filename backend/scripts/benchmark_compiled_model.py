@@ -0,0 +1,84 @@
+"""
+Check and benchmark the compiled (pure-NumPy) tree ensemble
+
+For each model family train_model.py can select, fits a model on the
+training data, flattens it with models.compiled.compile_ensemble and:
+- verifies the compiled predictions match the native model.predict
+- compares latency for batch sizes 1, 100 and 10k
+
+Exits with a non-zero status if any parity check fails.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.compiled import compile_ensemble
+from scripts.train_model import candidate_models, load_training_data, prepare_features
+
+BATCH_SIZES = [1, 100, 10000]
+
+# Largest allowed |native - compiled| per model family (also used by
+# tests/test_compiled_model.py): XGBoost accumulates in float32, sklearn
+# matches to rounding error
+TOLERANCE = {
+    'random_forest': 1e-12,
+    'gradient_boosting': 1e-12,
+    'xgboost': 1e-5,
+}
+
+def perturbed_rows(X: np.ndarray, n: int, seed: int = 42) -> np.ndarray:
+    """Sample n training rows and jitter them so they hit unseen paths"""
+    rng = np.random.default_rng(seed)
+    rows = X[rng.integers(0, len(X), n)]
+    return rows * rng.uniform(0.9, 1.1, rows.shape)
+
+def time_call(fn, repeat: int = 5) -> float:
+    """Return the median wall-clock time of fn() in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def main():
+    print("Compiled Model Parity & Latency")
+    print("=" * 50)
+
+    X, y, _, _ = prepare_features(load_training_data())
+    rows = perturbed_rows(X.to_numpy(), max(BATCH_SIZES))
+
+    all_match = True
+    for name, model in candidate_models(cores_per_model=os.cpu_count() or 1).items():
+        model.fit(X, y)
+        compiled = compile_ensemble(model)
+
+        native_pred = model.predict(rows)
+        compiled_pred = compiled.predict(rows)
+        max_error = float(np.abs(native_pred - compiled_pred).max())
+        match = max_error <= TOLERANCE[name]
+        all_match &= match
+
+        print(f"\n{name}: {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}")
+        print(f"  parity: max |native - compiled| = {max_error:.2e}, tolerance {TOLERANCE[name]:.0e} "
+              f"({'OK' if match else 'MISMATCH'})")
+        print(f"  {'rows':>8} {'native (ms)':>12} {'compiled (ms)':>14} {'speedup':>9}")
+        for n in BATCH_SIZES:
+            batch = rows[:n]
+            native = time_call(lambda: model.predict(batch))
+            fast = time_call(lambda: compiled.predict(batch))
+            print(f"  {n:>8} {native * 1000:>12.3f} {fast * 1000:>14.3f} {native / fast:>8.1f}x")
+
+    if not all_match:
+        print("\nParity check FAILED: compiled predictions diverge from the native models")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark the partitioned Parquet training store against a single CSV
+
+Writes the same synthetic training rows (spread over three years) as CSV and
+as the partitioned dataset, then compares size on disk, write time, full
+read time and memory, a column-projected read (what train_model.py loads)
+and a partition-pruned read (one month of one year). Checks the round trip
+matches the input at float32 precision.
+
+Exits with a non-zero status if the round trip does not match.
+
+Usage:
+    python scripts/benchmark_dataset_store.py [rows]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts import dataset_store
+from scripts.train_model import TRAINING_COLUMNS
+
+SEASONS = np.array(['winter', 'winter', 'spring', 'spring', 'spring', 'summer',
+                    'summer', 'summer', 'fall', 'fall', 'fall', 'winter'])
+
+
+def synthetic_rows(n: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    month = rng.integers(1, 13, n)
+    food_insecurity_rate = rng.uniform(0.05, 0.25, n)
+    return pd.DataFrame({
+        'latitude': rng.uniform(25, 50, n),
+        'longitude': rng.uniform(-125, -65, n),
+        'month': month,
+        'season': SEASONS[month - 1],
+        'food_insecurity_rate': food_insecurity_rate,
+        'poverty_rate': food_insecurity_rate * rng.uniform(1.1, 1.5, n),
+        'historical_donations': rng.poisson(5, n),
+        'historical_requests': rng.poisson(8, n),
+        'monetary_donations': rng.poisson(3, n),
+        'population': rng.integers(500, 50000, n),
+        'need_score': rng.uniform(0, 1, n),
+        'year': rng.integers(2023, 2026, n),
+    })
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def disk_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    print("Training Data Store Benchmark")
+    print("=" * 50)
+
+    df = synthetic_rows(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_store.DATASET_DIR = Path(tmp) / "training_data"
+        csv_path = Path(tmp) / "training_data.csv"
+
+        _, csv_write = timed(lambda: df.drop(columns='year').to_csv(csv_path, index=False))
+        csv_df, csv_read = timed(lambda: pd.read_csv(csv_path))
+        _, pq_write = timed(lambda: dataset_store.write_training_data(df))
+        pq_df, pq_read = timed(lambda: dataset_store.load_training_data())
+        _, pq_projected = timed(lambda: dataset_store.load_training_data(TRAINING_COLUMNS))
+        pruned, pq_pruned = timed(lambda: dataset_store.load_training_data(years=[2024], months=[1]))
+
+        expected = dataset_store.compact(df)
+        key = ['year', 'month', 'latitude', 'longitude']
+        actual = pq_df[expected.columns].sort_values(key).reset_index(drop=True)
+        expected = expected.sort_values(key).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_categorical=False)
+            match = True
+        except AssertionError as e:
+            print(e)
+            match = False
+        match &= len(pruned) == int(((df['year'] == 2024) & (df['month'] == 1)).sum())
+
+        csv_size, pq_size = disk_size(csv_path), disk_size(dataset_store.DATASET_DIR)
+
+    print(f"{n:,} rows, round trip: {'OK' if match else 'MISMATCH'}\n")
+    print(f"  {'':<26} {'CSV':>10} {'Parquet':>10}")
+    print(f"  {'size on disk (MB)':<26} {csv_size / 1e6:>10.1f} {pq_size / 1e6:>10.1f}")
+    print(f"  {'memory after load (MB)':<26} {csv_df.memory_usage(deep=True).sum() / 1e6:>10.1f} "
+          f"{pq_df.memory_usage(deep=True).sum() / 1e6:>10.1f}")
+    print(f"  {'write (s)':<26} {csv_write:>10.2f} {pq_write:>10.2f}")
+    print(f"  {'full read (s)':<26} {csv_read:>10.2f} {pq_read:>10.2f}")
+    print(f"  {'training columns (s)':<26} {'':>10} {pq_projected:>10.2f}")
+    print(f"  {'one month partition (s)':<26} {'':>10} {pq_pruned:>10.3f}")
+
+    if not match:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
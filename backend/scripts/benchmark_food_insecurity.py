@@ -0,0 +1,247 @@
+"""
+Check and benchmark food insecurity estimation against a local stub server
+
+Starts a stub generateContent endpoint on localhost (fixed latency) and
+points FoodInsecurityEstimator at it. Some locations misbehave: flaky ones
+fail their first attempt with a 503, broken ones always get a 500, garbage
+ones get a non-numeric answer and slow ones answer after the client's
+timeout. Checks, from what the server actually received:
+- deduplication: each distinct location is requested once, plus only the
+  retries of failed attempts, however many times it is looked up
+- error handling: flaky locations are retried and get the stub's rate;
+  broken, garbage and slow ones fall back to the default rate without
+  raising, as does an unreachable server or a missing API key
+- cache hits: only successful rates are written to the disk cache, and a
+  second run requests nothing but the locations that failed
+
+and compares wall-clock time with the previous behaviour of one blocking
+call per location and month.
+
+Exits with a non-zero status if any check fails.
+
+Usage:
+    python scripts/benchmark_food_insecurity.py [locations] [latency_ms]
+"""
+
+import json
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.food_insecurity import DEFAULT_FOOD_INSECURITY_RATE, FoodInsecurityEstimator, parse_rate
+
+# Every Nth distinct location is flaky
+FAIL_EVERY = 7
+RETRIES = 3
+# Client timeout and the stub's latency for slow locations (seconds)
+TIMEOUT = 0.2
+SLOW_LATENCY = 0.5
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    """Answers with a rate derived from the coordinates in the prompt"""
+
+    latency = 0.05
+    # Locations ("lat,lng" as in the prompt) that misbehave, see the module docstring
+    flaky = set()
+    broken = set()
+    garbage = set()
+    slow = set()
+    # Location -> requests received
+    attempts = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.attempts = {}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        text = body['contents'][0]['parts'][0]['text']
+        key = text.split('(')[1].split(')')[0].replace(' ', '')
+        with self.lock:
+            attempt = self.attempts[key] = self.attempts.get(key, 0) + 1
+
+        if key in self.slow:
+            # The client has given up by now
+            time.sleep(SLOW_LATENCY)
+            return
+        time.sleep(self.latency)
+
+        if key in self.broken or (key in self.flaky and attempt == 1):
+            self.send_response(500 if key in self.broken else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        lat, lng = key.split(',')
+        answer = 'unknown' if key in self.garbage else str(stub_rate(float(lat), float(lng)))
+        payload = json.dumps({'candidates': [{'content': {'parts': [{'text': answer}]}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def stub_rate(lat: float, lng: float) -> float:
+    return round(0.05 + (abs(lat * 7 + lng * 3) % 20) / 100, 4)
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    StubGeminiHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeminiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_checks(url: str, n_locations: int, cache_path: Path) -> tuple:
+    """
+    Run the deduplication, error handling and cache checks against the stub at url
+
+    Returns:
+        (dict of check name -> passed, lookups, cold run seconds, warm run seconds)
+    """
+    stub = StubGeminiHandler
+    rng = np.random.default_rng(42)
+    locations = [
+        (round(float(lat), 2), round(float(lng), 2))
+        for lat, lng in zip(rng.uniform(25, 49, n_locations), rng.uniform(-124, -67, n_locations))
+    ]
+    # Distinct misbehaving locations, outside the random ones' range
+    stub.broken = {f"{10 + i}.00,-60.00" for i in range(3)}
+    stub.garbage = {f"{20 + i}.00,-60.00" for i in range(3)}
+    stub.slow = {f"{50 + i}.00,-60.00" for i in range(2)}
+    failing = stub.broken | stub.garbage | stub.slow
+    locations += [tuple(float(value) for value in key.split(',')) for key in sorted(failing)]
+
+    def estimator(**kwargs):
+        settings = dict(api_key='stub', api_url=url, cache_path=cache_path,
+                        retries=RETRIES, timeout=TIMEOUT, backoff=0.01)
+        settings.update(kwargs)
+        return FoodInsecurityEstimator(**settings)
+
+    # What build_training_frame used to do: every location for every month
+    lookups = [loc for loc in locations for _ in range(12)]
+    cold = estimator()
+    unique = sorted({cold.key(lat, lng) for lat, lng in lookups})
+    good = [key for key in unique if key not in failing]
+    stub.flaky = set(good[::FAIL_EVERY])
+    checks = {}
+
+    stub.reset()
+    start = time.perf_counter()
+    rates = cold.estimate_many(lookups)
+    cold_time = time.perf_counter() - start
+    attempts = dict(stub.attempts)
+
+    expected = [
+        DEFAULT_FOOD_INSECURITY_RATE if cold.key(lat, lng) in failing else stub_rate(lat, lng)
+        for lat, lng in lookups
+    ]
+    checks['rates match the stub, defaults for failures'] = bool(np.allclose(rates, expected))
+    checks['each location requested once'] = cold.requests_made == len(unique) and sorted(attempts) == unique
+    checks['successes not retried'] = all(attempts[key] == 1 for key in good if key not in stub.flaky)
+    checks['flaky locations retried once'] = all(attempts[key] == 2 for key in stub.flaky)
+    checks['broken and slow locations retried until the limit'] = all(
+        attempts[key] == RETRIES + 1 for key in stub.broken | stub.slow
+    )
+    checks['garbage answers not retried'] = all(attempts[key] == 1 for key in stub.garbage)
+
+    saved = json.loads(cache_path.read_text())
+    checks['only successful rates cached'] = sorted(saved) == good
+
+    stub.reset()
+    warm = estimator()
+    start = time.perf_counter()
+    warm_rates = warm.estimate_many(lookups)
+    warm_time = time.perf_counter() - start
+    checks['second run requests only the failures'] = (
+        warm_rates == rates and sorted(stub.attempts) == sorted(failing) and warm.requests_made == len(failing)
+    )
+
+    stub.reset()
+    unreachable = estimator(api_url=f"http://127.0.0.1:{unused_port()}/generateContent",
+                            cache_path=cache_path.with_name('unreachable.json'))
+    checks['unreachable server falls back to the default'] = (
+        unreachable.estimate_many(lookups[:24]) == [DEFAULT_FOOD_INSECURITY_RATE] * 24
+    )
+    checks['no API key makes no requests'] = (
+        estimator(api_key='').estimate_many(lookups[:24]) == [DEFAULT_FOOD_INSECURITY_RATE] * 24
+        and not stub.attempts
+    )
+    return checks, lookups, cold_time, warm_time
+
+
+def legacy_estimate(url: str, lat: float, lng: float) -> float:
+    """The previous implementation: a fresh blocking request per call"""
+    try:
+        response = requests.post(
+            url,
+            params={'key': 'stub'},
+            json={"contents": [{"parts": [{"text": f"Based on coordinates ({lat}, {lng}), ..."}]}]},
+            timeout=10
+        )
+        if response.ok:
+            return parse_rate(response.json())
+    except Exception:
+        pass
+    return 0.12
+
+
+def main():
+    n_locations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    print("Food Insecurity Estimation (stub server)")
+    print("=" * 50)
+
+    server = start_stub_server(latency)
+    url = f"http://127.0.0.1:{server.server_port}/generateContent"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checks, lookups, cold_time, warm_time = run_checks(url, n_locations, Path(tmp) / "cache.json")
+
+    print(f"\n{len(lookups)} lookups, {len(set(lookups))} unique locations")
+    for name, passed in checks.items():
+        print(f"  {name}: {'OK' if passed else 'MISMATCH'}")
+
+    # Sequential per-month calls, timed on a sample and extrapolated
+    sample = lookups[:60]
+    start = time.perf_counter()
+    for lat, lng in sample:
+        legacy_estimate(url, lat, lng)
+    legacy_time = (time.perf_counter() - start) * len(lookups) / len(sample)
+
+    print(f"\n  {'mode':<36} {'time (s)':>9}")
+    print(f"  {'sequential, per location x month':<36} {legacy_time:>9.2f} (extrapolated)")
+    print(f"  {'deduplicated + concurrent':<36} {cold_time:>9.2f}")
+    print(f"  {'disk cache (failures re-requested)':<36} {warm_time:>9.3f}")
+
+    server.shutdown()
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Check and benchmark the historical-count spatial index
+
+Writes a synthetic ingest snapshot (donations/requests/monetary donations
+clustered around US cities, over several years), then:
+- checks the index against the counts training derives from the same rows
+  (scripts/collect_data.py) at every training location and month
+- checks a wider radius against a brute-force distance count
+- checks that loading the snapshot in appended pieces (incremental inserts)
+  gives the same counts as loading it at once
+- times batched radius queries against one query per location (the
+  predict_need path) and against a scikit-learn BallTree
+
+Usage:
+    python scripts/benchmark_history_index.py [events_per_table]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.history import COUNT_COLUMNS, HISTORY_TABLES, KM_PER_DEGREE, HistoryIndex
+from scripts.collect_data import aggregate_by_location, count_by_location_month
+from scripts.ingest import TABLE_COLUMNS, Snapshot
+
+CITIES = np.array([
+    (40.7128, -74.0060), (34.0522, -118.2437), (41.8781, -87.6298), (29.7604, -95.3698),
+    (33.4484, -112.0740), (39.9526, -75.1652), (47.6062, -122.3321), (39.7392, -104.9903),
+])
+
+
+def synthetic_events(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    city = CITIES[rng.integers(0, len(CITIES), n)]
+    seconds = rng.integers(0, 4 * 365 * 86400, n)
+    return pd.DataFrame({
+        'latitude': city[:, 0] + rng.normal(0, 0.15, n),
+        'longitude': city[:, 1] + rng.normal(0, 0.15, n),
+        'created_at': pd.Timestamp('2021-01-01', tz='UTC') + pd.to_timedelta(np.sort(seconds), unit='s'),
+    })
+
+
+def write_snapshot(directory: Path, tables: dict, pieces: int = 1):
+    """Append each table to a snapshot in pieces, yielding after each piece"""
+    snapshot = Snapshot(directory)
+    for i in range(pieces):
+        for table, df in tables.items():
+            bounds = np.linspace(0, len(df), pieces + 1).astype(int)
+            rows = df.iloc[bounds[i]:bounds[i + 1]]
+            snapshot.append(table, rows.set_axis(TABLE_COLUMNS[table], axis=1))
+        yield
+
+
+def check_training_parity(index: HistoryIndex, tables: dict) -> bool:
+    expected = None
+    for table, (column, _, _) in HISTORY_TABLES.items():
+        agg = aggregate_by_location(tables[table], 'latitude', 'longitude', 'created_at')
+        counts = count_by_location_month(agg, column)
+        expected = counts if expected is None else expected.merge(
+            counts, on=['lat_rounded', 'lng_rounded', 'month'], how='outer'
+        )
+    expected = expected.fillna(0)
+
+    found = index.counts(expected['lat_rounded'], expected['lng_rounded'], expected['month'])
+    ok = all(np.array_equal(found[column], expected[column].to_numpy(dtype=np.int64)) for column in COUNT_COLUMNS)
+    print(f"  {len(expected):,} training location-months, counts equal to training: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def brute_force(index: HistoryIndex, latitude, longitude, month, radius_km) -> np.ndarray:
+    grid = index._grid
+    keys, point_lat, point_lng, point_kind = grid._merged()
+    point_month = keys // (grid.rows * grid.cols)
+    counts = np.zeros((len(latitude), len(COUNT_COLUMNS)), dtype=np.int64)
+    for i, (lat, lng, m) in enumerate(zip(np.round(latitude, 2), np.round(longitude, 2), month)):
+        dy = (point_lat - lat) * KM_PER_DEGREE
+        dx = (point_lng - lng) * KM_PER_DEGREE * np.cos(np.radians(lat))
+        within = (dx * dx + dy * dy <= radius_km ** 2 + 1e-9) & (point_month == m)
+        counts[i] = np.bincount(point_kind[within], minlength=len(COUNT_COLUMNS))
+    return counts
+
+
+def random_queries(n: int, seed: int = 1) -> tuple:
+    rng = np.random.default_rng(seed)
+    city = CITIES[rng.integers(0, len(CITIES), n)]
+    return (city[:, 0] + rng.normal(0, 0.15, n), city[:, 1] + rng.normal(0, 0.15, n),
+            rng.integers(1, 13, n))
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    tables = {table: synthetic_events(events, seed) for seed, table in enumerate(HISTORY_TABLES)}
+
+    print("History Index Benchmark")
+    print("=" * 50)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        whole, pieces = Path(tmp) / "whole", Path(tmp) / "pieces"
+        for _ in write_snapshot(whole, tables):
+            pass
+
+        index = HistoryIndex(whole, radius_km=0.5, refresh_interval=-1, enabled=True)
+        start = time.perf_counter()
+        index.refresh(force=True)
+        print(f"{events:,} events per table -> {index.status()['buckets']:,} (cell, month, year) buckets, "
+              f"loaded in {time.perf_counter() - start:.2f}s\n")
+
+        ok &= check_training_parity(index, tables)
+
+        wide = HistoryIndex(whole, radius_km=3.0, refresh_interval=-1, enabled=True)
+        wide.refresh(force=True)
+        latitude, longitude, month = random_queries(2000)
+        same = np.array_equal(
+            np.column_stack(list(wide.counts(latitude, longitude, month).values())),
+            brute_force(wide, latitude, longitude, month, 3.0),
+        )
+        print(f"  3 km radius, 2,000 queries equal to brute force: {'OK' if same else 'MISMATCH'}")
+        ok &= same
+
+        incremental = HistoryIndex(pieces, radius_km=0.5, refresh_interval=-1, enabled=True)
+        refresh_seconds = []
+        for _ in write_snapshot(pieces, tables, pieces=4):
+            start = time.perf_counter()
+            incremental.refresh(force=True)
+            refresh_seconds.append(time.perf_counter() - start)
+        latitude, longitude, month = random_queries(20_000)
+        same = all(
+            np.array_equal(a, b) for a, b in zip(
+                incremental.counts(latitude, longitude, month).values(),
+                index.counts(latitude, longitude, month).values(),
+            )
+        )
+        print(f"  4 appended pieces (refreshes {', '.join(f'{s:.2f}' for s in refresh_seconds)}s) "
+              f"equal to one load: {'OK' if same else 'MISMATCH'}")
+        ok &= same
+
+        print(f"\n  {'queries':>8} {'batched (ms)':>13} {'one by one (ms)':>16} {'BallTree (ms)':>14}")
+        keys, point_lat, point_lng, point_kind = index._grid._merged()
+        point_month = keys // (index._grid.rows * index._grid.cols)
+        trees = {
+            m: (BallTree(np.radians(np.column_stack([point_lat, point_lng])[point_month == m]), metric='haversine'),
+                point_kind[point_month == m])
+            for m in range(1, 13)
+        }
+        for n in [1, 100, 10_000]:
+            latitude, longitude, month = random_queries(n, seed=n)
+            start = time.perf_counter()
+            index.counts(latitude, longitude, month)
+            batched = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for i in range(min(n, 1000)):
+                index.fill_row(latitude[i], longitude[i], int(month[i]), (None, None, None))
+            single = (time.perf_counter() - start) * 1000 * n / min(n, 1000)
+
+            start = time.perf_counter()
+            query = np.radians(np.column_stack([np.round(latitude, 2), np.round(longitude, 2)]))
+            for m in range(1, 13):
+                rows = month == m
+                if rows.any():
+                    tree, kinds = trees[m]
+                    for found in tree.query_radius(query[rows], r=0.5 / 6371.0088):
+                        np.bincount(kinds[found], minlength=len(COUNT_COLUMNS))
+            ball_tree = (time.perf_counter() - start) * 1000
+
+            print(f"  {n:>8,} {batched:>13.2f} {single:>16.2f} {ball_tree:>14.2f}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
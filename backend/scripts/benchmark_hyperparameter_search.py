@@ -0,0 +1,100 @@
+"""
+Compare successive-halving search with evaluating every configuration
+
+On synthetic training data, runs search_hyperparameters and then, for
+the same sampled configurations, fits every one at full size. Reports per
+model family the best validation R² of any configuration and that of the
+configuration successive halving picked, the time both approaches take,
+and the test R² train_models gets with the default and with the searched
+hyperparameters.
+
+Usage:
+    python scripts/benchmark_hyperparameter_search.py [rows]
+"""
+
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts import dataset_store, hyperparameter_search
+from scripts.collect_data import generate_synthetic_chunk
+from scripts.hyperparameter_search import SEARCH_ETA, SEARCH_RUNGS, SEARCH_SPACES, sample_configs
+from scripts.train_model import candidate_models, prepare_features, split_rows, train_models
+
+
+def full_size_search(X, y, chosen: dict, seed: int = 42) -> dict:
+    """
+    Fit every configuration the search samples at full size (same rows)
+
+    Returns:
+        dict of family to (seconds, best val R², val R² of the chosen config)
+    """
+    rng = np.random.default_rng(seed)
+    train_idx, _ = split_rows(len(X))
+    train_idx = rng.permutation(train_idx)
+    n_val = len(train_idx) // 5
+    val_idx, fit_idx = train_idx[:n_val], train_idx[n_val:]
+    X_values, y_values = X.to_numpy(dtype=np.float64), y.to_numpy()
+
+    models = candidate_models()
+    results = {}
+    for family, space in SEARCH_SPACES.items():
+        defaults = models[family].get_params()
+        default = {name: defaults[name] for name in space}
+        configs = [c for c in sample_configs(space, SEARCH_ETA ** SEARCH_RUNGS, rng) if c != default]
+        configs = [default] + configs[:SEARCH_ETA ** SEARCH_RUNGS - 1]
+
+        start = time.perf_counter()
+        best, chosen_score = -np.inf, None
+        for config in configs:
+            model = clone(models[family]).set_params(**config)
+            model.fit(X_values[fit_idx], y_values[fit_idx])
+            score = r2_score(y_values[val_idx], model.predict(X_values[val_idx]))
+            best = max(best, score)
+            if config == chosen.get(family):
+                chosen_score = score
+        results[family] = (time.perf_counter() - start, best, chosen_score)
+    return results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+
+    print("Hyperparameter Search Benchmark")
+    print("=" * 50)
+
+    df = dataset_store.compact(generate_synthetic_chunk(np.random.default_rng(7), n))
+    X, y, _, _ = prepare_features(df)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, default_metrics, _ = train_models(X, y)
+        start = time.perf_counter()
+        params = hyperparameter_search.search_hyperparameters(X, y, budget=3600)
+        search_time = time.perf_counter() - start
+        _, searched_metrics, _ = train_models(X, y, params=params)
+
+    exhaustive = full_size_search(X, y, params)
+    exhaustive_time = sum(seconds for seconds, _, _ in exhaustive.values())
+
+    print(f"{n:,} rows, {SEARCH_ETA ** SEARCH_RUNGS} configurations per family\n")
+    print(f"  {'':<34} {'time (s)':>9}")
+    print(f"  {'every configuration at full size':<34} {exhaustive_time:>9.1f}")
+    print(f"  {'successive halving':<34} {search_time:>9.1f}")
+    print(f"\n  {'val R²':<20} {'best of all':>12} {'halving pick':>13}")
+    for family, (_, best, chosen_score) in exhaustive.items():
+        print(f"  {family:<20} {best:>12.4f} {chosen_score:>13.4f}")
+    print(f"\n  test R², default hyperparameters:  {default_metrics['r2']:.4f}")
+    print(f"  test R², searched hyperparameters: {searched_metrics['r2']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
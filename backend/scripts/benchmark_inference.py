@@ -0,0 +1,85 @@
+"""
+Benchmark prediction latency for the food necessity model
+
+Reports single-location predict_need latency percentiles and compares
+scoring locations one at a time against a single vectorized
+predict_need_batch call. Train the model first
+(python scripts/train_model.py).
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.predict import predict_need, predict_need_batch, load_model
+
+BATCH_SIZES = [1, 10, 100, 1000]
+
+def random_locations(n: int, seed: int = 42) -> list:
+    """Generate n random US locations with plausible feature values"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'latitude': float(rng.uniform(25, 50)),
+            'longitude': float(rng.uniform(-125, -65)),
+            'month': int(rng.integers(1, 13)),
+            'food_insecurity_rate': float(rng.uniform(0.05, 0.25)),
+            'poverty_rate': None,
+            'historical_donations': int(rng.poisson(5)),
+            'historical_requests': int(rng.poisson(8)),
+            'monetary_donations': int(rng.poisson(3)),
+            'population': int(rng.integers(500, 50000)),
+        }
+        for _ in range(n)
+    ]
+
+def time_call(fn, repeat: int = 5) -> float:
+    """Return the median wall-clock time of fn() in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def benchmark_single(n_calls: int = 2000):
+    """Latency percentiles of single-location predict_need calls"""
+    locations = random_locations(n_calls)
+    timings = np.empty(n_calls)
+    for i, loc in enumerate(locations):
+        start = time.perf_counter()
+        predict_need(**loc)
+        timings[i] = time.perf_counter() - start
+
+    p50, p90, p99 = np.percentile(timings * 1e6, [50, 90, 99])
+    print(f"\npredict_need ({n_calls} calls): p50 {p50:.0f}us  p90 {p90:.0f}us  p99 {p99:.0f}us")
+
+def benchmark_batch():
+    """Per-row predict_need loop vs one predict_need_batch call"""
+    print(f"\n{'rows':>8} {'per-row (ms)':>14} {'batch (ms)':>12} {'speedup':>9}")
+    for n in BATCH_SIZES:
+        locations = random_locations(n)
+        per_row = time_call(lambda: [predict_need(**loc) for loc in locations], repeat=3)
+        batch = time_call(lambda: predict_need_batch(locations))
+        print(f"{n:>8} {per_row * 1000:>14.2f} {batch * 1000:>12.2f} {per_row / batch:>8.1f}x")
+
+def main():
+    print("Inference Benchmark")
+    print("=" * 50)
+
+    try:
+        load_model()
+    except FileNotFoundError as e:
+        print(f"{e}")
+        return
+
+    benchmark_single()
+    benchmark_batch()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Check and benchmark incremental ingestion against a local SQLite database
+
+Creates donations/requests/monetary_donations tables (with extra columns
+that ingestion should not pull, and an index on (created_at, id)) in a
+temporary SQLite file, then:
+- runs a full sync and checks the snapshot matches the tables
+- inserts more rows, re-syncs and checks only the new rows were fetched
+- inserts rows sharing one created_at across several pages and checks
+  each is fetched exactly once
+- appends rows without advancing the watermark (a sync that crashed
+  between the two writes) and checks the next sync stores no duplicates
+- compares the time of the incremental sync with a full select('*') reload
+
+Exits with a non-zero status if any check fails.
+
+Usage:
+    python scripts/benchmark_ingest.py [rows_per_table] [new_rows_per_table]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.ingest import ID_COLUMN, TABLE_COLUMNS, SQLSource, Snapshot, fetch_new_rows, sync_tables
+
+PAGE_SIZE = 1000
+
+
+def synthetic_rows(table: str, n: int, start: str, seed: int, spread: int = 86400 * 365) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    lat_col, lng_col, _ = TABLE_COLUMNS[table]
+    return pd.DataFrame({
+        # Unique, but not in created_at order
+        'id': seed * 10**9 + rng.permutation(n),
+        'user_id': [f"user-{i}" for i in rng.integers(0, 1000, n)],
+        'description': ['x' * 200] * n,
+        lat_col: rng.uniform(25, 49, n),
+        lng_col: rng.uniform(-124, -67, n),
+        # Naive UTC timestamps, as SQLAlchemy stores them in SQLite
+        'created_at': pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, spread, n)), unit='s'),
+    })
+
+
+def insert(engine, n: int, start: str, seed: int, spread: int = 86400 * 365):
+    for i, table in enumerate(TABLE_COLUMNS):
+        synthetic_rows(table, n, start, seed + i, spread).to_sql(table, engine, if_exists='append', index=False)
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_created_at_id ON {table} (created_at, id)"))
+
+
+def snapshot_matches(engine, snapshot: Snapshot) -> bool:
+    for table, columns in TABLE_COLUMNS.items():
+        columns = columns + [ID_COLUMN]
+        expected = pd.read_sql_table(table, engine)[columns]
+        expected['created_at'] = pd.to_datetime(expected['created_at'], utc=True)
+        actual = snapshot.load(table)[columns]
+        key = ['created_at', ID_COLUMN]
+        try:
+            pd.testing.assert_frame_equal(
+                actual.sort_values(key).reset_index(drop=True),
+                expected.sort_values(key).reset_index(drop=True),
+                check_dtype=False,
+            )
+        except AssertionError as e:
+            print(f"  {table}: {e}")
+            return False
+    return True
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_new = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+    print("Incremental Ingestion (SQLite)")
+    print("=" * 50)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/source.db"
+        engine = create_engine(url)
+        insert(engine, n, '2023-01-01', seed=1)
+        source = SQLSource(url)
+        snapshot = Snapshot(Path(tmp) / "snapshots")
+
+        start = time.perf_counter()
+        first = sync_tables(source, snapshot, PAGE_SIZE)
+        full_sync = time.perf_counter() - start
+        match = snapshot_matches(engine, snapshot)
+        ok &= match and all(count == n for count in first.values())
+        print(f"initial sync: {first} {'OK' if match else 'MISMATCH'}")
+
+        insert(engine, n_new, '2024-06-01', seed=100)
+        start = time.perf_counter()
+        second = sync_tables(source, snapshot, PAGE_SIZE)
+        incremental_sync = time.perf_counter() - start
+        match = snapshot_matches(engine, snapshot)
+        ok &= match and all(count == n_new for count in second.values())
+        print(f"incremental sync: {second} {'OK' if match else 'MISMATCH'}")
+
+        third = sync_tables(source, snapshot, PAGE_SIZE)
+        ok &= not any(third.values())
+        print(f"no-op sync: {third} {'OK' if not any(third.values()) else 'MISMATCH'}")
+
+        # 2.5 pages of rows created in the same second
+        ties = int(PAGE_SIZE * 2.5)
+        insert(engine, ties, '2025-07-01', seed=200, spread=1)
+        tied = sync_tables(source, snapshot, PAGE_SIZE)
+        match = snapshot_matches(engine, snapshot)
+        ok &= match and all(count == ties for count in tied.values())
+        print(f"rows sharing a timestamp across pages: {tied} {'OK' if match else 'MISMATCH'}")
+
+        # Rows reach the CSV but the watermark is never written
+        insert(engine, n_new, '2025-08-01', seed=300)
+        for table in TABLE_COLUMNS:
+            rows = fetch_new_rows(source, table, snapshot.watermark(table), PAGE_SIZE)
+            rows.to_csv(snapshot.table_path(table), mode='a', header=False, index=False)
+        recovered = sync_tables(source, snapshot, PAGE_SIZE)
+        match = snapshot_matches(engine, snapshot)
+        ok &= match and all(count == n_new for count in recovered.values())
+        print(f"sync after an interrupted append: {recovered} {'OK' if match else 'MISMATCH'}")
+
+        # What collect_your_database_data used to do on every run
+        start = time.perf_counter()
+        for table in TABLE_COLUMNS:
+            pd.read_sql_query(f"SELECT * FROM {table}", engine)
+        full_reload = time.perf_counter() - start
+
+    print(f"\n  {'mode':<34} {'time (s)':>9}")
+    print(f"  {'select * of every table':<34} {full_reload:>9.2f}")
+    print(f"  {'initial paginated sync':<34} {full_sync:>9.2f}")
+    print(f"  {'incremental sync':<34} {incremental_sync:>9.3f}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
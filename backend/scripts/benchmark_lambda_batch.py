@@ -0,0 +1,111 @@
+"""
+Local harness for batched (Records) events in api/lambda_handler.py
+
+Builds synthetic SQS-style events whose records carry predict, batch,
+highest and highest/all requests, then:
+- checks each record's response matches invoking the handler with that
+  record's body on its own
+- compares throughput of one invocation per record against a single
+  Records event scored in one vectorized pass
+
+Exits with a non-zero status if any record's response differs.
+
+Usage:
+    python scripts/benchmark_lambda_batch.py [records] [locations_per_record]
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Score every location (cache hits would hide the model cost)
+os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.lambda_handler import lambda_handler
+
+ENDPOINTS = ['predict', 'batch', 'highest', 'highest/all']
+
+def random_location(rng: np.random.Generator) -> dict:
+    return {
+        'latitude': float(rng.uniform(25, 49)),
+        'longitude': float(rng.uniform(-124, -67)),
+        'month': int(rng.integers(1, 13)),
+        'food_insecurity_rate': float(rng.uniform(0.05, 0.25)),
+        'historical_donations': int(rng.integers(0, 50)),
+        'historical_requests': int(rng.integers(0, 50)),
+        'population': int(rng.integers(500, 50000)),
+    }
+
+def synthetic_event(n_records: int, locations_per_record: int, seed: int = 42) -> dict:
+    """SQS-style event mixing single-location and multi-location requests"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(n_records):
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        if i % 5 == 4:
+            # Single-location request
+            body = random_location(rng)
+        else:
+            body = {
+                'endpoint': endpoint,
+                'locations': [random_location(rng) for _ in range(locations_per_record)],
+            }
+        records.append({'messageId': f'msg-{i}', 'body': json.dumps(body)})
+    return {'Records': records}
+
+def check_parity(event: dict) -> bool:
+    """Compare each record's batched response to handling it alone"""
+    batched = json.loads(lambda_handler(event, None)['body'])['results']
+    for record, result in zip(event['Records'], batched):
+        alone = lambda_handler({'body': record['body']}, None)
+        if alone['statusCode'] != result['statusCode'] or json.loads(alone['body']) != result['body']:
+            print(f"  MISMATCH for {record['messageId']}")
+            return False
+    return True
+
+def time_call(fn, repeat: int = 5) -> float:
+    """Return the median wall-clock time of fn() in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    locations_per_record = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print("Lambda Batched Event Harness")
+    print("=" * 50)
+
+    event = synthetic_event(n_records, locations_per_record)
+    response = json.loads(lambda_handler(event, None)['body'])
+    n_locations = response['total_locations']
+    print(f"{n_records} records, {n_locations} locations")
+
+    match = check_parity(synthetic_event(20, 5, seed=7))
+    print(f"parity with per-record invocations: {'OK' if match else 'MISMATCH'}")
+
+    per_record = time_call(lambda: [
+        lambda_handler({'body': record['body']}, None) for record in event['Records']
+    ])
+    batched = time_call(lambda: lambda_handler(event, None))
+
+    print(f"\n  {'mode':<22} {'time (ms)':>10} {'locations/s':>12}")
+    print(f"  {'one call per record':<22} {per_record * 1000:>10.1f} {n_locations / per_record:>12.0f}")
+    print(f"  {'Records event':<22} {batched * 1000:>10.1f} {n_locations / batched:>12.0f}")
+    print(f"  speedup: {per_record / batched:.1f}x")
+
+    if not match:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark Lambda cold starts for api/lambda_handler.py
+
+Each run starts a fresh Python process (like a new Lambda container) and
+reports, separately:
+- import time of the handler module (model preload disabled)
+- model load time
+- first prediction time (first handler invocation)
+
+as p50/p95/p99/max over the runs, for the native (pickled sklearn/XGBoost)
+and compiled backends, then compares their p99 totals. Tail percentiles
+need many runs: with fewer than 100, p99 is close to the slowest run.
+Train the model first (python scripts/train_model.py).
+
+Usage:
+    python scripts/benchmark_lambda_cold_start.py [runs]
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend_dir!r})
+import api.lambda_handler as handler
+imported = time.perf_counter()
+handler.registry.get()
+loaded = time.perf_counter()
+response = handler.lambda_handler({{'latitude': 40.7128, 'longitude': -74.0060}}, None)
+predicted = time.perf_counter()
+assert response['statusCode'] == 200, response
+print(json.dumps({{
+    'import': imported - start,
+    'model_load': loaded - imported,
+    'first_prediction': predicted - loaded,
+}}))
+"""
+
+STAGES = ['import', 'model_load', 'first_prediction', 'total']
+
+def cold_start(backend: str) -> dict:
+    """Time one cold start in a fresh interpreter"""
+    env = dict(
+        os.environ,
+        AWS_LAMBDA_FUNCTION_NAME='benchmark',
+        INFERENCE_BACKEND=backend,
+        LAMBDA_PRELOAD_MODEL='false',
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT.format(backend_dir=str(BACKEND_DIR))],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['total'] = sum(timings.values())
+    return timings
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    print("Lambda Cold Start Benchmark")
+    print("=" * 50)
+    if runs < 100:
+        print(f"Note: p99 of {runs} runs is close to the slowest run")
+
+    p99_totals = {}
+    for backend in ['native', 'compiled']:
+        samples = [cold_start(backend) for _ in range(runs)]
+        print(f"\n{backend} backend ({runs} cold starts, ms)")
+        print(f"  {'stage':<18} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for stage in STAGES:
+            values = np.array([sample[stage] for sample in samples]) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            print(f"  {stage:<18} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {values.max():>8.1f}")
+        p99_totals[backend] = np.percentile([sample['total'] for sample in samples], 99) * 1000
+
+    print(f"\np99 total cold start: native {p99_totals['native']:.1f} ms, "
+          f"compiled {p99_totals['compiled']:.1f} ms "
+          f"({p99_totals['native'] / p99_totals['compiled']:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Check and benchmark the /metrics instrumentation
+
+Calls the ASGI apps directly (no HTTP client or server in the way), then:
+- measures the per-request overhead of MetricsMiddleware around a trivial
+  app, and the latency of a cached /predict call through the real app for
+  comparison
+- checks the request counter and latency histogram saw every request, with
+  route templates rather than raw paths as labels
+- checks /metrics is well formed: every sample belongs to a declared metric
+  and histogram buckets are cumulative, ending at +Inf with the _count
+- times rendering /metrics
+
+Usage:
+    python scripts/benchmark_metrics.py [requests]
+"""
+
+import asyncio
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.metrics import MetricsMiddleware, http_request_duration, http_requests, metrics
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+
+def http_scope(method: str, path: str, query: str = '') -> dict:
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': query.encode(),
+        'headers': [(b'host', b'localhost'), (b'content-type', b'application/json')],
+        'client': ('127.0.0.1', 1234), 'server': ('localhost', 80),
+    }
+
+
+async def call(app, scope: dict, body: bytes = b'') -> tuple:
+    """Run one request through an ASGI app and return (status, body)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]['status'], b''.join(m.get('body', b'') for m in sent[1:])
+
+
+async def ok(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'ok'})
+
+
+async def time_calls(app, scope_fn, n: int, body: bytes = b'') -> float:
+    """Mean microseconds per request"""
+    start = time.perf_counter()
+    for _ in range(n):
+        await call(app, scope_fn(), body)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def check_exposition(text: str) -> bool:
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif line and not line.startswith('#'):
+            match = SAMPLE.match(line)
+            if match is None:
+                print(f"  malformed line: {line}")
+                return False
+            samples.append(match.groups())
+
+    ok = True
+    buckets = {}
+    for name, labels, value in samples:
+        base = re.sub(r'_(bucket|sum|count)$', '', name)
+        if name not in types and base not in types:
+            print(f"  undeclared metric: {name}")
+            ok = False
+        if name.endswith('_bucket'):
+            series = re.sub(r',?le="[^"]*"', '', labels)
+            buckets.setdefault((base, series), []).append((labels, float(value)))
+        elif name.endswith('_count') and types.get(base) == 'histogram':
+            series = buckets.get((base, labels or '{}'), [])
+            counts = [count for _, count in series]
+            if counts != sorted(counts) or not series or 'le="+Inf"' not in series[-1][0] \
+                    or series[-1][1] != float(value):
+                print(f"  bad histogram buckets: {name}{labels}")
+                ok = False
+    return ok
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    print("Metrics Benchmark")
+    print("=" * 50)
+    passed = True
+
+    # Middleware overhead around an app that does nothing
+    wrapped = MetricsMiddleware(ok)
+    scope = lambda: http_scope('GET', '/health')
+    for app in (ok, wrapped):
+        await time_calls(app, scope, 1000)
+    bare = min([await time_calls(ok, scope, n) for _ in range(3)])
+    instrumented = min([await time_calls(wrapped, scope, n) for _ in range(3)])
+    print(f"Trivial ASGI app:   {bare:6.2f} us/request")
+    print(f"  with metrics:     {instrumented:6.2f} us/request "
+          f"(overhead {instrumented - bare:.2f} us)")
+
+    # The real app, /predict answered from the prediction cache
+    from api.app import app, load_model_on_startup
+    await load_model_on_startup()
+    body = json.dumps({'latitude': 40.7128, 'longitude': -74.0060, 'month': 6}).encode()
+    predict = lambda: http_scope('POST', '/predict')
+    status, _ = await call(app, predict(), body)
+    requests = min(n, 2000)
+    latency = await time_calls(app, predict, requests, body)
+    print(f"Cached /predict:    {latency:6.1f} us/request through the full app "
+          f"(metrics {(instrumented - bare) / latency:.1%} of it)\n")
+
+    counted = http_requests.values.get(('POST', '/predict', 200), 0)
+    observed = http_request_duration.values.get(('POST', '/predict'), [[0], 0])[0]
+    same = status == 200 and counted == requests + 1 and sum(observed) == requests + 1
+    print(f"  {requests + 1:,} /predict requests counted and timed: {'OK' if same else 'MISMATCH'}")
+    passed &= same
+
+    await call(app, http_scope('GET', '/raster/point', 'latitude=1&longitude=2'))
+    await call(app, http_scope('GET', '/no/such/path'))
+    labels = {route for _, route, _ in http_requests.values}
+    same = '/raster/point' in labels and 'unmatched' in labels and '/no/such/path' not in labels
+    print(f"  routes labelled by template, unknown paths as 'unmatched': {'OK' if same else 'MISMATCH'}")
+    passed &= same
+
+    status, text = await call(app, http_scope('GET', '/metrics'))
+    well_formed = status == 200 and check_exposition(text.decode())
+    print(f"  /metrics well formed: {'OK' if well_formed else 'MISMATCH'}")
+    passed &= well_formed
+
+    start = time.perf_counter()
+    for _ in range(100):
+        metrics.render()
+    print(f"\nRendering /metrics ({len(text.splitlines())} lines): "
+          f"{(time.perf_counter() - start) / 100 * 1000:.2f} ms")
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,227 @@
+"""
+Check and benchmark the single-file model bundle
+
+Trains a RandomForest large enough for its memory to matter, then:
+- checks that a bundle with a flipped byte fails its checksum and that the
+  registry keeps serving the previous model
+- replaces the bundle over and over while reader processes reload it,
+  checking they only ever see complete models (predictions match one of the
+  written versions)
+- starts several worker processes serving the model, from the two legacy
+  pickles/.npz and from the bundle, and reports the memory each worker
+  adds: private (its own copy) and proportional (PSS, shared pages split
+  between the processes mapping them)
+
+Linux only (reads /proc/self/smaps_rollup).
+
+Usage:
+    python scripts/benchmark_model_bundle.py [workers] [trees]
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.bundle import load_bundle, save_bundle
+from models.compiled import compile_ensemble
+from models.registry import ModelRegistry
+
+BACKEND_DIR = Path(__file__).parent.parent
+FEATURES = 14
+
+WORKER_SCRIPT = """
+import json, sys, time
+import numpy as np
+sys.path.insert(0, {backend_dir!r})
+
+def memory_kb():
+    fields = {{}}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].endswith(':') and len(parts) == 3:
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+from models.registry import ModelRegistry
+registry = ModelRegistry(
+    model_path={dir!r} + '/model.pkl', metadata_path={dir!r} + '/metadata.pkl',
+    marker_path={dir!r} + '/model.version', compiled_path={dir!r} + '/model.npz',
+    bundle_path={bundle!r}, backend={backend!r}, reload_interval=-1,
+)
+X = np.random.default_rng(0).random((256, {features}))
+before = memory_kb()
+start = time.perf_counter()
+registry.get().model.predict(X)
+load_seconds = time.perf_counter() - start
+print('ready', flush=True)
+sys.stdin.readline()
+after = memory_kb()
+print(json.dumps({{
+    'pss_kb': after[0] - before[0],
+    'private_kb': after[1] - before[1],
+    'load_seconds': load_seconds,
+}}), flush=True)
+# Stay alive (and mapped) until every worker has measured
+sys.stdin.readline()
+"""
+
+READER_SCRIPT = """
+import sys, time
+import numpy as np
+sys.path.insert(0, {backend_dir!r})
+from models.registry import ModelRegistry
+registry = ModelRegistry(bundle_path={bundle!r}, backend='compiled', reload_interval=0)
+X = np.random.default_rng(0).random((8, {features}))
+seen = set()
+deadline = time.monotonic() + {seconds}
+while time.monotonic() < deadline:
+    seen.add(round(float(registry.get().model.predict(X).sum()), 9))
+print(' '.join(map(repr, sorted(seen))))
+"""
+
+
+def train(trees: int, seed: int = 0) -> RandomForestRegressor:
+    rng = np.random.default_rng(seed)
+    X = rng.random((20_000, FEATURES))
+    y = X[:, 0] * 0.5 + np.sin(X[:, 1] * 6) * 0.3 + rng.normal(0, 0.05, len(X))
+    return RandomForestRegressor(n_estimators=trees, max_depth=12, random_state=seed, n_jobs=1).fit(X, y)
+
+
+def metadata(version: str) -> dict:
+    return {
+        'feature_columns': [f'f{i}' for i in range(FEATURES)],
+        'season_classes': ['fall', 'spring', 'summer', 'winter'],
+        'metrics': {},
+        'model_version': version,
+        'trained_at': version,
+    }
+
+
+def check_corruption(model, directory: Path) -> bool:
+    path = directory / "checked.bundle"
+    save_bundle(path, model, compile_ensemble(model), metadata('good'))
+    registry = ModelRegistry(bundle_path=path, backend='auto', reload_interval=0)
+    first = registry.get()
+
+    data = bytearray(path.read_bytes())
+    data[-100] ^= 0xFF
+    corrupt = directory / "corrupt.bundle"
+    corrupt.write_bytes(data)
+    try:
+        load_bundle(corrupt).load_model()
+        detected = False
+    except ValueError:
+        detected = True
+
+    # Swap the corrupt file into place: the registry keeps the good model
+    corrupt.replace(path)
+    kept = registry.reload() is first
+    print(f"  flipped byte detected by checksum: {'OK' if detected else 'MISMATCH'}")
+    print(f"  registry keeps serving the previous model: {'OK' if kept else 'MISMATCH'}")
+    return detected and kept
+
+
+def check_concurrent_replace(models, directory: Path, seconds: float = 5, readers: int = 2) -> bool:
+    path = directory / "swap.bundle"
+    X = np.random.default_rng(0).random((8, FEATURES))
+    compiled = [compile_ensemble(model) for model in models]
+    expected = {round(float(c.predict(X).sum()), 9) for c in compiled}
+    save_bundle(path, models[0], compiled[0], metadata('v0'))
+
+    script = READER_SCRIPT.format(
+        backend_dir=str(BACKEND_DIR), bundle=str(path), features=FEATURES, seconds=seconds
+    )
+    procs = [subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, text=True)
+             for _ in range(readers)]
+    writes = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        writes += 1
+        save_bundle(path, models[writes % len(models)], compiled[writes % len(models)], metadata(f'v{writes}'))
+
+    seen = set()
+    for proc in procs:
+        output, _ = proc.communicate()
+        seen |= {float(value) for value in output.split()}
+    ok = bool(seen) and seen <= expected
+    print(f"  {writes} bundle replacements, {readers} readers saw {len(seen)} distinct models, "
+          f"all complete: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def measure_workers(directory: Path, bundle: Path, backend: str, workers: int) -> dict:
+    script = WORKER_SCRIPT.format(
+        backend_dir=str(BACKEND_DIR), dir=str(directory), bundle=str(bundle),
+        backend=backend, features=FEATURES,
+    )
+    procs = [subprocess.Popen([sys.executable, '-c', script], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    # Measure once every worker has the model loaded
+    for proc in procs:
+        assert proc.stdout.readline().strip() == 'ready'
+    results = []
+    for proc in procs:
+        proc.stdin.write('\n')
+        proc.stdin.flush()
+        results.append(json.loads(proc.stdout.readline()))
+    for proc in procs:
+        proc.communicate('\n')
+    return {key: np.mean([r[key] for r in results]) for key in results[0]}
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    trees = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    print("Model Bundle Benchmark")
+    print("=" * 50)
+
+    model = train(trees)
+    compiled = compile_ensemble(model)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        bundle = directory / "model.bundle"
+        start = time.perf_counter()
+        save_bundle(bundle, model, compiled, metadata('1'))
+        save_seconds = time.perf_counter() - start
+
+        # The previous artifacts: two pickles plus the .npz export
+        joblib.dump(model, directory / "model.pkl")
+        joblib.dump(metadata('1'), directory / "metadata.pkl")
+        compiled.metadata = metadata('1')
+        compiled.save(directory / "model.npz")
+
+        print(f"RandomForest, {trees} trees, {compiled.n_nodes:,} nodes; "
+              f"bundle {bundle.stat().st_size / 2**20:.1f} MB, written in {save_seconds:.2f}s\n")
+
+        ok &= check_corruption(model, directory)
+        ok &= check_concurrent_replace([model, train(max(10, trees // 10), seed=1)], directory)
+
+        missing = directory / "none.bundle"
+        print(f"\n{workers} workers, memory added per worker by loading the model (MB)")
+        print(f"  {'backend':<9} {'artifacts':<16} {'private':>8} {'PSS':>8} {'load (ms)':>10}")
+        for backend in ['compiled', 'native']:
+            for label, path in [('pickles + .npz', missing), ('bundle', bundle)]:
+                result = measure_workers(directory, path, backend, workers)
+                print(f"  {backend:<9} {label:<16} {result['private_kb'] / 1024:>8.1f} "
+                      f"{result['pss_kb'] / 1024:>8.1f} {result['load_seconds'] * 1000:>10.1f}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Check and benchmark the precomputed need raster
+
+- checks the raster against predict_need_scores at random cell centers
+  (scores must agree within the uint8 quantization step)
+- compares filling a map viewport from the raster (/raster/bbox) against
+  scoring every cell of it on request (predict_need_scores)
+- checks that loading a different model rebuilds the raster in the
+  background while the old one keeps serving
+
+Train the model first (python scripts/train_model.py).
+
+Usage:
+    python scripts/benchmark_need_raster.py [resolution_degrees]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.predict import predict_need_scores
+from models.raster import RASTER_BOUNDS, SCORE_LEVELS, RasterStore, build_raster, parse_bounds
+from models.registry import registry
+
+# (south, west, north, east) viewports: a metro area, a state, the whole map
+VIEWPORTS = {
+    'metro': (40.0, -75.0, 41.5, -73.0),
+    'state': (36.5, -124.5, 42.0, -114.0),
+    'contiguous US': (24.0, -125.0, 50.0, -66.0),
+}
+REPEATS = 20
+
+
+def check_parity(raster, loaded, samples: int = 5000) -> bool:
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, raster.rows, samples)
+    cols = rng.integers(0, raster.cols, samples)
+    months = rng.integers(1, 13, samples)
+    expected = predict_need_scores({
+        'latitude': raster.latitudes()[rows],
+        'longitude': raster.longitudes()[cols],
+        'month': months,
+        'historical_donations': np.zeros(samples),
+        'historical_requests': np.zeros(samples),
+        'monetary_donations': np.zeros(samples),
+    }, loaded=loaded, use_cache=False)
+    served = raster.codes[months - 1, rows, cols] / SCORE_LEVELS
+    error = float(np.max(np.abs(served - expected)))
+    ok = error <= 0.5 / SCORE_LEVELS + 1e-9
+    print(f"  {samples} random cells, max |raster - predict| = {error:.5f} "
+          f"(quantization bound {0.5 / SCORE_LEVELS:.5f}): {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def time_viewports(raster, loaded):
+    print(f"\n  {'viewport':<14} {'cells':>9} {'predict (ms)':>13} {'raster (ms)':>12} {'speedup':>8}")
+    for label, bbox in VIEWPORTS.items():
+        rows, cols = raster.window(*bbox)
+        latitude, longitude = np.meshgrid(
+            raster.latitudes(rows.start, rows.stop), raster.longitudes(cols.start, cols.stop), indexing='ij'
+        )
+        grid = {'latitude': latitude.ravel(), 'longitude': longitude.ravel(),
+                'month': np.full(latitude.size, 1)}
+
+        start = time.perf_counter()
+        predict_need_scores(grid, loaded=loaded, use_cache=False)
+        predict_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            codes = raster.codes_in(*raster.window(*bbox), 1)
+            codes.tobytes()
+        raster_ms = (time.perf_counter() - start) * 1000 / REPEATS
+
+        print(f"  {label:<14} {latitude.size:>9,} {predict_ms:>13.1f} {raster_ms:>12.3f} "
+              f"{predict_ms / raster_ms:>7.0f}x")
+
+
+def check_rebuild(loaded, bounds, resolution) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RasterStore(Path(tmp) / "raster.bundle", ','.join(map(str, bounds)), resolution, auto_build=True)
+        store.on_model_loaded(loaded)
+        while store.status()['building']:
+            time.sleep(0.05)
+        first = store.get()
+
+        # A "new" model: same estimator, different checksum
+        changed = loaded._replace(metadata={**loaded.metadata, 'checksum': 'changed'})
+        store.on_model_loaded(changed)
+        served_during_build = store.get() is first
+        while store.status()['building']:
+            time.sleep(0.05)
+        rebuilt = store.get() is not first and store.is_current(store.get(), changed)
+
+        # Same model again: no rebuild
+        store.on_model_loaded(changed)
+        skipped = not store.status()['building']
+
+    ok = served_during_build and rebuilt and skipped
+    print(f"  new model rebuilds the raster, old one served meanwhile, "
+          f"unchanged model skipped: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    bounds = parse_bounds(RASTER_BOUNDS)
+    resolution = float(sys.argv[1]) if len(sys.argv) > 1 else 0.1
+    loaded = registry.get()
+
+    print("Need Raster Benchmark")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "raster.bundle"
+        raster = build_raster(loaded, path, bounds, resolution)
+        print(f"{raster.rows} x {raster.cols} cells x 12 months at {resolution} degrees: "
+              f"built in {raster.metadata['build_seconds']:.1f}s, "
+              f"{path.stat().st_size / 2**20:.1f} MB\n")
+
+        ok = check_parity(raster, loaded)
+        time_viewports(raster, loaded)
+        print()
+        ok &= check_rebuild(loaded, bounds, 1.0)
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Peak memory of in-memory versus out-of-core training by dataset size
+
+For each size, writes a synthetic dataset to a temporary directory and
+trains the XGBoost candidate on it twice, each in a fresh process:
+- in memory: load_training_data + prepare_features + XGBRegressor.fit
+- out of core: scripts/out_of_core.py with the given RSS limit
+
+and reports peak RSS, wall-clock time and test R². Out-of-core runs that
+pass the limit fail with a MemoryError and are reported as such.
+
+Usage:
+    python scripts/benchmark_out_of_core.py [rows,rows,...] [max_rss_mb]
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts import dataset_store
+
+
+def run_child(mode: str, dataset_dir: str, *args) -> dict:
+    """Run one measurement in a fresh process and return its JSON result"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, dataset_dir, *map(str, args)],
+        capture_output=True, text=True,
+    )
+    lines = output.stdout.strip().splitlines()
+    if output.returncode != 0 or not lines:
+        error = output.stderr.strip().splitlines()
+        return {'error': error[-1] if error else f"exit code {output.returncode}"}
+    return json.loads(lines[-1])
+
+
+def child(mode: str, dataset_dir: str, *args):
+    """Measurement run in the child process; prints a JSON line"""
+    import contextlib
+    import io
+
+    from sklearn.metrics import r2_score
+
+    dataset_store.DATASET_DIR = Path(dataset_dir)
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'generate':
+            from scripts.collect_data import create_synthetic_dataset
+            create_synthetic_dataset(int(args[0]))
+            result = {}
+
+        elif mode == 'in_memory':
+            from scripts.out_of_core import peak_rss_mb
+            from scripts.train_model import candidate_models, load_training_data, prepare_features, split_rows
+            X, y, _, _ = prepare_features(load_training_data())
+            train_idx, test_idx = split_rows(len(X))
+            model = candidate_models(1)['xgboost'].set_params(tree_method='hist')
+            model.fit(X.iloc[train_idx], y.iloc[train_idx])
+            r2 = r2_score(y.iloc[test_idx], model.predict(X.iloc[test_idx]))
+            result = {'r2': r2, 'peak_rss_mb': peak_rss_mb()}
+
+        else:
+            from scripts.out_of_core import peak_rss_mb, train_out_of_core
+            _, metrics, _, _ = train_out_of_core(max_rss_mb=float(args[0]), n_jobs=1)
+            result = {'r2': metrics['r2'], 'peak_rss_mb': peak_rss_mb()}
+
+    result['seconds'] = time.perf_counter() - start
+    print(json.dumps(result))
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [250_000, 1_000_000, 4_000_000]
+    max_rss_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    print("Out-of-Core Training Memory Benchmark")
+    print("=" * 50)
+    print(f"XGBoost candidate, out-of-core RSS limit {max_rss_mb:.0f} MB\n")
+    print(f"  {'rows':>10} {'mode':<12} {'peak RSS (MB)':>14} {'time (s)':>9} {'test R²':>8}")
+
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset_dir = str(Path(tmp) / "training_data")
+            generated = run_child('generate', dataset_dir, n)
+            if 'error' in generated:
+                print(f"  {n:>10,} generate failed: {generated['error']}")
+                continue
+            for mode, args in (('in_memory', ()), ('out_of_core', (max_rss_mb,))):
+                result = run_child(mode, dataset_dir, *args)
+                if 'error' in result:
+                    print(f"  {n:>10,} {mode:<12} {result['error']}")
+                else:
+                    print(f"  {n:>10,} {mode:<12} {result['peak_rss_mb']:>14.0f} "
+                          f"{result['seconds']:>9.1f} {result['r2']:>8.4f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(*sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,140 @@
+"""
+Check and benchmark the regional food insecurity lookup
+
+Builds the lookup from the USDA files in data/ if there are any, otherwise
+from made-up rates for the state centroids, then:
+- checks every cell holds the region nearest to its center (brute-force
+  great-circle distances)
+- reports how often a random location gets the same region as an exact
+  nearest-centroid search (they differ only close to region borders,
+  within one cell)
+- checks batch and single lookups agree
+- times single and batched lookups against a KD-tree nearest-centroid query
+
+Usage:
+    python scripts/benchmark_regional_rates.py [resolution_degrees]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.regional_rates import (
+    EARTH_RADIUS_KM, RATES_MAX_DISTANCE_KM, RATES_RESOLUTION, _unit_vectors, build_regional_rates,
+)
+from scripts.download_usda_data import (
+    DATA_DIR, GAZETTEER_GLOB, STATE_CENTROIDS, load_county_centroids, process_usda_data, usda_regions,
+)
+
+
+def load_regions() -> tuple:
+    files = [
+        path for path in sorted(DATA_DIR.glob("*.csv"))
+        if any(word in path.name.lower() for word in ('food', 'security', 'insecur'))
+    ]
+    tables = [table for table in map(process_usda_data, files) if table is not None]
+    if tables:
+        county_centroids = {}
+        for path in sorted(DATA_DIR.glob(GAZETTEER_GLOB)):
+            county_centroids.update(load_county_centroids(path))
+        return usda_regions(tables, county_centroids), 'USDA files in data/'
+
+    rng = np.random.default_rng(0)
+    regions = [
+        {'name': name, 'level': 'state', 'latitude': lat, 'longitude': lng,
+         'food_insecurity_rate': round(float(rng.uniform(0.07, 0.17)), 3), 'year': None}
+        for name, lat, lng in STATE_CENTROIDS.values()
+    ]
+    return regions, 'made-up state rates (no USDA files in data/)'
+
+
+def great_circle_km(lat, lng, centroid_lat, centroid_lng) -> np.ndarray:
+    """Distances (rows: locations, columns: centroids)"""
+    lat, lng = np.radians(lat)[:, None], np.radians(lng)[:, None]
+    clat, clng = np.radians(centroid_lat)[None, :], np.radians(centroid_lng)[None, :]
+    h = np.sin((clat - lat) / 2) ** 2 + np.cos(lat) * np.cos(clat) * np.sin((clng - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+
+
+def exact_regions(lat, lng, centroid_lat, centroid_lng) -> np.ndarray:
+    distance = great_circle_km(lat, lng, centroid_lat, centroid_lng)
+    nearest = distance.argmin(axis=1)
+    return np.where(distance.min(axis=1) <= RATES_MAX_DISTANCE_KM, nearest, -1)
+
+
+def main():
+    resolution = float(sys.argv[1]) if len(sys.argv) > 1 else RATES_RESOLUTION
+    regions, source = load_regions()
+    centroid_lat = np.array([region['latitude'] for region in regions])
+    centroid_lng = np.array([region['longitude'] for region in regions])
+
+    print("Regional Rates Benchmark")
+    print("=" * 50)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        rates = build_regional_rates(regions, Path(tmp) / "rates.bundle", resolution=resolution)
+        print(f"{len(regions)} regions from {source}")
+        print(f"{rates.rows} x {rates.cols} cells at {resolution} degrees, "
+              f"built in {time.perf_counter() - start:.1f}s\n")
+
+        # Cell centers, sampled
+        rng = np.random.default_rng(1)
+        rows = rng.integers(0, rates.rows, 20_000)
+        cols = rng.integers(0, rates.cols, 20_000)
+        center_lat = rates.south + (rows + 0.5) * resolution
+        center_lng = rates.west + (cols + 0.5) * resolution
+        expected = exact_regions(center_lat, center_lng, centroid_lat, centroid_lng)
+        # Ties within float error of a Voronoi edge can go either way
+        same = np.mean(rates.cells[rows, cols] == expected)
+        print(f"  20,000 cells hold the region nearest their center: {same:.4%} "
+              f"{'OK' if same > 0.9999 else 'MISMATCH'}")
+        ok &= same > 0.9999
+
+        # Random US locations
+        lat = rng.uniform(25, 49, 100_000)
+        lng = rng.uniform(-124, -67, 100_000)
+        found = rates.rates(lat, lng)
+        expected = exact_regions(lat[:20_000], lng[:20_000], centroid_lat, centroid_lng)
+        expected_rates = np.append(rates.region_rates, np.nan)[expected]
+        agree = np.mean((found[:20_000] == expected_rates) | (np.isnan(found[:20_000]) & np.isnan(expected_rates)))
+        print(f"  random locations with the exact nearest-centroid rate: {agree:.2%}")
+
+        single = np.array([rates.rate(a, b) for a, b in zip(lat[:5000], lng[:5000])], dtype=float)
+        consistent = np.array_equal(single, found[:5000], equal_nan=True)
+        print(f"  single and batch lookups agree: {'OK' if consistent else 'MISMATCH'}")
+        ok &= consistent
+
+        tree = cKDTree(_unit_vectors(centroid_lat, centroid_lng))
+        print(f"\n  {'locations':>9} {'grid (us)':>10} {'KD-tree (us)':>13}")
+        for n in [1, 1000, 100_000]:
+            start = time.perf_counter()
+            if n == 1:
+                for i in range(10_000):
+                    rates.rate(lat[i], lng[i])
+                grid = (time.perf_counter() - start) / 10_000 * 1e6
+            else:
+                rates.rates(lat[:n], lng[:n])
+                grid = (time.perf_counter() - start) * 1e6
+
+            start = time.perf_counter()
+            repeats = 10_000 if n == 1 else 1
+            for i in range(repeats):
+                tree.query(_unit_vectors(lat[i:i + n], lng[i:i + n]))
+            kd_tree = (time.perf_counter() - start) / repeats * 1e6
+            print(f"  {n:>9,} {grid:>10.1f} {kd_tree:>13.1f}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Check and benchmark per-request stage timing and profiling
+
+Calls the ASGI apps directly (see benchmark_metrics.py), then:
+- measures the per-request overhead of TimingMiddleware around a trivial
+  app, and the cost of a stage() block with and without an active timer
+- checks /predict/batch returns a Server-Timing header whose worker stages
+  fit inside the inference stage and whose stages fit inside the total, and
+  that /debug counted every request
+- checks a profiled request (X-Profile header) saves its hot spots
+- prints the stage breakdown of /predict/batch for a few batch sizes
+
+Usage:
+    python scripts/benchmark_request_timing.py [requests]
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.timing import TimingMiddleware, request_profiler, stage_stats
+from models.timing import StageTimer, activate, deactivate, stage
+from scripts.benchmark_metrics import http_scope, ok, time_calls
+
+
+def parse_server_timing(value: str) -> dict:
+    """Stage durations in milliseconds"""
+    stages = {}
+    for entry in value.split(','):
+        name, _, duration = entry.strip().partition(';dur=')
+        stages[name] = float(duration)
+    return stages
+
+
+async def call_with_headers(app, scope: dict, body: bytes = b'') -> tuple:
+    """Run one request and return (status, response headers)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]['status'], {name.decode(): value.decode() for name, value in sent[0]['headers']}
+
+
+def time_stage(n: int) -> float:
+    """Mean nanoseconds per stage() block"""
+    start = time.perf_counter()
+    for _ in range(n):
+        with stage('model'):
+            pass
+    return (time.perf_counter() - start) / n * 1e9
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    print("Request Timing Benchmark")
+    print("=" * 50)
+    passed = True
+
+    # Middleware overhead around an app that does nothing
+    wrapped = TimingMiddleware(ok)
+    scope = lambda: http_scope('GET', '/health')
+    for app in (ok, wrapped):
+        await time_calls(app, scope, 1000)
+    bare = min([await time_calls(ok, scope, n) for _ in range(3)])
+    instrumented = min([await time_calls(wrapped, scope, n) for _ in range(3)])
+    print(f"Trivial ASGI app:   {bare:6.2f} us/request")
+    print(f"  with timing:      {instrumented:6.2f} us/request (overhead {instrumented - bare:.2f} us)")
+
+    idle = time_stage(100_000)
+    token = activate(StageTimer())
+    active = time_stage(100_000)
+    deactivate(token)
+    print(f"stage() block:      {idle:6.0f} ns without a timer, {active:.0f} ns with one\n")
+
+    from api.app import app, load_model_on_startup
+    await load_model_on_startup()
+
+    def batch(size: int, seed: int = 0) -> bytes:
+        return json.dumps([
+            {'latitude': 30 + (i * 7919 + seed) % 1500 / 100, 'longitude': -100 + i % 300 / 10, 'month': 1 + i % 12}
+            for i in range(size)
+        ]).encode()
+
+    requests = min(n, 200)
+    before = stage_stats.status().get('/predict/batch', {}).get('requests', 0)
+    consistent = True
+    for i in range(requests):
+        status, headers = await call_with_headers(app, http_scope('POST', '/predict/batch'), batch(100, i))
+        stages = parse_server_timing(headers.get('server-timing', 'missing;dur=0'))
+        expected = {'validate', 'queue', 'inference', 'features', 'serialize', 'total'}
+        # 1 us slack for the rounding of each value
+        within = stages.get('features', 0) + stages.get('model', 0) <= stages.get('inference', 0) + 0.002
+        inside = stages.get('validate', 0) + stages.get('queue', 0) + stages.get('inference', 0) \
+            <= stages.get('total', 0) + 0.003
+        consistent &= status == 200 and expected <= stages.keys() and within and inside
+    print(f"  {requests} /predict/batch Server-Timing headers consistent: {'OK' if consistent else 'MISMATCH'}")
+    passed &= consistent
+
+    counted = stage_stats.status()['/predict/batch']['requests'] - before
+    print(f"  /debug counted every request: {'OK' if counted == requests else 'MISMATCH'}")
+    passed &= counted == requests
+
+    with tempfile.TemporaryDirectory() as tmp:
+        request_profiler.directory = Path(tmp)
+        request_profiler.token = b'benchmark'
+        scope = http_scope('POST', '/predict/batch')
+        scope['headers'].append((b'x-profile', b'benchmark'))
+        await call_with_headers(app, scope, batch(500, 1))
+        # Profiles are saved off the event loop
+        for _ in range(100):
+            if request_profiler.saved:
+                break
+            await asyncio.sleep(0.05)
+        saved = list(Path(tmp).glob('*.txt'))
+        profiled = len(saved) == 1 and bool(request_profiler.recent[-1]['hot_spots'])
+        print(f"  profiled request saved its hot spots: {'OK' if profiled else 'MISMATCH'}")
+        passed &= profiled
+
+    print(f"\n  {'locations':>9} " + ' '.join(f"{name:>10}" for name in
+          ('validate', 'queue', 'features', 'model', 'serialize', 'total')) + "  (ms, mean of 5)")
+    for size in [10, 1000, 10_000]:
+        totals = {}
+        for i in range(5):
+            _, headers = await call_with_headers(app, http_scope('POST', '/predict/batch'), batch(size, 100 + i))
+            for name, ms in parse_server_timing(headers['server-timing']).items():
+                totals[name] = totals.get(name, 0) + ms / 5
+        print(f"  {size:>9,} " + ' '.join(f"{totals.get(name, 0):>10.2f}" for name in
+              ('validate', 'queue', 'features', 'model', 'serialize', 'total')))
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+"""
+Check and benchmark the vectorized synthetic dataset generator
+
+- compares column distributions with the previous per-row generator
+  (two-sample Kolmogorov-Smirnov test per column)
+- checks the output is deterministic per seed
+- measures generation + write time and peak memory in a fresh process,
+  with and without chunking
+
+Exits with a non-zero status if a check fails.
+
+Usage:
+    python scripts/benchmark_synthetic_dataset.py [rows]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import ks_2samp
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.collect_data import generate_synthetic_chunk, get_season
+
+BACKEND_DIR = Path(__file__).parent.parent
+COMPARE_ROWS = 100_000
+
+CHILD_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {backend_dir!r})
+from pathlib import Path
+from scripts import collect_data, dataset_store
+dataset_store.DATASET_DIR = Path({dataset_dir!r})
+start = time.perf_counter()
+collect_data.create_synthetic_dataset({n}, seed=42, chunk_size={chunk_size})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def legacy_synthetic_rows(n_samples: int) -> pd.DataFrame:
+    """The previous per-row generator"""
+    np.random.seed(42)
+    data = []
+    for _ in range(n_samples):
+        lat = np.random.uniform(25, 50)
+        lng = np.random.uniform(-125, -65)
+        month = np.random.randint(1, 13)
+        season = get_season(month)
+        food_insecurity_rate = np.random.uniform(0.05, 0.25)
+        poverty_rate = food_insecurity_rate * np.random.uniform(1.1, 1.5)
+        historical_donations = np.random.poisson(5)
+        historical_requests = np.random.poisson(8)
+        population = np.random.randint(500, 50000)
+        seasonal_multiplier = {'winter': 1.3, 'fall': 1.2, 'spring': 1.0, 'summer': 0.9}[season]
+        donation_factor = max(0.1, 1 - (historical_donations / 20))
+        need_score = min(1.0, (
+            food_insecurity_rate * 0.4 +
+            poverty_rate * 0.3 +
+            donation_factor * 0.2 +
+            min(1, population / 10000) * 0.1
+        ) * seasonal_multiplier)
+        data.append({
+            'latitude': lat,
+            'longitude': lng,
+            'month': month,
+            'season': season,
+            'food_insecurity_rate': food_insecurity_rate,
+            'poverty_rate': poverty_rate,
+            'historical_donations': historical_donations,
+            'historical_requests': historical_requests,
+            'monetary_donations': np.random.poisson(3),
+            'population': population,
+            'need_score': need_score,
+        })
+    return pd.DataFrame(data)
+
+
+def check_distributions(legacy: pd.DataFrame, new: pd.DataFrame) -> bool:
+    ok = True
+    print(f"\n  {'column':<22} {'KS stat':>8} {'p-value':>8}")
+    for col in legacy.columns:
+        if col == 'season':
+            same = (legacy[col].value_counts(normalize=True) - new[col].value_counts(normalize=True)).abs().max() < 0.01
+            print(f"  {col:<22} {'share diff < 1%':>17} {'OK' if same else 'MISMATCH'}")
+            ok &= same
+            continue
+        stat, p = ks_2samp(legacy[col], new[col])
+        print(f"  {col:<22} {stat:>8.4f} {p:>8.3f} {'OK' if p > 0.001 else 'MISMATCH'}")
+        ok &= p > 0.001
+    return ok
+
+
+def run_child(n: int, chunk_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        script = CHILD_SCRIPT.format(
+            backend_dir=str(BACKEND_DIR), dataset_dir=str(Path(tmp) / "training_data"),
+            n=n, chunk_size=chunk_size,
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            env=dict(os.environ, GEMINI_API_KEY=''),
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+
+    print("Synthetic Dataset Generator")
+    print("=" * 50)
+
+    start = time.perf_counter()
+    legacy = legacy_synthetic_rows(COMPARE_ROWS)
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = generate_synthetic_chunk(np.random.default_rng(42), COMPARE_ROWS)
+    new_time = time.perf_counter() - start
+
+    print(f"{COMPARE_ROWS:,} rows: per-row loop {legacy_time:.2f} s, vectorized {new_time:.3f} s "
+          f"({legacy_time / new_time:.0f}x)")
+    ok = check_distributions(legacy, new)
+
+    same_seed = generate_synthetic_chunk(np.random.default_rng(42), 1000).equals(
+        generate_synthetic_chunk(np.random.default_rng(42), 1000))
+    other_seed = generate_synthetic_chunk(np.random.default_rng(43), 1000).equals(
+        generate_synthetic_chunk(np.random.default_rng(42), 1000))
+    deterministic = same_seed and not other_seed
+    ok &= deterministic
+    print(f"\ndeterministic per seed: {'OK' if deterministic else 'MISMATCH'}")
+
+    print(f"\n{n:,} rows generated and written:")
+    print(f"  {'chunk size':>12} {'time (s)':>9} {'rows/s':>11} {'peak RSS (MB)':>14}")
+    for chunk_size in [n, 1_000_000, 250_000]:
+        result = run_child(n, chunk_size)
+        print(f"  {chunk_size:>12,} {result['seconds']:>9.2f} {n / result['seconds']:>11,.0f} "
+              f"{result['max_rss_mb']:>14.0f}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark parallel candidate training against the serial loop
+
+Runs the previous train_models loop (fit each candidate, then
+cross_val_score, one after another) and the parallel train_models with
+several core budgets on the same synthetic data, and reports wall-clock
+time, speedup and whether the metrics match.
+
+Exits with a non-zero status if any metric differs from the serial run.
+
+Usage:
+    python scripts/benchmark_training.py [rows]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics import r2_score
+from sklearn.model_selection import cross_val_score, train_test_split
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts import dataset_store
+from scripts.collect_data import generate_synthetic_chunk
+from scripts.train_model import CV_FOLDS, candidate_models, prepare_features, train_models
+
+
+def serial_train(X, y) -> dict:
+    """The previous train_models loop; returns test R² and CV mean per model"""
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    results = {}
+    for name, model in candidate_models(cores_per_model=-1).items():
+        model.fit(X_train, y_train)
+        r2 = r2_score(y_test, model.predict(X_test))
+        cv_scores = cross_val_score(model, X_train, y_train, cv=CV_FOLDS, scoring='r2')
+        results[name] = (r2, cv_scores.mean())
+    return results
+
+
+def parallel_train(X, y, n_jobs: int, cores_per_model: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, best_metrics, _ = train_models(X, y, n_jobs=n_jobs, cores_per_model=cores_per_model)
+    return best_metrics
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    cores = os.cpu_count() or 1
+
+    print("Parallel Training Benchmark")
+    print("=" * 50)
+
+    df = dataset_store.compact(generate_synthetic_chunk(np.random.default_rng(42), n))
+    X, y, _, _ = prepare_features(df)
+    print(f"{n:,} rows, {cores} cores")
+
+    start = time.perf_counter()
+    serial = serial_train(X, y)
+    serial_time = time.perf_counter() - start
+    best = max(serial, key=lambda name: serial[name][0])
+
+    budgets = sorted({(1, 1), (cores, 1), (cores, max(1, cores // 3)), (cores, cores)})
+    print(f"\n  {'mode':<32} {'wall (s)':>9} {'speedup':>8} {'metrics':>8}")
+    print(f"  {'serial loop (all cores per fit)':<32} {serial_time:>9.2f} {'1.0x':>8}")
+
+    ok = True
+    for n_jobs, cores_per_model in budgets:
+        start = time.perf_counter()
+        metrics = parallel_train(X, y, n_jobs, cores_per_model)
+        elapsed = time.perf_counter() - start
+        match = np.isclose(metrics['r2'], serial[best][0]) and np.isclose(metrics['cv_mean'], serial[best][1])
+        ok &= bool(match)
+        label = f"parallel, {n_jobs // cores_per_model} workers x {cores_per_model} cores"
+        print(f"  {label:<32} {elapsed:>9.2f} {serial_time / elapsed:>7.1f}x "
+              f"{'OK' if match else 'MISMATCH':>8}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
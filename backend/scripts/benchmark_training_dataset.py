@@ -0,0 +1,145 @@
+"""
+Benchmark the training dataset build in collect_data.py
+
+Generates synthetic donations/requests/monetary donation tables, runs them
+through aggregate_by_location + build_training_frame and:
+- checks the result matches the previous per-location/month mask scan
+  (on a small input, where that is still affordable)
+- reports time per stage as the number of source rows grows
+
+Exits with a non-zero status if the parity check fails.
+
+Usage:
+    python scripts/benchmark_training_dataset.py [max_rows]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Use the constant default estimate (no API calls)
+os.environ['GEMINI_API_KEY'] = ''
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.collect_data import (
+    aggregate_by_location,
+    build_training_frame,
+    estimate_food_insecurity_rate,
+    get_season,
+)
+
+# Rows per source table
+SIZES = [10_000, 100_000, 1_000_000, 4_000_000]
+
+def synthetic_table(n: int, lat_col: str, lng_col: str, n_locations: int, seed: int) -> pd.DataFrame:
+    """n events spread over n_locations ~1km cells and three years"""
+    rng = np.random.default_rng(seed)
+    cells = rng.integers(0, n_locations, n)
+    start = np.datetime64('2022-01-01T00:00:00')
+    return pd.DataFrame({
+        lat_col: 25 + (cells % 2500) * 0.01 + rng.uniform(0, 0.004, n),
+        lng_col: -125 + (cells // 2500) * 0.01 + rng.uniform(0, 0.004, n),
+        'created_at': start + rng.integers(0, 3 * 365 * 86400, n).astype('timedelta64[s]'),
+    })
+
+def synthetic_sources(n: int, seed: int = 42) -> dict:
+    n_locations = max(10, n // 50)
+    return {
+        'donations': synthetic_table(n, 'latitude', 'longitude', n_locations, seed),
+        'requests': synthetic_table(n, 'latitude', 'longitude', n_locations, seed + 1),
+        'monetary_donations': synthetic_table(n // 2, 'to_latitude', 'to_longitude', n_locations, seed + 2),
+    }
+
+def aggregate(sources: dict):
+    return (
+        aggregate_by_location(sources['donations'], 'latitude', 'longitude', 'created_at'),
+        aggregate_by_location(sources['requests'], 'latitude', 'longitude', 'created_at'),
+        aggregate_by_location(sources['monetary_donations'], 'to_latitude', 'to_longitude', 'created_at'),
+    )
+
+def legacy_training_frame(donations_agg, requests_agg, monetary_agg) -> pd.DataFrame:
+    """The previous O(locations x months x rows) implementation, uncapped"""
+    all_locations = set()
+    for df in [donations_agg, requests_agg, monetary_agg]:
+        for _, row in df.iterrows():
+            all_locations.add((row['lat_rounded'], row['lng_rounded']))
+
+    def count(agg, lat, lng, month):
+        return len(agg[
+            (agg['lat_rounded'] == lat) &
+            (agg['lng_rounded'] == lng) &
+            (agg['month'] == month)
+        ])
+
+    training_data = []
+    for lat, lng in sorted(all_locations):
+        for month in range(1, 13):
+            donations_count = count(donations_agg, lat, lng, month)
+            requests_count = count(requests_agg, lat, lng, month)
+            monetary_count = count(monetary_agg, lat, lng, month)
+            food_insecurity_rate = estimate_food_insecurity_rate(lat, lng)
+            need_score = min(1.0, max(0.0,
+                (requests_count * 0.3 +
+                 (1 - min(1, donations_count / 10)) * 0.3 +
+                 food_insecurity_rate * 0.4)
+            ))
+            training_data.append({
+                'latitude': lat,
+                'longitude': lng,
+                'month': month,
+                'season': get_season(month),
+                'food_insecurity_rate': food_insecurity_rate,
+                'poverty_rate': food_insecurity_rate * 1.2,
+                'historical_donations': donations_count,
+                'historical_requests': requests_count,
+                'monetary_donations': monetary_count,
+                'population': 1000,
+                'need_score': need_score,
+            })
+    return pd.DataFrame(training_data)
+
+def check_parity() -> bool:
+    aggs = aggregate(synthetic_sources(5000))
+    expected = legacy_training_frame(*aggs)
+    actual = build_training_frame(*aggs)
+    try:
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+        return True
+    except AssertionError as e:
+        print(e)
+        return False
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000_000
+
+    print("Training Dataset Build Benchmark")
+    print("=" * 50)
+
+    match = check_parity()
+    print(f"parity with mask-scan implementation: {'OK' if match else 'MISMATCH'}")
+
+    print(f"\n  {'source rows':>12} {'locations':>10} {'aggregate (s)':>14} {'build (s)':>10} {'rows/s':>10}")
+    for n in [size for size in SIZES if size <= max_rows]:
+        sources = synthetic_sources(n)
+        n_rows = sum(len(df) for df in sources.values())
+
+        start = time.perf_counter()
+        aggs = aggregate(sources)
+        aggregated = time.perf_counter()
+        df = build_training_frame(*aggs)
+        built = time.perf_counter()
+
+        print(f"  {n_rows:>12,} {len(df) // 12:>10,} {aggregated - start:>14.2f} "
+              f"{built - aggregated:>10.2f} {n_rows / (built - start):>10,.0f}")
+
+    if not match:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
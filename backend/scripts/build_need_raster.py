@@ -0,0 +1,41 @@
+"""
+Build the need-score raster for the map with the current model
+
+Scores every cell of the RASTER_BOUNDS grid for each month and writes
+models/need_raster.bundle (see models/raster.py). The API also rebuilds it
+in the background whenever it loads a new model; run this after training
+to have it ready before the API starts.
+
+Usage:
+    python scripts/build_need_raster.py [resolution_degrees]
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.raster import RASTER_BOUNDS, RASTER_PATH, RASTER_RESOLUTION, build_raster, parse_bounds
+from models.registry import registry
+
+
+def main():
+    resolution = float(sys.argv[1]) if len(sys.argv) > 1 else RASTER_RESOLUTION
+    bounds = parse_bounds(RASTER_BOUNDS)
+
+    print("Need Raster")
+    print("=" * 50)
+
+    raster = build_raster(registry.get(), RASTER_PATH, bounds, resolution)
+    cells = raster.rows * raster.cols
+    print(f"Bounds (S, W, N, E): {bounds}, {resolution} degree cells")
+    print(f"Grid: {raster.rows} x {raster.cols} = {cells:,} cells x 12 months")
+    print(f"Model version: {raster.metadata['model_version']}")
+    print(f"Built in {raster.metadata['build_seconds']:.1f}s "
+          f"({cells * 12 / raster.metadata['build_seconds']:,.0f} cells/s)")
+    print(f"Saved to: {RASTER_PATH} ({RASTER_PATH.stat().st_size / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
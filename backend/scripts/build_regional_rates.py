@@ -0,0 +1,64 @@
+"""
+Build the regional food insecurity lookup from downloaded USDA data
+
+Reads the food security CSVs saved in data/ (see download_usda_data.py)
+and, for county tables, the Census county Gazetteer file, then writes
+models/regional_rates.bundle (see models/regional_rates.py). Training and
+the API use it for locations without a food insecurity rate; restart the
+API after rebuilding it.
+
+Usage:
+    python scripts/build_regional_rates.py [resolution_degrees]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.regional_rates import REGIONAL_RATES_PATH, RATES_RESOLUTION, build_regional_rates
+from scripts.download_usda_data import (
+    DATA_DIR, GAZETTEER_GLOB, load_county_centroids, process_usda_data, usda_regions,
+)
+
+
+def main():
+    resolution = float(sys.argv[1]) if len(sys.argv) > 1 else RATES_RESOLUTION
+
+    print("Regional Food Insecurity Rates")
+    print("=" * 50)
+
+    files = [
+        path for path in sorted(DATA_DIR.glob("*.csv"))
+        if any(word in path.name.lower() for word in ('food', 'security', 'insecur'))
+    ]
+    tables = [table for table in map(process_usda_data, files) if table is not None]
+    if not tables:
+        print(f"No USDA food security CSVs found in {DATA_DIR}")
+        print("Run python scripts/download_usda_data.py for download instructions")
+        sys.exit(1)
+
+    county_centroids = {}
+    for path in sorted(DATA_DIR.glob(GAZETTEER_GLOB)):
+        county_centroids.update(load_county_centroids(path))
+    if any((table['level'] == 'county').any() for table in tables) and not county_centroids:
+        print(f"Warning: county rates found but no Census Gazetteer file ({GAZETTEER_GLOB}) "
+              f"in {DATA_DIR}; using state rates only")
+
+    regions = usda_regions(tables, county_centroids)
+    start = time.perf_counter()
+    rates = build_regional_rates(
+        regions, REGIONAL_RATES_PATH, resolution=resolution,
+        source=', '.join(path.name for path in files),
+    )
+    counties = sum(region['level'] == 'county' for region in regions)
+    print(f"{counties} counties, {len(regions) - counties} states")
+    print(f"Grid: {rates.rows} x {rates.cols} cells at {resolution} degrees, "
+          f"built in {time.perf_counter() - start:.1f}s")
+    print(f"Saved to: {REGIONAL_RATES_PATH} ({REGIONAL_RATES_PATH.stat().st_size / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,21 +6,20 @@ import os
 import sys
 import pandas as pd
 import numpy as np
-from pathlib import Path
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
-import requests
-try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 load_dotenv()
 
+from models.regional_rates import lookup_rates
+from scripts.dataset_store import replace_training_data, write_training_data
+from scripts.food_insecurity import get_estimator
+from scripts.ingest import TABLE_COLUMNS, Snapshot, get_source, sync_tables
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
@@ -35,48 +34,47 @@ def get_season(month: int) -> str:
     else:
         return 'winter'
 
+SEASON_BY_MONTH = {month: get_season(month) for month in range(1, 13)}
+
+LOCATION_MONTH_KEYS = ['lat_rounded', 'lng_rounded', 'month']
+
+# Lookup tables indexed by month (index 0 unused)
+SEASON_NAMES_BY_MONTH = np.array([''] + [SEASON_BY_MONTH[m] for m in range(1, 13)], dtype=object)
+SEASONAL_MULTIPLIER_BY_MONTH = np.array([0.0] + [
+    {'winter': 1.3, 'fall': 1.2, 'spring': 1.0, 'summer': 0.9}[SEASON_BY_MONTH[m]]
+    for m in range(1, 13)
+])
+
+# Synthetic dataset size, seed and rows generated/written at a time
+SYNTHETIC_SAMPLES = int(os.getenv('SYNTHETIC_SAMPLES', '1000'))
+SYNTHETIC_SEED = int(os.getenv('SYNTHETIC_SEED', '42'))
+SYNTHETIC_CHUNK_SIZE = int(os.getenv('SYNTHETIC_CHUNK_SIZE', '1000000'))
+
 def collect_your_database_data():
     """
-    Collect data from your Supabase database
-    """
-    if not SUPABASE_AVAILABLE:
-        print("Warning: Supabase package not installed. Skipping database collection.")
-        return None
+    Collect data from your database (Supabase, or DATABASE_URL via SQLAlchemy)
     
-    supabase_url = os.getenv('SUPABASE_URL')
-    supabase_key = os.getenv('SUPABASE_KEY')
+    Only rows created since the last run are fetched; they are merged into
+    the local snapshot (data/snapshots), which is returned in full.
+    """
+    source = get_source()
     
-    if not supabase_url or not supabase_key:
-        print("Warning: Supabase credentials not found. Skipping database collection.")
+    if source is None:
+        print("Warning: Database credentials not found. Skipping database collection.")
         return None
     
+    snapshot = Snapshot()
     try:
-        supabase: Client = create_client(supabase_url, supabase_key)
-        
-        # Get donations data
-        donations_response = supabase.table('donations').select('*').execute()
-        donations_df = pd.DataFrame(donations_response.data)
-        
-        # Get requests data
-        requests_response = supabase.table('requests').select('*').execute()
-        requests_df = pd.DataFrame(requests_response.data)
-        
-        # Get monetary donations
-        monetary_response = supabase.table('monetary_donations').select('*').execute()
-        monetary_df = pd.DataFrame(monetary_response.data)
-        
-        print(f"Collected {len(donations_df)} donations")
-        print(f"Collected {len(requests_df)} requests")
-        print(f"Collected {len(monetary_df)} monetary donations")
-        
-        return {
-            'donations': donations_df,
-            'requests': requests_df,
-            'monetary_donations': monetary_df
-        }
+        new_rows = sync_tables(source, snapshot)
+        for table, count in new_rows.items():
+            print(f"Collected {count} new {table.replace('_', ' ')}")
     except Exception as e:
         print(f"Error collecting database data: {e}")
-        return None
+        if not snapshot.watermarks():
+            return None
+        print("Using the existing local snapshot")
+    
+    return {table: snapshot.load(table) for table in TABLE_COLUMNS}
 
 def process_location_data(df: pd.DataFrame, lat_col: str, lng_col: str, date_col: str):
     """
@@ -88,7 +86,7 @@ def process_location_data(df: pd.DataFrame, lat_col: str, lng_col: str, date_col
     df = df.copy()
     df[date_col] = pd.to_datetime(df[date_col])
     df['month'] = df[date_col].dt.month
-    df['season'] = df['month'].apply(get_season)
+    df['season'] = df['month'].map(SEASON_BY_MONTH)
     df['year'] = df[date_col].dt.year
     
     # Round coordinates to ~1km precision (0.01 degrees ≈ 1km)
@@ -106,57 +104,144 @@ def aggregate_by_location(df: pd.DataFrame, lat_col: str, lng_col: str, date_col
     if df.empty:
         return pd.DataFrame()
     
-    # Group by location and month
-    grouped = df.groupby(['lat_rounded', 'lng_rounded', 'month', 'season', 'year']).agg({
-        lat_col: 'first',
-        lng_col: 'first',
+    # Group by location and month (season follows from month, so it is
+    # added after grouping rather than used as a key)
+    grouped = df.groupby(['lat_rounded', 'lng_rounded', 'month', 'year']).agg(**{
+        lat_col: (lat_col, 'first'),
+        lng_col: (lng_col, 'first'),
+        'count': (lat_col, 'size'),
     }).reset_index()
-    
-    grouped['count'] = df.groupby(['lat_rounded', 'lng_rounded', 'month', 'season', 'year']).size().values
+    grouped.insert(3, 'season', grouped['month'].map(SEASON_BY_MONTH))
     
     return grouped
 
+def estimate_food_insecurity_rates(lat, lng) -> np.ndarray:
+    """
+    Estimate food insecurity rates for locations
+    
+    Uses the USDA rate of each location's region (models/regional_rates.py);
+    only locations it does not cover are sent to the Gemini API (cached on
+    disk), which defaults to an estimated rate.
+    """
+    rates = lookup_rates(lat, lng)
+    missing = np.isnan(rates)
+    if missing.any():
+        rates[missing] = get_estimator().estimate_many(
+            zip(np.asarray(lat)[missing], np.asarray(lng)[missing])
+        )
+    return rates
+
 def estimate_food_insecurity_rate(lat: float, lng: float) -> float:
     """
     Estimate food insecurity rate for a location
-    Uses Gemini API or defaults to estimated rate
+    Uses USDA data, then Gemini API (cached on disk) or defaults to estimated rate
+    """
+    return float(estimate_food_insecurity_rates([lat], [lng])[0])
+
+def count_by_location_month(agg: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Number of aggregated rows (i.e. distinct years) per location and month
     """
-    api_key = os.getenv('GEMINI_API_KEY')
+    if agg.empty:
+        return pd.DataFrame({
+            'lat_rounded': pd.Series(dtype=np.float64),
+            'lng_rounded': pd.Series(dtype=np.float64),
+            'month': pd.Series(dtype=np.int32),
+            name: pd.Series(dtype=np.int64),
+        })
+    return agg.groupby(LOCATION_MONTH_KEYS).size().rename(name).reset_index()
+
+def build_training_frame(
+    donations_agg: pd.DataFrame,
+    requests_agg: pd.DataFrame,
+    monetary_agg: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Build the location x month training frame from the aggregated sources
     
-    if not api_key:
-        # Default estimation based on location
-        # Urban areas typically have higher rates
-        # This is a placeholder - replace with actual data
-        return 0.12  # 12% default
+    Every location seen in any source gets one row per month (1-12), with
+    the donation/request/monetary counts joined in (0 where absent) and the
+    need score target computed column-wise. Each row is dated (for the
+    dataset's year partitions) by the latest year the location had activity
+    in that month, or in any month if it had none in that one.
     
-    try:
-        response = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={api_key}",
-            json={
-                "contents": [{
-                    "parts": [{
-                        "text": f"Based on coordinates ({lat}, {lng}), estimate the food insecurity rate (0-1 scale). Consider geographic location, urban/rural status, and regional patterns. Return ONLY a number between 0 and 1."
-                    }]
-                }]
-            },
-            timeout=10
-        )
-        
-        if response.ok:
-            data = response.json()
-            text = data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '0.12')
-            rate = float(text.strip().replace('%', ''))
-            if rate > 1:
-                rate = rate / 100
-            return max(0, min(1, rate))
-    except Exception as e:
-        print(f"Error estimating food insecurity: {e}")
+    Args:
+        donations_agg, requests_agg, monetary_agg: output of aggregate_by_location
     
-    return 0.12  # Default
+    Returns:
+        DataFrame with the training columns expected by train_model.py, plus 'year'
+    """
+    counts = [
+        count_by_location_month(donations_agg, 'historical_donations'),
+        count_by_location_month(requests_agg, 'historical_requests'),
+        count_by_location_month(monetary_agg, 'monetary_donations'),
+    ]
+    
+    # Get unique locations
+    locations = (
+        pd.concat([c[['lat_rounded', 'lng_rounded']] for c in counts])
+        .drop_duplicates()
+        .sort_values(['lat_rounded', 'lng_rounded'])
+        .reset_index(drop=True)
+    )
+    print(f"Processing {len(locations)} unique locations...")
+    
+    # Estimate food insecurity rate (once per location)
+    locations['food_insecurity_rate'] = estimate_food_insecurity_rates(
+        locations['lat_rounded'].to_numpy(), locations['lng_rounded'].to_numpy()
+    )
+    
+    # Location x month grid, with the counts joined in
+    months = np.arange(1, 13)
+    df = locations.loc[locations.index.repeat(len(months))].reset_index(drop=True)
+    df['month'] = np.tile(months, len(locations))
+    for count in counts:
+        df = df.merge(count, on=LOCATION_MONTH_KEYS, how='left')
+    count_cols = ['historical_donations', 'historical_requests', 'monetary_donations']
+    df[count_cols] = df[count_cols].fillna(0).astype(np.int64)
+    
+    # Latest year of activity per location and month, then per location
+    active = pd.concat([
+        agg[LOCATION_MONTH_KEYS + ['year']]
+        for agg in (donations_agg, requests_agg, monetary_agg) if not agg.empty
+    ])
+    last_year = active.groupby(LOCATION_MONTH_KEYS)['year'].max().rename('year').reset_index()
+    df = df.merge(last_year, on=LOCATION_MONTH_KEYS, how='left')
+    location_year = df.groupby(['lat_rounded', 'lng_rounded'])['year'].transform('max')
+    df['year'] = df['year'].fillna(location_year).astype(np.int64)
+    
+    # Calculate target variable (need score)
+    # Higher need = more requests, less donations, higher food insecurity
+    need_score = (
+        df['historical_requests'] * 0.3 +
+        (1 - np.minimum(1, df['historical_donations'] / 10)) * 0.3 +
+        df['food_insecurity_rate'] * 0.4
+    ).clip(0.0, 1.0)
+    
+    return pd.DataFrame({
+        'latitude': df['lat_rounded'],
+        'longitude': df['lng_rounded'],
+        'month': df['month'],
+        'season': df['month'].map(SEASON_BY_MONTH),
+        'food_insecurity_rate': df['food_insecurity_rate'],
+        'poverty_rate': df['food_insecurity_rate'] * 1.2,  # Estimate
+        'historical_donations': df['historical_donations'],
+        'historical_requests': df['historical_requests'],
+        'monetary_donations': df['monetary_donations'],
+        'population': 1000,  # Placeholder - can be enhanced
+        'need_score': need_score,  # Target variable
+        'year': df['year'],
+    })
 
-def create_training_dataset():
+def create_training_dataset() -> Path:
     """
     Create training dataset from all sources
+    
+    Replaces the whole dataset, from the collected data if there is any,
+    otherwise with synthetic data.
+    
+    Returns:
+        path of the written training data
     """
     print("Creating training dataset...")
     
@@ -191,136 +276,90 @@ def create_training_dataset():
         'created_at'
     )
     
-    # Merge data
-    training_data = []
+    df = build_training_frame(donations_agg, requests_agg, monetary_agg)
     
-    # Get unique locations
-    all_locations = set()
-    for df in [donations_agg, requests_agg, monetary_agg]:
-        if not df.empty:
-            for _, row in df.iterrows():
-                loc_key = (row['lat_rounded'], row['lng_rounded'])
-                all_locations.add(loc_key)
-    
-    print(f"Processing {len(all_locations)} unique locations...")
-    
-    for lat, lng in list(all_locations)[:100]:  # Limit for now
-        for month in range(1, 13):
-            season = get_season(month)
-            
-            # Get counts for this location/month
-            donations_count = len(donations_agg[
-                (donations_agg['lat_rounded'] == lat) &
-                (donations_agg['lng_rounded'] == lng) &
-                (donations_agg['month'] == month)
-            ]) if not donations_agg.empty else 0
-            
-            requests_count = len(requests_agg[
-                (requests_agg['lat_rounded'] == lat) &
-                (requests_agg['lng_rounded'] == lng) &
-                (requests_agg['month'] == month)
-            ]) if not requests_agg.empty else 0
-            
-            monetary_count = len(monetary_agg[
-                (monetary_agg['lat_rounded'] == lat) &
-                (monetary_agg['lng_rounded'] == lng) &
-                (monetary_agg['month'] == month)
-            ]) if not monetary_agg.empty else 0
-            
-            # Estimate food insecurity rate
-            food_insecurity_rate = estimate_food_insecurity_rate(lat, lng)
-            
-            # Calculate target variable (need score)
-            # Higher need = more requests, less donations, higher food insecurity
-            need_score = min(1.0, max(0.0,
-                (requests_count * 0.3 + 
-                 (1 - min(1, donations_count / 10)) * 0.3 +
-                 food_insecurity_rate * 0.4)
-            ))
-            
-            training_data.append({
-                'latitude': lat,
-                'longitude': lng,
-                'month': month,
-                'season': season,
-                'food_insecurity_rate': food_insecurity_rate,
-                'poverty_rate': food_insecurity_rate * 1.2,  # Estimate
-                'historical_donations': donations_count,
-                'historical_requests': requests_count,
-                'monetary_donations': monetary_count,
-                'population': 1000,  # Placeholder - can be enhanced
-                'need_score': need_score,  # Target variable
-            })
-    
-    df = pd.DataFrame(training_data)
-    
-    # Save to CSV
-    output_path = DATA_DIR / "training_data.csv"
-    df.to_csv(output_path, index=False)
+    # Replace the partitioned dataset (CSV via scripts/dataset_store.py export)
+    output_path = write_training_data(df)
     print(f"\nTraining dataset saved to: {output_path}")
     print(f"Total samples: {len(df)}")
     print(f"\nFeature statistics:")
     print(df.describe())
     
-    return df
+    return output_path
 
-def create_synthetic_dataset():
+def generate_synthetic_chunk(rng: np.random.Generator, n_samples: int) -> pd.DataFrame:
+    """
+    Draw n_samples synthetic training rows, one whole column at a time
+    """
+    lat = rng.uniform(25, 50, n_samples)  # US latitude range
+    lng = rng.uniform(-125, -65, n_samples)  # US longitude range
+    month = rng.integers(1, 13, n_samples)
+    
+    # Synthetic features
+    food_insecurity_rate = rng.uniform(0.05, 0.25, n_samples)
+    poverty_rate = food_insecurity_rate * rng.uniform(1.1, 1.5, n_samples)
+    historical_donations = rng.poisson(5, n_samples)
+    historical_requests = rng.poisson(8, n_samples)
+    monetary_donations = rng.poisson(3, n_samples)
+    population = rng.integers(500, 50000, n_samples)
+    
+    # Calculate need score (target)
+    seasonal_multiplier = SEASONAL_MULTIPLIER_BY_MONTH[month]
+    donation_factor = np.maximum(0.1, 1 - (historical_donations / 20))
+    
+    need_score = np.minimum(1.0, (
+        food_insecurity_rate * 0.4 +
+        poverty_rate * 0.3 +
+        donation_factor * 0.2 +
+        np.minimum(1, population / 10000) * 0.1
+    ) * seasonal_multiplier)
+    
+    return pd.DataFrame({
+        'latitude': lat,
+        'longitude': lng,
+        'month': month,
+        'season': SEASON_NAMES_BY_MONTH[month],
+        'food_insecurity_rate': food_insecurity_rate,
+        'poverty_rate': poverty_rate,
+        'historical_donations': historical_donations,
+        'historical_requests': historical_requests,
+        'monetary_donations': monetary_donations,
+        'population': population,
+        'need_score': need_score,
+    })
+
+def create_synthetic_dataset(
+    n_samples: int = SYNTHETIC_SAMPLES,
+    seed: int = SYNTHETIC_SEED,
+    chunk_size: int = SYNTHETIC_CHUNK_SIZE
+) -> Path:
     """
     Create synthetic training data if no real data available
+    
+    Rows are generated and written chunk_size at a time, so memory stays
+    bounded for millions of samples. Together they replace the whole
+    dataset, however few months they cover. The output only depends on
+    seed, n_samples and chunk_size.
+    
+    Returns:
+        path of the written training data
     """
-    print("Creating synthetic training dataset...")
-    
-    np.random.seed(42)
-    n_samples = 1000
-    
-    data = []
-    for _ in range(n_samples):
-        lat = np.random.uniform(25, 50)  # US latitude range
-        lng = np.random.uniform(-125, -65)  # US longitude range
-        month = np.random.randint(1, 13)
-        season = get_season(month)
-        
-        # Synthetic features
-        food_insecurity_rate = np.random.uniform(0.05, 0.25)
-        poverty_rate = food_insecurity_rate * np.random.uniform(1.1, 1.5)
-        historical_donations = np.random.poisson(5)
-        historical_requests = np.random.poisson(8)
-        population = np.random.randint(500, 50000)
-        
-        # Calculate need score (target)
-        seasonal_multiplier = {'winter': 1.3, 'fall': 1.2, 'spring': 1.0, 'summer': 0.9}[season]
-        donation_factor = max(0.1, 1 - (historical_donations / 20))
-        
-        need_score = min(1.0, (
-            food_insecurity_rate * 0.4 +
-            poverty_rate * 0.3 +
-            donation_factor * 0.2 +
-            min(1, population / 10000) * 0.1
-        ) * seasonal_multiplier)
-        
-        data.append({
-            'latitude': lat,
-            'longitude': lng,
-            'month': month,
-            'season': season,
-            'food_insecurity_rate': food_insecurity_rate,
-            'poverty_rate': poverty_rate,
-            'historical_donations': historical_donations,
-            'historical_requests': historical_requests,
-            'monetary_donations': np.random.poisson(3),
-            'population': population,
-            'need_score': need_score,
-        })
+    print(f"Creating synthetic training dataset ({n_samples:,} samples)...")
+    
+    rng = np.random.default_rng(seed)
+    chunks = (
+        generate_synthetic_chunk(rng, min(chunk_size, n_samples - start))
+        for start in range(0, n_samples, chunk_size)
+    )
+    # Synthetic rows are dated the year they are generated
+    output_path = replace_training_data(chunks, year=datetime.now().year)
     
-    df = pd.DataFrame(data)
-    output_path = DATA_DIR / "training_data.csv"
-    df.to_csv(output_path, index=False)
     print(f"Synthetic dataset saved to: {output_path}")
-    return df
+    return output_path
 
 if __name__ == "__main__":
     print("Data Collection Script")
     print("=" * 50)
-    df = create_training_dataset()
+    create_training_dataset()
     print("\nData collection complete!")
 
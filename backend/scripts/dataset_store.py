@@ -0,0 +1,318 @@
+"""
+Partitioned columnar store for the training dataset
+
+Training rows are stored as Parquet under data/training_data/, partitioned
+by year and month (year=2025/month=1/part-*.parquet), with compact dtypes.
+Writes either replace the whole dataset (built in a new directory that then
+takes the old one's place, so no partition of a previous run survives) or
+append files to it, and reads can project columns, prune partitions and
+stream batches. CSV remains available as an export (and is still read if
+no dataset has been written yet).
+
+Requires pyarrow; without it the store falls back to data/training_data.csv.
+
+Usage:
+    python scripts/dataset_store.py export [csv_path]
+"""
+
+import os
+import shutil
+import sys
+import uuid
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+DATASET_DIR = DATA_DIR / "training_data"
+CSV_PATH = DATA_DIR / "training_data.csv"
+
+# Stored dtype of every training column
+COLUMN_DTYPES = {
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'month': 'int8',
+    'season': 'category',
+    'food_insecurity_rate': 'float32',
+    'poverty_rate': 'float32',
+    'historical_donations': 'int16',
+    'historical_requests': 'int16',
+    'monetary_donations': 'int16',
+    'population': 'int32',
+    'need_score': 'float32',
+}
+
+PARTITION_COLUMNS = ['year', 'month']
+
+
+def _partitioning():
+    return ds.partitioning(
+        pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive'
+    )
+
+
+def _partition_filter(years, months):
+    filter = None
+    if years is not None:
+        filter = ds.field('year').isin(list(years))
+    if months is not None:
+        month_filter = ds.field('month').isin(list(months))
+        filter = month_filter if filter is None else filter & month_filter
+    return filter
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast training columns to their stored dtypes
+
+    Raises:
+        ValueError: if an integer column has values outside its dtype's range
+    """
+    df = df.copy()
+    for col, dtype in COLUMN_DTYPES.items():
+        if col not in df:
+            continue
+        if dtype.startswith('int'):
+            info = np.iinfo(dtype)
+            values = df[col]
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                raise ValueError(f"Column '{col}' does not fit in {dtype}")
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def _prepare(df: pd.DataFrame, year: Optional[int]) -> pd.DataFrame:
+    """
+    Compact rows and set their partition year
+
+    Raises:
+        ValueError: if the rows have no 'year' column and no year is given
+    """
+    df = compact(df)
+    if 'year' not in df:
+        if year is None:
+            raise ValueError("Training rows need a 'year' column or an explicit year")
+        df['year'] = year
+    df['year'] = df['year'].astype('int16')
+    return df
+
+
+def _write_parquet(df: pd.DataFrame, directory: Path):
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        directory,
+        format='parquet',
+        partitioning=_partitioning(),
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+def _swap_in(staging: Path, target: Path):
+    """Move staging (a file or directory) to target, removing what was there"""
+    old = None
+    if target.exists():
+        old = target.with_name(f"{target.name}.old-{uuid.uuid4().hex}")
+        os.replace(target, old)
+    os.replace(staging, target)
+    if old is not None:
+        if old.is_dir():
+            shutil.rmtree(old)
+        else:
+            old.unlink()
+
+
+def replace_training_data(frames: Iterable[pd.DataFrame], year: Optional[int] = None) -> Path:
+    """
+    Replace the whole dataset with the rows of frames
+
+    The rows are written to a new directory next to the dataset, which then
+    takes the old one's place: no partition of the previous dataset
+    survives, even one the new rows don't cover, and a failed write leaves
+    the previous dataset as it was.
+
+    Args:
+        frames: training rows (the columns in COLUMN_DTYPES), e.g. chunks of
+            a dataset too large to hold in memory
+        year: partition year for rows without a 'year' column
+
+    Returns:
+        path of the dataset (or of the CSV file without pyarrow)
+
+    Raises:
+        ValueError: if rows have no 'year' column and no year is given
+    """
+    tag = uuid.uuid4().hex
+    if not PYARROW_AVAILABLE:
+        print("Warning: pyarrow not installed. Writing training data as CSV.")
+        staging = CSV_PATH.with_name(f"{CSV_PATH.stem}.tmp-{tag}.csv")
+        try:
+            pd.DataFrame(columns=list(COLUMN_DTYPES)).to_csv(staging, index=False)
+            for df in frames:
+                _prepare(df, year).drop(columns='year')[list(COLUMN_DTYPES)].to_csv(
+                    staging, mode='a', header=False, index=False
+                )
+        except BaseException:
+            staging.unlink(missing_ok=True)
+            raise
+        _swap_in(staging, CSV_PATH)
+        return CSV_PATH
+
+    staging = DATASET_DIR.with_name(f"{DATASET_DIR.name}.tmp-{tag}")
+    staging.mkdir(parents=True)
+    try:
+        for df in frames:
+            _write_parquet(_prepare(df, year), staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _swap_in(staging, DATASET_DIR)
+    return DATASET_DIR
+
+
+def write_training_data(df: pd.DataFrame, year: Optional[int] = None, replace: bool = True) -> Path:
+    """
+    Write training rows to the partitioned dataset
+
+    Args:
+        df: training rows (the columns in COLUMN_DTYPES)
+        year: partition year for rows without a 'year' column
+        replace: replace the whole dataset (see replace_training_data);
+            False appends new files alongside the existing ones
+
+    Returns:
+        path of the dataset (or of the CSV file without pyarrow)
+
+    Raises:
+        ValueError: if the rows have no 'year' column and no year is given
+    """
+    if replace:
+        return replace_training_data([df], year)
+
+    df = _prepare(df, year)
+    if not PYARROW_AVAILABLE:
+        print("Warning: pyarrow not installed. Writing training data as CSV.")
+        append = CSV_PATH.exists()
+        df.drop(columns='year')[list(COLUMN_DTYPES)].to_csv(
+            CSV_PATH, mode='a' if append else 'w', header=not append, index=False
+        )
+        return CSV_PATH
+
+    _write_parquet(df, DATASET_DIR)
+    return DATASET_DIR
+
+
+def load_training_data(
+    columns: Optional[list] = None,
+    years: Optional[Iterable[int]] = None,
+    months: Optional[Iterable[int]] = None,
+) -> pd.DataFrame:
+    """
+    Load training rows
+
+    Args:
+        columns: columns to read (default: all, including 'year')
+        years, months: only read these partitions
+
+    Returns:
+        DataFrame with compact dtypes
+
+    Raises:
+        FileNotFoundError: if neither the dataset nor the CSV file exists
+    """
+    if not (PYARROW_AVAILABLE and DATASET_DIR.exists()):
+        return _load_csv(columns, years, months)
+
+    dataset = ds.dataset(DATASET_DIR, format='parquet', partitioning=_partitioning())
+    df = dataset.to_table(columns=columns, filter=_partition_filter(years, months)).to_pandas()
+    if 'season' in df:
+        df['season'] = df['season'].astype('category')
+    return df
+
+
+def iter_training_batches(
+    columns: Optional[list] = None,
+    batch_rows: int = 250_000,
+    years: Optional[Iterable[int]] = None,
+    months: Optional[Iterable[int]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream training rows in batches of at most batch_rows
+
+    Only one batch (plus one read ahead) is held in memory at a time. The
+    batches are the same, in the same order, on every pass over an
+    unchanged dataset.
+
+    Args:
+        columns, years, months: as for load_training_data
+        batch_rows: maximum rows per batch
+
+    Yields:
+        DataFrames with compact dtypes
+
+    Raises:
+        FileNotFoundError: if neither the dataset nor the CSV file exists
+    """
+    if not (PYARROW_AVAILABLE and DATASET_DIR.exists()):
+        if not CSV_PATH.exists():
+            raise FileNotFoundError(f"Training data not found: {DATASET_DIR} or {CSV_PATH}")
+        if years is not None:
+            raise ValueError("The CSV training data has no year partitions")
+        for chunk in pd.read_csv(CSV_PATH, chunksize=batch_rows):
+            if months is not None:
+                chunk = chunk[chunk['month'].isin(list(months))].reset_index(drop=True)
+            chunk = compact(chunk)
+            yield chunk[columns] if columns is not None else chunk
+        return
+
+    dataset = ds.dataset(DATASET_DIR, format='parquet', partitioning=_partitioning())
+    batches = dataset.to_batches(
+        columns=columns,
+        filter=_partition_filter(years, months),
+        batch_size=batch_rows,
+        batch_readahead=1,
+        fragment_readahead=1,
+    )
+    for batch in batches:
+        if batch.num_rows:
+            df = batch.to_pandas()
+            if 'season' in df:
+                df['season'] = df['season'].astype('category')
+            yield df
+
+
+def _load_csv(columns, years, months) -> pd.DataFrame:
+    if not CSV_PATH.exists():
+        raise FileNotFoundError(f"Training data not found: {DATASET_DIR} or {CSV_PATH}")
+    if years is not None:
+        raise ValueError("The CSV training data has no year partitions")
+
+    usecols = None if columns is None else list(set(columns) | ({'month'} if months else set()))
+    df = compact(pd.read_csv(CSV_PATH, usecols=usecols))
+    if months is not None:
+        df = df[df['month'].isin(list(months))].reset_index(drop=True)
+    return df[columns] if columns is not None else df
+
+
+def export_csv(path: Path = CSV_PATH, **filters) -> Path:
+    """Write the (optionally filtered) dataset to a single CSV file"""
+    df = load_training_data(**filters)
+    df.to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'export':
+        print(__doc__)
+        sys.exit(1)
+    path = export_csv(Path(sys.argv[2]) if len(sys.argv) > 2 else CSV_PATH)
+    print(f"Training data exported to: {path}")
@@ -4,6 +4,7 @@ This script downloads food security statistics from USDA ERS website
 """
 
 import requests
+import numpy as np
 import pandas as pd
 import os
 from pathlib import Path
@@ -13,6 +14,41 @@ import time
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
+# Census county centroids (Gazetteer file, e.g. 2023_Gaz_counties_national.txt)
+# from https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html
+GAZETTEER_GLOB = "*Gaz_counties*"
+
+# State name and approximate geographic center, by postal abbreviation
+STATE_CENTROIDS = {
+    'AL': ('Alabama', 32.80, -86.79), 'AK': ('Alaska', 64.20, -152.49),
+    'AZ': ('Arizona', 34.05, -111.09), 'AR': ('Arkansas', 34.80, -92.20),
+    'CA': ('California', 36.78, -119.42), 'CO': ('Colorado', 39.55, -105.78),
+    'CT': ('Connecticut', 41.60, -72.70), 'DE': ('Delaware', 38.91, -75.53),
+    'DC': ('District of Columbia', 38.90, -77.03), 'FL': ('Florida', 27.99, -81.76),
+    'GA': ('Georgia', 32.17, -82.90), 'HI': ('Hawaii', 20.80, -156.33),
+    'ID': ('Idaho', 44.07, -114.74), 'IL': ('Illinois', 40.63, -89.40),
+    'IN': ('Indiana', 40.27, -86.13), 'IA': ('Iowa', 41.88, -93.10),
+    'KS': ('Kansas', 39.01, -98.48), 'KY': ('Kentucky', 37.84, -84.27),
+    'LA': ('Louisiana', 30.98, -91.96), 'ME': ('Maine', 45.25, -69.45),
+    'MD': ('Maryland', 39.05, -76.64), 'MA': ('Massachusetts', 42.41, -71.38),
+    'MI': ('Michigan', 44.31, -85.60), 'MN': ('Minnesota', 46.73, -94.69),
+    'MS': ('Mississippi', 32.35, -89.40), 'MO': ('Missouri', 37.96, -91.83),
+    'MT': ('Montana', 46.88, -110.36), 'NE': ('Nebraska', 41.49, -99.90),
+    'NV': ('Nevada', 38.80, -116.42), 'NH': ('New Hampshire', 43.19, -71.57),
+    'NJ': ('New Jersey', 40.06, -74.41), 'NM': ('New Mexico', 34.52, -105.87),
+    'NY': ('New York', 42.97, -75.53), 'NC': ('North Carolina', 35.76, -79.02),
+    'ND': ('North Dakota', 47.55, -101.00), 'OH': ('Ohio', 40.42, -82.91),
+    'OK': ('Oklahoma', 35.01, -97.09), 'OR': ('Oregon', 43.80, -120.55),
+    'PA': ('Pennsylvania', 41.20, -77.19), 'RI': ('Rhode Island', 41.58, -71.48),
+    'SC': ('South Carolina', 33.84, -81.16), 'SD': ('South Dakota', 43.97, -99.90),
+    'TN': ('Tennessee', 35.52, -86.58), 'TX': ('Texas', 31.97, -99.90),
+    'UT': ('Utah', 39.32, -111.09), 'VT': ('Vermont', 44.56, -72.58),
+    'VA': ('Virginia', 37.43, -78.66), 'WA': ('Washington', 47.75, -120.74),
+    'WV': ('West Virginia', 38.60, -80.45), 'WI': ('Wisconsin', 43.78, -88.79),
+    'WY': ('Wyoming', 43.08, -107.29), 'PR': ('Puerto Rico', 18.22, -66.59),
+}
+STATE_ABBREVIATIONS = {name.lower(): abbr for abbr, (name, _, _) in STATE_CENTROIDS.items()}
+
 def download_usda_food_security_data():
     """
     Download USDA food security data
@@ -41,9 +77,75 @@ def download_usda_food_security_data():
     #         f.write(response.content)
     #     print(f"Downloaded: {filename}")
 
+def _find_column(columns: list, *patterns, exclude=()) -> str:
+    """First column whose lowercased name contains all of a pattern's words"""
+    for pattern in patterns:
+        for column in columns:
+            name = str(column).lower()
+            if all(word in name for word in pattern.split()) and not any(word in name for word in exclude):
+                return column
+    return None
+
+def _parse_rates(values: pd.Series) -> pd.Series:
+    """Rates as 0-1 fractions, from fractions, percentages or '12.3%' strings"""
+    rates = pd.to_numeric(values.astype(str).str.replace('%', '').str.strip(), errors='coerce')
+    if rates.max() > 1:
+        rates = (rates / 100).round(6)
+    return rates
+
+def standardize_usda_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Standardize a food insecurity table to one row per region
+    
+    Recognizes state tables (a state name or abbreviation column) and county
+    tables (a FIPS code column), with the rate in a column named like
+    "food insecurity rate" / "percent food insecure". Only the latest year
+    of each region is kept.
+    
+    Returns:
+        DataFrame with level ('state'/'county'), state, county_fips,
+        food_insecurity_rate (0-1) and year
+    
+    Raises:
+        ValueError: if the rate or region columns cannot be found
+    """
+    columns = list(df.columns)
+    rate_col = _find_column(
+        columns, 'insecur rate', 'insecur percent', 'insecur pct', 'insecur %', 'insecur',
+        exclude=('number', 'count', 'persons', 'households', 'margin', 'error', 'low', 'very'),
+    )
+    fips_col = _find_column(columns, 'fips', 'geoid')
+    state_col = _find_column(columns, 'state abbr', 'state', exclude=('fips',))
+    year_col = _find_column(columns, 'year')
+    if rate_col is None or (fips_col is None and state_col is None):
+        raise ValueError(f"No food insecurity rate/region columns in {columns}")
+    
+    result = pd.DataFrame({
+        'food_insecurity_rate': _parse_rates(df[rate_col]),
+        'year': pd.to_numeric(df[year_col], errors='coerce') if year_col else np.nan,
+    })
+    if fips_col is not None:
+        fips = pd.to_numeric(df[fips_col], errors='coerce')
+        result['level'] = 'county'
+        result['county_fips'] = fips
+        # County tables often carry state totals as FIPS SS000 rows
+        result = result[fips.notna() & (fips % 1000 != 0)]
+        result['county_fips'] = result['county_fips'].astype(np.int64)
+        result['state'] = None
+    else:
+        names = df[state_col].astype(str).str.strip()
+        result['level'] = 'state'
+        result['county_fips'] = None
+        result['state'] = names.where(names.str.len() == 2, names.str.lower().map(STATE_ABBREVIATIONS)).str.upper()
+        result = result[result['state'].isin(list(STATE_CENTROIDS))]
+    
+    key = 'county_fips' if fips_col is not None else 'state'
+    result = result[result['food_insecurity_rate'].notna()]
+    return result.sort_values('year').drop_duplicates(key, keep='last').reset_index(drop=True)
+
 def process_usda_data(filepath):
     """
-    Process downloaded USDA CSV file
+    Load a downloaded USDA CSV file, standardized (see standardize_usda_data)
     """
     if not os.path.exists(filepath):
         print(f"File not found: {filepath}")
@@ -53,14 +155,73 @@ def process_usda_data(filepath):
         df = pd.read_csv(filepath)
         print(f"Loaded {len(df)} rows from {filepath}")
         
-        # Standardize column names (adjust based on actual CSV structure)
-        # Typical columns: State, County, Food_Insecurity_Rate, Year, etc.
-        
-        return df
+        return standardize_usda_data(df)
     except Exception as e:
         print(f"Error processing file: {e}")
         return None
 
+def load_county_centroids(filepath) -> dict:
+    """
+    County centroids from a Census Gazetteer file
+    
+    Returns:
+        dict of county FIPS code to (name, latitude, longitude)
+    """
+    df = pd.read_csv(filepath, sep='\t', dtype={'GEOID': str})
+    df.columns = [column.strip() for column in df.columns]
+    return {
+        int(geoid): (f"{name}, {usps}", float(lat), float(lng))
+        for geoid, name, usps, lat, lng in zip(df['GEOID'], df['NAME'], df['USPS'], df['INTPTLAT'], df['INTPTLONG'])
+    }
+
+def usda_regions(tables: list, county_centroids: dict = None) -> list:
+    """
+    Regions with a rate and a centroid, for models/regional_rates.py
+    
+    Counties are used where a county table and their centroids are
+    available. A state's own rate is only dropped once most of its counties
+    (per the Gazetteer) have one, so partial county tables don't leave the
+    rest of the state with a neighbour's rate.
+    
+    Args:
+        tables: standardized tables (process_usda_data)
+        county_centroids: load_county_centroids output
+    
+    Returns:
+        list of dicts with name, level, latitude, longitude,
+        food_insecurity_rate and year
+    """
+    county_centroids = county_centroids or {}
+    regions = []
+    counties_with_rates = {}
+    states = {}
+    for table in tables:
+        for row in table.itertuples(index=False):
+            year = None if pd.isna(row.year) else int(row.year)
+            if row.level == 'county':
+                if row.county_fips not in county_centroids:
+                    continue
+                name, lat, lng = county_centroids[row.county_fips]
+                regions.append({'name': name, 'level': 'county', 'latitude': lat, 'longitude': lng,
+                                'food_insecurity_rate': float(row.food_insecurity_rate), 'year': year})
+                abbr = name.rsplit(', ', 1)[-1]
+                counties_with_rates[abbr] = counties_with_rates.get(abbr, 0) + 1
+            else:
+                states[row.state] = (float(row.food_insecurity_rate), year)
+    
+    counties_by_state = {}
+    for name, _, _ in county_centroids.values():
+        abbr = name.rsplit(', ', 1)[-1]
+        counties_by_state[abbr] = counties_by_state.get(abbr, 0) + 1
+    
+    for abbr, (rate, year) in sorted(states.items()):
+        covered = counties_with_rates.get(abbr, 0)
+        if not covered or covered < 0.9 * counties_by_state.get(abbr, 0):
+            name, lat, lng = STATE_CENTROIDS[abbr]
+            regions.append({'name': name, 'level': 'state', 'latitude': lat, 'longitude': lng,
+                            'food_insecurity_rate': rate, 'year': year})
+    return regions
+
 if __name__ == "__main__":
     download_usda_food_security_data()
     
@@ -71,6 +232,8 @@ if __name__ == "__main__":
             print(f"\nProcessing: {csv_file.name}")
             df = process_usda_data(csv_file)
             if df is not None:
-                print(f"Columns: {df.columns.tolist()}")
-                print(f"Shape: {df.shape}")
+                print(f"{len(df)} {df['level'].iloc[0] if len(df) else ''} rates, "
+                      f"years {df['year'].min()}-{df['year'].max()}")
+    print("\nBuild the lookup used by training and the API with:")
+    print("  python scripts/build_regional_rates.py")
 
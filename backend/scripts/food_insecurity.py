@@ -0,0 +1,198 @@
+"""
+Food insecurity rate estimation for training locations
+
+Rates come from the Gemini API (when GEMINI_API_KEY is set). Each location
+is requested at most once: coordinates are rounded, deduplicated, looked up
+in a JSON cache on disk, and only the misses are fetched, concurrently, over
+a shared keep-alive session that retries throttled and failed calls with
+exponential backoff.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+DEFAULT_GEMINI_API_URL = (
+    "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+)
+
+# Rate used when there is no API key or a location cannot be estimated
+DEFAULT_FOOD_INSECURITY_RATE = 0.12
+
+PROMPT = (
+    "Based on coordinates ({lat}, {lng}), estimate the food insecurity rate (0-1 scale). "
+    "Consider geographic location, urban/rural status, and regional patterns. "
+    "Return ONLY a number between 0 and 1."
+)
+
+
+def parse_rate(data: dict) -> float:
+    """
+    Extract the rate from a generateContent response
+
+    Raises:
+        ValueError: if the response text is not a number
+    """
+    text = data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '0.12')
+    rate = float(text.strip().replace('%', ''))
+    if rate > 1:
+        rate = rate / 100
+    return max(0, min(1, rate))
+
+
+class FoodInsecurityEstimator:
+    """
+    Deduplicating, disk-cached, concurrent food insecurity rate estimator
+
+    Settings default to environment variables:
+        GEMINI_API_KEY, GEMINI_API_URL (point at a stub server for local runs),
+        FOOD_INSECURITY_CACHE_PATH, FOOD_INSECURITY_WORKERS,
+        FOOD_INSECURITY_RETRIES, FOOD_INSECURITY_TIMEOUT,
+        FOOD_INSECURITY_PRECISION (decimal places coordinates are rounded to)
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_url: Optional[str] = None,
+        cache_path: Optional[Path] = None,
+        workers: Optional[int] = None,
+        retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+        precision: Optional[int] = None,
+        backoff: float = 0.5,
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv('GEMINI_API_KEY')
+        self.api_url = api_url or os.getenv('GEMINI_API_URL', DEFAULT_GEMINI_API_URL)
+        self.cache_path = Path(cache_path or os.getenv(
+            'FOOD_INSECURITY_CACHE_PATH', DATA_DIR / "food_insecurity_cache.json"
+        ))
+        self.workers = workers or int(os.getenv('FOOD_INSECURITY_WORKERS', '8'))
+        self.timeout = timeout or float(os.getenv('FOOD_INSECURITY_TIMEOUT', '10'))
+        self.precision = precision if precision is not None else int(
+            os.getenv('FOOD_INSECURITY_PRECISION', '2')
+        )
+        retries = retries if retries is not None else int(os.getenv('FOOD_INSECURITY_RETRIES', '3'))
+
+        # One keep-alive connection per worker; urllib3 retries connection
+        # errors, 429 and 5xx with exponential backoff (honoring Retry-After)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.workers,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['POST'],
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._cache = self._load_cache()
+        self._lock = threading.Lock()
+        self.requests_made = 0
+
+    def key(self, lat: float, lng: float) -> str:
+        return f"{lat:.{self.precision}f},{lng:.{self.precision}f}"
+
+    def _load_cache(self) -> dict:
+        if not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable food insecurity cache {self.cache_path}: {e}")
+            return {}
+
+    def save_cache(self):
+        """Write the cache atomically (temp file + rename)"""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with self._lock:
+            cache = dict(self._cache)
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _fetch(self, key: str) -> Optional[float]:
+        """Request one location's rate, or None if it could not be estimated"""
+        lat, lng = key.split(',')
+        with self._lock:
+            self.requests_made += 1
+        try:
+            response = self.session.post(
+                self.api_url,
+                params={'key': self.api_key},
+                json={
+                    "contents": [{
+                        "parts": [{
+                            "text": PROMPT.format(lat=lat, lng=lng)
+                        }]
+                    }]
+                },
+                timeout=self.timeout
+            )
+            if response.ok:
+                return parse_rate(response.json())
+            print(f"Error estimating food insecurity for ({key}): HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Error estimating food insecurity for ({key}): {e}")
+        return None
+
+    def estimate_many(self, coordinates: Iterable) -> list:
+        """
+        Estimate rates for (lat, lng) pairs
+
+        Args:
+            coordinates: iterable of (lat, lng) pairs, duplicates allowed
+
+        Returns:
+            list of rates, one per input pair
+        """
+        keys = [self.key(lat, lng) for lat, lng in coordinates]
+        if not self.api_key:
+            return [DEFAULT_FOOD_INSECURITY_RATE] * len(keys)
+
+        with self._lock:
+            missing = sorted({key for key in keys if key not in self._cache})
+
+        if missing:
+            print(f"Estimating food insecurity for {len(missing)} locations "
+                  f"({len(set(keys)) - len(missing)} cached)...")
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                rates = list(executor.map(self._fetch, missing))
+            with self._lock:
+                for key, rate in zip(missing, rates):
+                    # Failures are not cached so the next run retries them
+                    if rate is not None:
+                        self._cache[key] = rate
+            self.save_cache()
+
+        with self._lock:
+            return [self._cache.get(key, DEFAULT_FOOD_INSECURITY_RATE) for key in keys]
+
+    def estimate(self, lat: float, lng: float) -> float:
+        return self.estimate_many([(lat, lng)])[0]
+
+
+_estimator = None
+
+def get_estimator() -> FoodInsecurityEstimator:
+    """Process-wide estimator, created on first use (after .env is loaded)"""
+    global _estimator
+    if _estimator is None:
+        _estimator = FoodInsecurityEstimator()
+    return _estimator
@@ -0,0 +1,233 @@
+"""
+Budgeted hyperparameter search with successive halving
+
+Random configurations of every candidate model family are first trained on
+a small sample of the training rows with a fraction of their trees. Each
+rung keeps the best 1/eta of the configurations (by R² on a validation
+split) and gives them eta times more rows and trees, until the survivors
+run at full size. No new trials start once the wall-clock budget is spent;
+the budget is a soft limit, since trials already running are allowed to
+finish (at most one per worker, so a search can overshoot by one trial).
+
+Every trial is appended to models/search_trials.jsonl as it finishes.
+
+Usage:
+    python scripts/train_model.py --search
+"""
+
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from joblib import Parallel, delayed, parallel_config
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.train_model import (
+    MODELS_DIR,
+    TRAIN_CORES_PER_MODEL,
+    TRAIN_N_JOBS,
+    candidate_models,
+    fit_and_predict,
+    split_rows,
+)
+
+# Wall-clock budget for the whole search, in seconds. Soft: trials running
+# at the deadline still finish, so the search can overshoot by one trial
+SEARCH_BUDGET = float(os.getenv('TRAIN_SEARCH_BUDGET', '600'))
+# Fraction of configurations promoted per rung is 1/SEARCH_ETA
+SEARCH_ETA = int(os.getenv('TRAIN_SEARCH_ETA', '3'))
+# Rungs before full size; SEARCH_ETA ** SEARCH_RUNGS configurations per family
+SEARCH_RUNGS = int(os.getenv('TRAIN_SEARCH_RUNGS', '3'))
+# Smallest training sample a trial may use
+SEARCH_MIN_ROWS = 500
+TRIALS_PATH = MODELS_DIR / "search_trials.jsonl"
+
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [6, 10, 14, None],
+        'min_samples_leaf': [1, 2, 4, 8],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    },
+    'gradient_boosting': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [3, 4, 5, 6],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'subsample': [0.7, 0.85, 1.0],
+    },
+    'xgboost': {
+        'n_estimators': [100, 200, 400, 800],
+        'max_depth': [3, 4, 5, 6, 8],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'subsample': [0.7, 0.85, 1.0],
+        'colsample_bytree': [0.7, 0.85, 1.0],
+        'min_child_weight': [1, 3, 5],
+    },
+}
+
+
+def sample_configs(space: dict, n: int, rng: np.random.Generator) -> list:
+    """Up to n distinct random configurations from a search space"""
+    configs = []
+    seen = set()
+    for _ in range(n * 20):
+        if len(configs) == n:
+            break
+        config = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def _scaled(config: dict, fraction: float) -> dict:
+    """The configuration with its tree count scaled down to the rung size"""
+    return dict(config, n_estimators=max(10, round(config['n_estimators'] * fraction)))
+
+
+def _record(trial: dict):
+    TRIALS_PATH.parent.mkdir(exist_ok=True)
+    with open(TRIALS_PATH, 'a') as f:
+        f.write(json.dumps(trial) + "\n")
+
+
+def search_hyperparameters(
+    X, y,
+    budget: float = SEARCH_BUDGET,
+    eta: int = SEARCH_ETA,
+    rungs: int = SEARCH_RUNGS,
+    n_jobs: int = TRAIN_N_JOBS,
+    cores_per_model: int = TRAIN_CORES_PER_MODEL,
+    seed: int = 42,
+) -> dict:
+    """
+    Successive-halving search over SEARCH_SPACES
+
+    Only the training rows of split_rows are used (a fifth of them for
+    validation), so the test rows train_models reports on stay unseen.
+    All families run side by side in each rung.
+
+    Args:
+        budget: wall-clock seconds after which no new trial starts; trials
+            already running finish, so this is a soft limit
+
+    Returns:
+        dict of family name to best configuration, for the families that
+        completed at least one trial (pass to train_models(params=...))
+    """
+    start = time.perf_counter()
+    deadline = start + budget
+    run_id = uuid.uuid4().hex[:8]
+    rng = np.random.default_rng(seed)
+
+    columns = X.columns.tolist()
+    X_values = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+    y_values = np.ascontiguousarray(y.to_numpy())
+
+    # Nested row samples: every rung's rows include the previous rung's
+    train_idx, _ = split_rows(len(X))
+    train_idx = rng.permutation(train_idx)
+    n_val = len(train_idx) // 5
+    val_idx, fit_idx = train_idx[:n_val], train_idx[n_val:]
+
+    # The current fixed hyperparameters compete as the first configuration
+    models = candidate_models(cores_per_model)
+    survivors = {}
+    for family, space in SEARCH_SPACES.items():
+        defaults = models[family].get_params()
+        default = {name: defaults[name] for name in space}
+        configs = [c for c in sample_configs(space, eta ** rungs, rng) if c != default]
+        survivors[family] = [default] + configs[:eta ** rungs - 1]
+    best = {}
+    workers = max(1, n_jobs // max(1, cores_per_model))
+
+    print(f"\nSearching hyperparameters (run {run_id}, budget {budget:.0f}s, "
+          f"{eta ** rungs} configurations per model)...")
+
+    for rung in range(rungs + 1):
+        fraction = eta ** (rung - rungs)
+        # Small datasets only shrink the tree counts below SEARCH_MIN_ROWS
+        rows = fit_idx[:max(SEARCH_MIN_ROWS, round(len(fit_idx) * fraction))]
+        # Families interleaved, so a budget cut leaves each some trials
+        jobs = [
+            (family, i, configs[i])
+            for i in range(max(len(configs) for configs in survivors.values()))
+            for family, configs in survivors.items()
+            if i < len(configs)
+        ]
+        scores = {family: [] for family in survivors}
+        rung_start = time.perf_counter()
+        out_of_budget = False
+
+        with parallel_config(backend='loky', inner_max_num_threads=cores_per_model):
+            outputs = Parallel(
+                n_jobs=workers, max_nbytes='1M', mmap_mode='r', return_as='generator'
+            )(
+                delayed(fit_and_predict)(
+                    (family, i),
+                    clone(models[family]).set_params(**_scaled(config, fraction)),
+                    X_values, y_values, columns, rows, val_idx
+                )
+                for family, i, config in jobs
+            )
+            for (family, i), _, y_pred, elapsed in outputs:
+                config = survivors[family][i]
+                score = r2_score(y_values[val_idx], y_pred)
+                scores[family].append((score, i))
+                _record({
+                    'run_id': run_id,
+                    'family': family,
+                    'rung': rung,
+                    'rows': len(rows),
+                    'params': _scaled(config, fraction),
+                    'config': config,
+                    'val_r2': score,
+                    'seconds': elapsed,
+                    'finished_at': datetime.now().isoformat(),
+                })
+                if time.perf_counter() > deadline:
+                    # Stop consuming; joblib cancels the pending trials
+                    out_of_budget = True
+                    break
+
+        for family, family_scores in scores.items():
+            if family_scores:
+                top_score, top = max(family_scores)
+                best[family] = (rung, top_score, survivors[family][top])
+
+        completed = sum(len(family_scores) for family_scores in scores.values())
+        print(f"  rung {rung}: {completed}/{len(jobs)} trials on {len(rows):,} rows, "
+              f"{time.perf_counter() - rung_start:.1f}s")
+
+        # A rung costs roughly the same as the one before it (eta times
+        # fewer trials, eta times more rows and trees)
+        remaining = deadline - time.perf_counter()
+        if out_of_budget or remaining < time.perf_counter() - rung_start:
+            if rung < rungs:
+                print(f"  budget exhausted after rung {rung}")
+            break
+
+        survivors = {
+            family: [
+                survivors[family][i]
+                for _, i in sorted(family_scores, reverse=True)[:max(1, len(family_scores) // eta)]
+            ]
+            for family, family_scores in scores.items()
+            if family_scores
+        }
+
+    for family, (rung, score, config) in best.items():
+        print(f"  {family}: val R² {score:.4f} (rung {rung}) {config}")
+    print(f"Search finished in {time.perf_counter() - start:.1f}s; trials saved to {TRIALS_PATH}")
+
+    return {family: config for family, (_, _, config) in best.items()}
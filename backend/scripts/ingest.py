@@ -0,0 +1,253 @@
+"""
+Incremental ingestion of the donations/requests tables
+
+Each table is fetched in pages, selecting only the columns training uses
+plus the row id, and only rows after the persisted (created_at, id)
+high-watermark. New rows are appended to a local snapshot, so later runs
+pull just the delta.
+
+Sources are pluggable:
+- SQLSource: any SQLAlchemy URL (DATABASE_URL), e.g. Postgres or a local
+  SQLite stand-in
+- SupabaseSource: the Supabase REST API (SUPABASE_URL/SUPABASE_KEY)
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+SNAPSHOT_DIR = Path(os.getenv('INGEST_SNAPSHOT_DIR', DATA_DIR / "snapshots"))
+# Rows per request (Supabase caps responses at 1000 rows by default)
+INGEST_PAGE_SIZE = int(os.getenv('INGEST_PAGE_SIZE', '1000'))
+
+# Columns training uses from each table
+TABLE_COLUMNS = {
+    'donations': ['latitude', 'longitude', 'created_at'],
+    'requests': ['latitude', 'longitude', 'created_at'],
+    'monetary_donations': ['to_latitude', 'to_longitude', 'created_at'],
+}
+# Primary key, pulled too: rows are paged and watermarked by (created_at, id)
+ID_COLUMN = 'id'
+
+
+def _to_utc(values: pd.Series) -> pd.Series:
+    """Parse created_at values (datetimes, or ISO strings in mixed precision)"""
+    if len(values) and isinstance(values.iloc[0], str):
+        return pd.to_datetime(values, utc=True, format='ISO8601')
+    return pd.to_datetime(values, utc=True)
+
+
+def _plain(value):
+    """A numpy scalar as the Python value (for JSON and query parameters)"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+class SQLSource:
+    """
+    Reads pages through SQLAlchemy (Postgres, SQLite, ...)
+
+    fetch_page returns rows (dicts or tuples) in the order of `columns`,
+    ordered by (created_at, id) and after the `after` key if given.
+    """
+
+    def __init__(self, url: str):
+        from sqlalchemy import create_engine
+        self.engine = create_engine(url)
+
+    def fetch_page(self, table: str, columns: list, after: Optional[tuple], limit: int) -> list:
+        from sqlalchemy import DateTime, bindparam, column, select, tuple_
+        from sqlalchemy import table as sql_table
+
+        # Only the bound parameter is typed, so rows come back in the
+        # driver's native format and are parsed in bulk by pandas
+        created_at, row_id = column('created_at'), column(ID_COLUMN)
+        query = select(*[column(name) for name in columns]).select_from(sql_table(table))
+        if after is not None:
+            since, last_id = after
+            # Stored as naive UTC
+            since = bindparam('since', since.astimezone(timezone.utc).replace(tzinfo=None), type_=DateTime())
+            if last_id is None:
+                query = query.where(created_at > since)
+            else:
+                query = query.where(tuple_(created_at, row_id) > tuple_(since, bindparam('last_id', last_id)))
+        query = query.order_by(created_at, row_id).limit(limit)
+
+        with self.engine.connect() as conn:
+            return conn.execute(query).all()
+
+
+class SupabaseSource:
+    """Reads pages through the Supabase REST API"""
+
+    def __init__(self, url: str, key: str):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def fetch_page(self, table: str, columns: list, after: Optional[tuple], limit: int) -> list:
+        query = self.client.table(table).select(','.join(columns))
+        if after is not None:
+            since, last_id = after
+            if last_id is None:
+                query = query.gt('created_at', since.isoformat())
+            else:
+                # PostgREST has no row comparison: created_at > since, or equal
+                # with a larger id (quoted, as the timestamp contains ':' and '+')
+                since = '"' + since.isoformat() + '"'
+                query = query.or_(f'created_at.gt.{since},and(created_at.eq.{since},{ID_COLUMN}.gt.{last_id})')
+        return query.order('created_at').order(ID_COLUMN).limit(limit).execute().data
+
+
+def get_source():
+    """
+    Source configured in the environment: DATABASE_URL (SQLAlchemy) first,
+    then SUPABASE_URL/SUPABASE_KEY. Returns None if neither is set.
+    """
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        return SQLSource(database_url)
+
+    supabase_url = os.getenv('SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_KEY')
+    if supabase_url and supabase_key:
+        try:
+            return SupabaseSource(supabase_url, supabase_key)
+        except ImportError:
+            print("Warning: Supabase package not installed. Skipping database collection.")
+    return None
+
+
+class Snapshot:
+    """
+    Local copy of the ingested tables: one CSV per table plus a JSON file of
+    (created_at, id) high-watermarks
+
+    The watermark file also records each CSV's size after the last complete
+    append. Rows written past it (a run that crashed before updating the
+    watermark) are cut off before the next append and when loading, so the
+    re-fetched rows are never stored twice.
+    """
+
+    def __init__(self, directory: Path = SNAPSHOT_DIR):
+        self.directory = Path(directory)
+        self.watermark_path = self.directory / "watermarks.json"
+
+    def table_path(self, table: str) -> Path:
+        return self.directory / f"{table}.csv"
+
+    def watermarks(self) -> dict:
+        if not self.watermark_path.exists():
+            return {}
+        with open(self.watermark_path) as f:
+            return json.load(f)
+
+    def watermark(self, table: str) -> Optional[tuple]:
+        """(created_at, id) of the last stored row, or None before the first sync"""
+        value = self.watermarks().get(table)
+        if not value:
+            return None
+        if isinstance(value, str):
+            # Written before ids were tracked
+            return datetime.fromisoformat(value), None
+        return datetime.fromisoformat(value['created_at']), value['id']
+
+    def recover(self, table: str):
+        """Cut off rows appended after the table's last recorded complete append"""
+        path = self.table_path(table)
+        if not path.exists():
+            return
+        value = self.watermarks().get(table)
+        if value is None:
+            # The first append never completed
+            path.unlink()
+        elif isinstance(value, dict) and path.stat().st_size > value['size']:
+            print(f"Discarding {table} rows from an incomplete sync")
+            os.truncate(path, value['size'])
+
+    def append(self, table: str, rows: pd.DataFrame):
+        """
+        Append new rows, sorted by (created_at, id), then advance the
+        table's watermark to the last of them
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.recover(table)
+        last = rows.iloc[-1]
+        path = self.table_path(table)
+        if path.exists():
+            # Snapshots written before ids were tracked keep their columns
+            with open(path) as f:
+                rows = rows[f.readline().strip().split(',')]
+            header = False
+        else:
+            header = True
+        with open(path, 'a', newline='') as f:
+            rows.to_csv(f, header=header, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+
+        watermarks = self.watermarks()
+        watermarks[table] = {
+            'created_at': last['created_at'].isoformat(),
+            'id': _plain(last[ID_COLUMN]) if ID_COLUMN in last else None,
+            'size': size,
+        }
+        tmp_path = self.watermark_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(watermarks, f, indent=2)
+        os.replace(tmp_path, self.watermark_path)
+
+    def load(self, table: str) -> pd.DataFrame:
+        self.recover(table)
+        path = self.table_path(table)
+        if not path.exists():
+            return pd.DataFrame(columns=TABLE_COLUMNS[table] + [ID_COLUMN])
+        df = pd.read_csv(path)
+        df['created_at'] = _to_utc(df['created_at'])
+        return df
+
+
+def fetch_new_rows(source, table: str, after: Optional[tuple], page_size: int = INGEST_PAGE_SIZE) -> pd.DataFrame:
+    """
+    All rows of table after the (created_at, id) key `after`, fetched page by page
+
+    Pages are ordered by (created_at, id) and each query starts after the
+    previous page's last key, so rows sharing a timestamp are neither lost
+    nor duplicated at page boundaries, and no query needs an OFFSET.
+    """
+    columns = TABLE_COLUMNS[table] + [ID_COLUMN]
+    pages = []
+    while True:
+        page = source.fetch_page(table, columns, after, page_size)
+        if page:
+            page = pd.DataFrame(page, columns=columns)
+            page['created_at'] = _to_utc(page['created_at'])
+            pages.append(page)
+        if len(page) < page_size:
+            break
+        after = page['created_at'].iloc[-1].to_pydatetime(), _plain(page[ID_COLUMN].iloc[-1])
+
+    if not pages:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(pages, ignore_index=True)
+
+
+def sync_tables(source, snapshot: Optional[Snapshot] = None, page_size: int = INGEST_PAGE_SIZE) -> dict:
+    """
+    Pull new rows of every table into the snapshot
+
+    Returns:
+        dict of table name to number of new rows
+    """
+    snapshot = snapshot or Snapshot()
+    new_rows = {}
+    for table in TABLE_COLUMNS:
+        rows = fetch_new_rows(source, table, snapshot.watermark(table), page_size)
+        if len(rows):
+            snapshot.append(table, rows)
+        new_rows[table] = len(rows)
+    return new_rows
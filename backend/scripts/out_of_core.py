@@ -0,0 +1,254 @@
+"""
+Out-of-core training for datasets larger than RAM
+
+The training data is streamed from the partitioned dataset one batch at a
+time (see dataset_store.iter_training_batches). Features are computed per
+batch and handed to XGBoost through a DataIter, which builds an
+external-memory DMatrix: its pages are cached on disk and read back one at
+a time during boosting. The rows themselves are never all in memory;
+XGBoost still keeps per-row gradients, predictions and row partitions
+(roughly 150 bytes a row), about 60% of what in-memory training needs.
+
+Rows are split into train/test by a hash of their position, so every pass
+sees the same split without holding row indices in memory. Test metrics
+are accumulated batch by batch.
+
+Peak RSS is checked after every batch and boosting round; training stops
+with a MemoryError as soon as it passes TRAIN_MAX_RSS_MB.
+
+Usage:
+    python scripts/train_model.py --out-of-core
+"""
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import xgboost as xgb
+from sklearn.preprocessing import LabelEncoder
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts import dataset_store
+from scripts.train_model import (
+    FEATURE_COLUMNS,
+    TRAIN_N_JOBS,
+    TRAINING_COLUMNS,
+    candidate_models,
+    prepare_features,
+)
+
+# Rows read and featurized at a time
+TRAIN_BATCH_ROWS = int(os.getenv('TRAIN_BATCH_ROWS', '250000'))
+# Peak resident memory allowed while training, in MB
+TRAIN_MAX_RSS_MB = int(os.getenv('TRAIN_MAX_RSS_MB', '2048'))
+# Where XGBoost caches its external-memory pages (default: a temp directory)
+TRAIN_CACHE_DIR = os.getenv('TRAIN_CACHE_DIR')
+
+# Approximate transient memory per row of a batch: the Arrow batch, its
+# pandas conversion, the float features and XGBoost's copy of them
+BYTES_PER_BATCH_ROW = 400
+TEST_SIZE = 0.2
+SEASONS = ['winter', 'spring', 'summer', 'fall']
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def check_rss(max_rss_mb: float, where: str):
+    """
+    Raises:
+        MemoryError: if the peak RSS has passed max_rss_mb
+    """
+    peak = peak_rss_mb()
+    if peak > max_rss_mb:
+        raise MemoryError(
+            f"Peak RSS {peak:.0f} MB passed TRAIN_MAX_RSS_MB={max_rss_mb:.0f} {where}; "
+            f"lower TRAIN_BATCH_ROWS or raise the limit"
+        )
+
+
+def batch_rows_for(max_rss_mb: float, batch_rows: int = TRAIN_BATCH_ROWS) -> int:
+    """batch_rows, capped so one batch uses at most a quarter of the RSS limit"""
+    cap = int(max_rss_mb * 1024 * 1024 / 4 / BYTES_PER_BATCH_ROW)
+    return max(1000, min(batch_rows, cap))
+
+
+def test_mask(positions: np.ndarray, test_size: float = TEST_SIZE) -> np.ndarray:
+    """Whether each row (by its position in the dataset) is a test row"""
+    # Multiplicative hash of the position, mapped to [0, 1)
+    hashed = (positions.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+    return hashed.astype(np.float64) / float(1 << 24) < test_size
+
+
+def season_encoder() -> LabelEncoder:
+    """Season encoder fitted on every season, so all batches agree"""
+    le_season = LabelEncoder()
+    le_season.fit(SEASONS)
+    return le_season
+
+
+def iter_feature_batches(
+    le_season: LabelEncoder,
+    test: bool,
+    batch_rows: int,
+    max_rss_mb: float,
+    **filters
+):
+    """
+    Yield (X, y) for the train (or test) rows of each dataset batch
+
+    Args:
+        filters: years/months, as for dataset_store.load_training_data
+    """
+    position = 0
+    for df in dataset_store.iter_training_batches(TRAINING_COLUMNS, batch_rows, **filters):
+        mask = test_mask(np.arange(position, position + len(df)))
+        position += len(df)
+        rows = df[mask if test else ~mask]
+        del df
+        if len(rows):
+            X, y, _, _ = prepare_features(rows, le_season)
+            yield X, y
+        check_rss(max_rss_mb, f"after {position:,} rows")
+
+
+class TrainingBatches(xgb.DataIter):
+    """Feeds the train (or test) rows of the dataset to XGBoost batch by batch"""
+
+    def __init__(self, cache_prefix: str, le_season: LabelEncoder, test: bool,
+                 batch_rows: int, max_rss_mb: float, **filters):
+        self.args = (le_season, test, batch_rows, max_rss_mb)
+        self.filters = filters
+        self.batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self.batches = None
+
+    def next(self, input_data) -> int:
+        if self.batches is None:
+            self.batches = iter_feature_batches(*self.args, **self.filters)
+        try:
+            X, y = next(self.batches)
+        except StopIteration:
+            return 0
+        input_data(data=X, label=y)
+        return 1
+
+
+class RSSLimit(xgb.callback.TrainingCallback):
+    """Stops boosting with a MemoryError once peak RSS passes the limit"""
+
+    def __init__(self, max_rss_mb: float):
+        self.max_rss_mb = max_rss_mb
+        super().__init__()
+
+    def after_iteration(self, model, epoch, evals_log) -> bool:
+        check_rss(self.max_rss_mb, f"in boosting round {epoch}")
+        return False
+
+
+def evaluate(model, le_season: LabelEncoder, batch_rows: int, max_rss_mb: float, **filters) -> dict:
+    """Test-set metrics, accumulated batch by batch"""
+    n = 0
+    sum_y = sum_y2 = sse = sae = 0.0
+    for X, y in iter_feature_batches(le_season, True, batch_rows, max_rss_mb, **filters):
+        y = y.to_numpy(dtype=np.float64)
+        error = model.predict(X) - y
+        n += len(y)
+        sum_y += y.sum()
+        sum_y2 += (y * y).sum()
+        sse += (error * error).sum()
+        sae += np.abs(error).sum()
+
+    if n == 0:
+        raise ValueError("No test rows")
+    mse = sse / n
+    return {
+        'mae': sae / n,
+        'mse': mse,
+        'rmse': np.sqrt(mse),
+        'r2': 1 - sse / (sum_y2 - sum_y * sum_y / n),
+        'test_rows': n,
+    }
+
+
+def train_out_of_core(
+    params: Optional[dict] = None,
+    batch_rows: int = TRAIN_BATCH_ROWS,
+    max_rss_mb: float = TRAIN_MAX_RSS_MB,
+    cache_dir: Optional[str] = TRAIN_CACHE_DIR,
+    n_jobs: int = TRAIN_N_JOBS,
+    **filters
+):
+    """
+    Train the XGBoost candidate on external memory
+
+    Args:
+        params: optional hyperparameter overrides for the XGBoost candidate
+            (e.g. search_hyperparameters(...)['xgboost'])
+        batch_rows: rows per batch (capped by batch_rows_for(max_rss_mb))
+        max_rss_mb: peak RSS limit
+        cache_dir: directory for XGBoost's page cache (default: a temp
+            directory, removed afterwards)
+        filters: years/months, as for dataset_store.load_training_data
+
+    Returns:
+        (model, metrics, feature_columns, le_season), like train_models
+        plus prepare_features
+
+    Raises:
+        MemoryError: if the peak RSS passes max_rss_mb
+    """
+    start = time.perf_counter()
+    batch_rows = batch_rows_for(max_rss_mb, batch_rows)
+    le_season = season_encoder()
+    model = candidate_models(n_jobs, {'xgboost': params or {}})['xgboost']
+
+    print(f"\nTraining XGBoost out of core ({batch_rows:,} rows per batch, "
+          f"RSS limit {max_rss_mb:.0f} MB)...")
+
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    cache = tempfile.mkdtemp(prefix='xgb-cache-', dir=cache_dir)
+    try:
+        batches = TrainingBatches(
+            os.path.join(cache, 'train'), le_season, False, batch_rows, max_rss_mb, **filters
+        )
+        dtrain = xgb.DMatrix(batches)
+        print(f"  cached {dtrain.num_row():,} training rows in {time.perf_counter() - start:.1f}s")
+
+        booster_params = model.get_xgb_params()
+        booster_params['tree_method'] = 'hist'
+        booster = xgb.train(
+            booster_params, dtrain,
+            num_boost_round=model.n_estimators,
+            callbacks=[RSSLimit(max_rss_mb)],
+        )
+        del dtrain
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    metrics = evaluate(model, le_season, batch_rows, max_rss_mb, **filters)
+    metrics['model'] = model
+
+    print(f"\nxgboost (out of core, {time.perf_counter() - start:.2f}s):")
+    print(f"  MAE: {metrics['mae']:.4f}")
+    print(f"  RMSE: {metrics['rmse']:.4f}")
+    print(f"  R²: {metrics['r2']:.4f} on {metrics['test_rows']:,} test rows")
+    print(f"  Peak RSS: {peak_rss_mb():.0f} MB")
+
+    return model, metrics, FEATURE_COLUMNS, le_season
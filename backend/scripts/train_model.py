@@ -5,84 +5,131 @@ Train ML model to predict food necessity
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import joblib
-from sklearn.model_selection import train_test_split, cross_val_score
+from joblib import Parallel, delayed, parallel_config
+from sklearn.base import clone
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import xgboost as xgb
 import os
+import sys
+import time
 from dotenv import load_dotenv
 
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.bundle import save_bundle
+from models.compiled import compile_ensemble
+from models.registry import BUNDLE_PATH
+from scripts import dataset_store
+
 load_dotenv()
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 MODELS_DIR = Path(__file__).parent.parent / "models"
 MODELS_DIR.mkdir(exist_ok=True)
 
-def load_training_data():
-    """Load training data"""
-    data_path = DATA_DIR / "training_data.csv"
-    
-    if not data_path.exists():
-        raise FileNotFoundError(f"Training data not found: {data_path}")
-    
-    df = pd.read_csv(data_path)
+# Cores for training: the total budget and the threads each candidate
+# model (RandomForest/XGBoost) may use; fits run in parallel within it
+TRAIN_N_JOBS = int(os.getenv('TRAIN_N_JOBS', os.cpu_count() or 1))
+TRAIN_CORES_PER_MODEL = int(os.getenv('TRAIN_CORES_PER_MODEL', '1'))
+CV_FOLDS = 5
+
+# Columns prepare_features reads
+TRAINING_COLUMNS = [
+    'latitude',
+    'longitude',
+    'month',
+    'season',
+    'food_insecurity_rate',
+    'poverty_rate',
+    'historical_donations',
+    'historical_requests',
+    'monetary_donations',
+    'population',
+    'need_score',
+]
+
+# Model inputs, in order
+FEATURE_COLUMNS = [
+    'latitude',
+    'longitude',
+    'month',
+    'season_encoded',
+    'food_insecurity_rate',
+    'poverty_rate',
+    'historical_donations',
+    'historical_requests',
+    'monetary_donations',
+    'population',
+    'donation_ratio',
+    'donation_deficit',
+    'month_sin',
+    'month_cos',
+]
+
+def load_training_data(years=None, months=None):
+    """Load training data (optionally only some year/month partitions)"""
+    df = dataset_store.load_training_data(TRAINING_COLUMNS, years=years, months=months)
     print(f"Loaded {len(df)} training samples")
     return df
 
-def prepare_features(df: pd.DataFrame):
-    """Prepare features for training"""
-    df = df.copy()
+def prepare_features(df: pd.DataFrame, le_season: LabelEncoder = None):
+    """
+    Prepare features for training
+    
+    Only the feature columns are copied out of df, so it also works on one
+    batch at a time (see scripts/out_of_core.py).
     
+    Args:
+        le_season: fitted season encoder to reuse (default: fit one on df)
+    """
     # Encode season
-    le_season = LabelEncoder()
-    df['season_encoded'] = le_season.fit_transform(df['season'])
+    if le_season is None:
+        le_season = LabelEncoder()
+        le_season.fit(df['season'])
     
     # Feature engineering
-    df['donation_ratio'] = df['historical_donations'] / (df['historical_requests'] + 1)
-    df['donation_deficit'] = df['historical_requests'] - df['historical_donations']
-    df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-    df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-    
-    # Select features
-    feature_columns = [
-        'latitude',
-        'longitude',
-        'month',
-        'season_encoded',
-        'food_insecurity_rate',
-        'poverty_rate',
-        'historical_donations',
-        'historical_requests',
-        'monetary_donations',
-        'population',
-        'donation_ratio',
-        'donation_deficit',
-        'month_sin',
-        'month_cos',
-    ]
+    month = df['month']
+    features = {
+        'latitude': df['latitude'],
+        'longitude': df['longitude'],
+        'month': month,
+        'season_encoded': le_season.transform(df['season']),
+        'food_insecurity_rate': df['food_insecurity_rate'],
+        'poverty_rate': df['poverty_rate'],
+        'historical_donations': df['historical_donations'],
+        'historical_requests': df['historical_requests'],
+        'monetary_donations': df['monetary_donations'],
+        'population': df['population'],
+        'donation_ratio': df['historical_donations'] / (df['historical_requests'] + 1),
+        'donation_deficit': df['historical_requests'] - df['historical_donations'],
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+    }
     
-    X = df[feature_columns]
+    X = pd.DataFrame(features, index=df.index)
     y = df['need_score']
     
-    return X, y, le_season, feature_columns
+    return X, y, le_season, list(FEATURE_COLUMNS)
 
-def train_models(X, y):
-    """Train multiple models and select best"""
-    print("\nTraining models...")
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+def candidate_models(cores_per_model: int = 1, params: dict = None) -> dict:
+    """
+    Candidate models, each limited to cores_per_model threads
     
+    Args:
+        cores_per_model: threads for RandomForest/XGBoost
+        params: optional per-model hyperparameter overrides, e.g. the
+            output of scripts/hyperparameter_search.py
+    """
     models = {
         'random_forest': RandomForestRegressor(
             n_estimators=100,
             max_depth=10,
             random_state=42,
-            n_jobs=-1
+            n_jobs=cores_per_model
         ),
         'gradient_boosting': GradientBoostingRegressor(
             n_estimators=100,
@@ -93,20 +140,95 @@ def train_models(X, y):
             n_estimators=100,
             max_depth=5,
             learning_rate=0.1,
-            random_state=42
+            random_state=42,
+            n_jobs=cores_per_model
         )
     }
+    for name, overrides in (params or {}).items():
+        models[name].set_params(**overrides)
+    return models
+
+def split_rows(n: int):
+    """Train/test row indices (the same rows as train_test_split(X, y, ...))"""
+    return train_test_split(np.arange(n), test_size=0.2, random_state=42)
+
+def fit_and_predict(tag, estimator, X, y, columns, train_idx, test_idx, return_model=False):
+    """
+    Fit estimator on the train_idx rows and predict the test_idx rows
+    
+    Runs in a worker process; X and y arrive memory-mapped, only the row
+    indices are pickled. The fitted model is only sent back if
+    return_model is set.
+    
+    Returns:
+        (tag, fitted model or None, predictions, seconds)
+    """
+    start = time.perf_counter()
+    estimator.fit(pd.DataFrame(X[train_idx], columns=columns), y[train_idx])
+    y_pred = estimator.predict(pd.DataFrame(X[test_idx], columns=columns))
+    elapsed = time.perf_counter() - start
+    return tag, estimator if return_model else None, y_pred, elapsed
+
+def train_models(
+    X, y,
+    n_jobs: int = TRAIN_N_JOBS,
+    cores_per_model: int = TRAIN_CORES_PER_MODEL,
+    params: dict = None
+):
+    """
+    Train multiple models and select best
     
+    The final fit and every CV fit of every candidate run as independent
+    jobs, n_jobs // cores_per_model at a time, on one shared train/test
+    split and one shared set of CV folds.
+    
+    Args:
+        params: optional per-model hyperparameter overrides
+    """
+    print("\nTraining models...")
+    start = time.perf_counter()
+    
+    columns = X.columns.tolist()
+    X_values = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+    y_values = np.ascontiguousarray(y.to_numpy())
+    
+    # Split data (same rows as train_test_split(X, y, ...)) and CV folds
+    # (same as cross_val_score(cv=CV_FOLDS)), computed once for all models
+    train_idx, test_idx = split_rows(len(X))
+    folds = [
+        (train_idx[fold_train], train_idx[fold_test])
+        for fold_train, fold_test in KFold(CV_FOLDS).split(train_idx)
+    ]
+    
+    models = candidate_models(cores_per_model, params)
+    jobs = [(name, None, train_idx, test_idx) for name in models]
+    jobs += [(name, k, fold_train, fold_test) for k, (fold_train, fold_test) in enumerate(folds) for name in models]
+    
+    workers = max(1, n_jobs // max(1, cores_per_model))
+    with parallel_config(backend='loky', inner_max_num_threads=cores_per_model):
+        outputs = Parallel(n_jobs=workers, max_nbytes='1M', mmap_mode='r')(
+            delayed(fit_and_predict)(
+                (name, fold), clone(models[name]), X_values, y_values, columns,
+                rows_train, rows_test, return_model=fold is None
+            )
+            for name, fold, rows_train, rows_test in jobs
+        )
+    
+    fitted, predictions = {}, {}
+    cv_scores = {name: np.empty(CV_FOLDS) for name in models}
+    fit_seconds = {name: 0.0 for name in models}
+    for (name, fold), model, y_pred, elapsed in outputs:
+        fit_seconds[name] += elapsed
+        if fold is None:
+            fitted[name], predictions[name] = model, y_pred
+        else:
+            cv_scores[name][fold] = r2_score(y_values[folds[fold][1]], y_pred)
+    
+    y_test = y_values[test_idx]
     results = {}
     
-    for name, model in models.items():
-        print(f"\nTraining {name}...")
-        
-        # Train
-        model.fit(X_train, y_train)
-        
-        # Predict
-        y_pred = model.predict(X_test)
+    for name in models:
+        y_pred = predictions[name]
         
         # Evaluate
         mae = mean_absolute_error(y_test, y_pred)
@@ -114,23 +236,26 @@ def train_models(X, y):
         rmse = np.sqrt(mse)
         r2 = r2_score(y_test, y_pred)
         
-        # Cross-validation
-        cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
-        
         results[name] = {
-            'model': model,
+            'model': fitted[name],
             'mae': mae,
             'mse': mse,
             'rmse': rmse,
             'r2': r2,
-            'cv_mean': cv_scores.mean(),
-            'cv_std': cv_scores.std(),
+            'cv_mean': cv_scores[name].mean(),
+            'cv_std': cv_scores[name].std(),
         }
         
+        print(f"\n{name} ({fit_seconds[name]:.2f}s of fitting):")
         print(f"  MAE: {mae:.4f}")
         print(f"  RMSE: {rmse:.4f}")
         print(f"  R²: {r2:.4f}")
-        print(f"  CV R²: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
+        print(f"  CV R²: {cv_scores[name].mean():.4f} (+/- {cv_scores[name].std() * 2:.4f})")
+    
+    wall = time.perf_counter() - start
+    serial = sum(fit_seconds.values())
+    print(f"\nTrained {len(jobs)} fits in {wall:.2f}s wall clock "
+          f"({serial:.2f}s of fitting across {workers} workers x {cores_per_model} cores)")
     
     # Select best model (highest R²)
     best_model_name = max(results.keys(), key=lambda k: results[k]['r2'])
@@ -141,36 +266,47 @@ def train_models(X, y):
     print(f"R² Score: {results[best_model_name]['r2']:.4f}")
     print(f"{'='*50}")
     
-    return best_model, results[best_model_name], X.columns.tolist()
+    return best_model, results[best_model_name], columns
 
 def save_model(model, feature_columns, le_season, metrics):
-    """Save trained model"""
-    model_path = MODELS_DIR / "food_necessity_model.pkl"
-    metadata_path = MODELS_DIR / "model_metadata.pkl"
+    """
+    Save trained model
     
-    # Save model
-    joblib.dump(model, model_path)
-    print(f"\nModel saved to: {model_path}")
-    
-    # Save metadata
+    Writes a single bundle (see models/bundle.py) with the native model,
+    its compiled export for INFERENCE_BACKEND=compiled and the serving
+    metadata. It is renamed into place in one step, so running APIs
+    hot-reload the whole new model or nothing.
+    """
     metadata = {
-        'feature_columns': feature_columns,
-        'label_encoder_season': le_season,
-        'metrics': metrics,
+        'feature_columns': list(feature_columns),
+        'season_classes': [str(season) for season in le_season.classes_],
+        'metrics': {
+            name: float(value) for name, value in metrics.items()
+            if isinstance(value, (int, float, np.number))
+        },
         'model_version': os.getenv('MODEL_VERSION', '1.0.0'),
         'trained_at': pd.Timestamp.now().isoformat(),
     }
     
-    joblib.dump(metadata, metadata_path)
-    print(f"Metadata saved to: {metadata_path}")
+    checksum = save_bundle(BUNDLE_PATH, model, compile_ensemble(model), metadata)
+    print(f"\nModel saved to: {BUNDLE_PATH}")
+    print(f"  version {metadata['model_version']}, sha256 {checksum}")
     
-    return model_path, metadata_path
+    return BUNDLE_PATH
 
 def main():
     """Main training pipeline"""
     print("Food Necessity Prediction Model Training")
     print("=" * 50)
     
+    # Stream the dataset from disk instead (--out-of-core or TRAIN_OUT_OF_CORE=true)
+    if '--out-of-core' in sys.argv or os.getenv('TRAIN_OUT_OF_CORE', 'false').lower() in ('1', 'true', 'yes'):
+        from scripts.out_of_core import train_out_of_core
+        best_model, metrics, feature_cols, le_season = train_out_of_core()
+        save_model(best_model, feature_cols, le_season, metrics)
+        print("\nTraining complete!")
+        return
+    
     # Load data
     df = load_training_data()
     
@@ -180,11 +316,17 @@ def main():
     print(f"\nFeatures: {len(feature_columns)}")
     print(f"Target: need_score (range: {y.min():.3f} - {y.max():.3f})")
     
+    # Optionally tune hyperparameters first (--search or TRAIN_SEARCH=true)
+    params = None
+    if '--search' in sys.argv or os.getenv('TRAIN_SEARCH', 'false').lower() in ('1', 'true', 'yes'):
+        from scripts.hyperparameter_search import search_hyperparameters
+        params = search_hyperparameters(X, y)
+    
     # Train models
-    best_model, metrics, feature_cols = train_models(X, y)
+    best_model, metrics, feature_cols = train_models(X, y, params=params)
     
     # Save model
-    model_path, metadata_path = save_model(best_model, feature_cols, le_season, metrics)
+    save_model(best_model, feature_cols, le_season, metrics)
     
     print("\nTraining complete!")
     print(f"\nTo use the model:")
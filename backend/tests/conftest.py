@@ -0,0 +1,12 @@
+"""
+Shared pytest setup
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
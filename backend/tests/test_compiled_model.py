@@ -0,0 +1,47 @@
+"""
+Parity of the compiled tree ensemble (models/compiled.py) with the native models
+
+Fits every model family train_model.py can select (same hyperparameters,
+via candidate_models) and checks compile_ensemble predicts the same
+scores within the tolerances in scripts/benchmark_compiled_model.py.
+"""
+
+import numpy as np
+import pytest
+
+from models.compiled import compile_ensemble
+from scripts.benchmark_compiled_model import TOLERANCE, perturbed_rows
+from scripts.train_model import candidate_models
+
+
+@pytest.fixture(scope='module')
+def training_data():
+    # Shaped like the training features: 14 columns, a need score in [0, 1]
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 14))
+    y = 1 / (1 + np.exp(-(X[:, 0] - 0.5 * X[:, 4] + 0.25 * X[:, 7] * X[:, 9])))
+    return X, y
+
+
+@pytest.mark.parametrize('name', sorted(TOLERANCE))
+def test_compiled_matches_native(name, training_data):
+    X, y = training_data
+    model = candidate_models()[name]
+    model.fit(X, y)
+    compiled = compile_ensemble(model)
+
+    rows = perturbed_rows(X, 5000)
+    max_error = float(np.abs(model.predict(rows) - compiled.predict(rows)).max())
+    assert max_error <= TOLERANCE[name], f"{name}: max |native - compiled| = {max_error:.2e}"
+
+
+@pytest.mark.parametrize('name', sorted(TOLERANCE))
+def test_compiled_single_row_matches_batch(name, training_data):
+    X, y = training_data
+    model = candidate_models()[name]
+    model.fit(X[:500], y[:500])
+    compiled = compile_ensemble(model)
+
+    rows = perturbed_rows(X, 50, seed=1)
+    single = np.array([compiled.predict(row[None, :])[0] for row in rows])
+    np.testing.assert_array_equal(single, compiled.predict(rows))
@@ -0,0 +1,111 @@
+"""
+Replacing the partitioned training dataset (scripts/dataset_store.py) and
+dating collected rows for its year partitions (scripts/collect_data.py)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import collect_data, dataset_store
+from scripts.benchmark_dataset_store import synthetic_rows
+from scripts.collect_data import aggregate_by_location, build_training_frame
+
+
+@pytest.fixture(autouse=True)
+def dataset_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, 'DATASET_DIR', tmp_path / "training_data")
+    monkeypatch.setattr(dataset_store, 'CSV_PATH', tmp_path / "training_data.csv")
+    return tmp_path
+
+
+def partitions(df: pd.DataFrame) -> set:
+    return set(zip(df['year'].tolist(), df['month'].tolist()))
+
+
+def test_replace_drops_partitions_the_new_rows_miss():
+    dataset_store.write_training_data(synthetic_rows(2000))
+    new = synthetic_rows(100, seed=1).assign(year=2030, month=1, season='winter')
+    dataset_store.write_training_data(new)
+    assert partitions(dataset_store.load_training_data()) == {(2030, 1)}
+
+
+def test_chunked_replace_and_append():
+    chunks = [synthetic_rows(300, seed=i).drop(columns='year') for i in range(3)]
+    dataset_store.replace_training_data(iter(chunks), year=2024)
+    dataset_store.write_training_data(chunks[0], year=2025, replace=False)
+    df = dataset_store.load_training_data()
+    assert len(df) == 1200
+    assert (df['year'] == 2025).sum() == 300
+
+
+def test_failed_replace_keeps_the_previous_dataset(dataset_dir):
+    dataset_store.write_training_data(synthetic_rows(500))
+
+    def failing():
+        yield synthetic_rows(100, seed=1)
+        raise RuntimeError('interrupted')
+
+    with pytest.raises(RuntimeError):
+        dataset_store.replace_training_data(failing())
+    assert len(dataset_store.load_training_data()) == 500
+    assert [path.name for path in dataset_dir.iterdir()] == ["training_data"]
+
+
+def test_rows_need_a_year():
+    with pytest.raises(ValueError):
+        dataset_store.write_training_data(synthetic_rows(10).drop(columns='year'))
+
+
+def test_training_rows_dated_by_their_activity():
+    def events(rows):
+        return pd.DataFrame(rows, columns=['latitude', 'longitude', 'created_at']).assign(
+            created_at=lambda df: pd.to_datetime(df['created_at'], utc=True)
+        )
+
+    donations = events([
+        (40.0, -74.0, '2022-03-05'), (40.0, -74.0, '2024-03-09'), (40.0, -74.0, '2023-07-01'),
+        (35.0, -90.0, '2021-01-15'),
+    ])
+    requests = events([(35.0, -90.0, '2023-01-20')])
+    monetary = pd.DataFrame(columns=['to_latitude', 'to_longitude', 'created_at'])
+
+    df = build_training_frame(
+        aggregate_by_location(donations, 'latitude', 'longitude', 'created_at'),
+        aggregate_by_location(requests, 'latitude', 'longitude', 'created_at'),
+        aggregate_by_location(monetary, 'to_latitude', 'to_longitude', 'created_at'),
+    ).set_index(['latitude', 'longitude', 'month'])['year']
+
+    assert df[(40.0, -74.0, 3)] == 2024
+    assert df[(40.0, -74.0, 7)] == 2023
+    # No activity that month: the location's latest year
+    assert df[(40.0, -74.0, 12)] == 2024
+    assert df[(35.0, -90.0, 1)] == 2023
+    assert np.issubdtype(df.dtype, np.integer)
+
+
+def test_synthetic_dataset_replaces_every_partition():
+    # A few rows cover only some months
+    dataset_store.write_training_data(synthetic_rows(2000))
+    path = collect_data.create_synthetic_dataset(5, seed=0, chunk_size=2)
+    df = dataset_store.load_training_data()
+    assert path == dataset_store.DATASET_DIR
+    assert len(df) == 5
+    assert df['year'].nunique() == 1
+
+
+def test_training_dataset_returns_the_path_on_both_branches(monkeypatch):
+    monkeypatch.setattr(collect_data, 'collect_your_database_data', lambda: None)
+    assert collect_data.create_training_dataset() == dataset_store.DATASET_DIR
+
+    donations = pd.DataFrame({
+        'latitude': [40.0], 'longitude': [-74.0],
+        'created_at': pd.to_datetime(['2024-03-05'], utc=True),
+    })
+    monetary = pd.DataFrame(columns=['to_latitude', 'to_longitude', 'created_at'])
+    monkeypatch.setattr(collect_data, 'collect_your_database_data', lambda: {
+        'donations': donations, 'requests': donations, 'monetary_donations': monetary,
+    })
+    monkeypatch.setattr(collect_data, 'estimate_food_insecurity_rates', lambda lat, lng: np.full(len(lat), 0.1))
+    assert collect_data.create_training_dataset() == dataset_store.DATASET_DIR
+    assert partitions(dataset_store.load_training_data()) == {(2024, month) for month in range(1, 13)}
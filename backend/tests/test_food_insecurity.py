@@ -0,0 +1,37 @@
+"""
+Deduplication, error handling and caching of FoodInsecurityEstimator
+
+Runs the checks of scripts/benchmark_food_insecurity.py against its stub
+server, with fewer locations and no added latency.
+"""
+
+import pytest
+
+from scripts.benchmark_food_insecurity import run_checks, start_stub_server
+
+
+@pytest.fixture(scope='module')
+def checks(tmp_path_factory):
+    server = start_stub_server(latency=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/generateContent"
+        results, _, _, _ = run_checks(url, 30, tmp_path_factory.mktemp('food_insecurity') / "cache.json")
+    finally:
+        server.shutdown()
+    return results
+
+
+@pytest.mark.parametrize('name', [
+    'rates match the stub, defaults for failures',
+    'each location requested once',
+    'successes not retried',
+    'flaky locations retried once',
+    'broken and slow locations retried until the limit',
+    'garbage answers not retried',
+    'only successful rates cached',
+    'second run requests only the failures',
+    'unreachable server falls back to the default',
+    'no API key makes no requests',
+])
+def test_food_insecurity_estimation(checks, name):
+    assert checks[name]
@@ -0,0 +1,63 @@
+"""
+/highest-need picks up a new model with INFERENCE_EXECUTOR=process
+
+The inference workers are separate processes, so the reload that refreshes
+the cached ranking has to happen in the API process itself.
+"""
+
+import asyncio
+import json
+import shutil
+
+import pytest
+
+from api import app as api
+from api.inference import InferencePool
+from models.registry import registry
+from scripts.benchmark_metrics import call, http_scope
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    pool = InferencePool('process', workers=1)
+    monkeypatch.setattr(api, 'inference_pool', pool)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def model_copy(tmp_path, monkeypatch):
+    """Serve a copy of the trained bundle that the test can replace"""
+    bundle = tmp_path / registry.bundle_path.name
+    shutil.copy(registry.bundle_path, bundle)
+    monkeypatch.setattr(registry, 'bundle_path', bundle)
+    monkeypatch.setattr(registry, 'reload_interval', 0)
+    yield bundle
+    monkeypatch.undo()
+    registry.reload()
+
+
+def test_new_model_reaches_highest_need(process_pool, model_copy):
+    async def scenario():
+        registry.reload()
+        before = registry.generation
+
+        status, body = await call(api.app, http_scope('GET', '/highest-need'))
+        assert status == 200
+        assert api._highest_need[0][1] == before
+
+        # A new bundle (replaced by rename, like training does)
+        replacement = model_copy.with_name('replacement.bundle')
+        shutil.copy(model_copy, replacement)
+        replacement.replace(model_copy)
+
+        status, cached = await call(api.app, http_scope('GET', '/highest-need'))
+        assert status == 200 and json.loads(cached) == json.loads(body)
+        # The cache hit started the reload check; it must not fail
+        await api._reload_check
+        assert api._reload_check.exception() is None
+
+        assert registry.generation > before
+        assert api._highest_need[0][1] == registry.generation
+
+    asyncio.run(scenario())
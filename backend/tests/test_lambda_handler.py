@@ -0,0 +1,78 @@
+"""
+Per-record validation of batched (Records) events in api/lambda_handler.py
+
+A bad record must fail only itself: a 400 in its own result and its
+messageId in batchItemFailures, while the other records are still scored.
+"""
+
+import json
+
+import pytest
+
+from api import lambda_handler as handler
+
+GOOD = [
+    {'latitude': 40.7128, 'longitude': -74.0060, 'month': 6},
+    {'endpoint': 'batch', 'locations': [
+        {'latitude': 34.05, 'longitude': -118.24, 'month': 1},
+        {'latitude': 41.88, 'longitude': -87.63, 'month': 12, 'population': 5000},
+    ]},
+    {'latitude': 29.76, 'longitude': -95.37, 'month': 3},
+]
+
+BAD = [
+    {'latitude': 40.7, 'longitude': -74.0, 'month': 0},
+    {'latitude': 40.7, 'longitude': -74.0, 'month': 13},
+    {'latitude': 40.7, 'longitude': -74.0, 'month': 6.5},
+    {'latitude': 'north', 'longitude': -74.0},
+    {'latitude': 40.7, 'longitude': True},
+    {'latitude': 95.0, 'longitude': -74.0},
+    {'longitude': -74.0},
+    {'latitude': 40.7, 'longitude': -74.0, 'food_insecurity_rate': 'high'},
+    {'endpoint': 'batch', 'locations': [{'latitude': 40.7, 'longitude': -74.0}, 'not a location']},
+]
+
+
+def sqs_event(bodies: list) -> dict:
+    return {'Records': [
+        {'messageId': f'msg-{i}', 'body': body if isinstance(body, str) else json.dumps(body)}
+        for i, body in enumerate(bodies)
+    ]}
+
+
+def test_bad_records_fail_alone():
+    # Interleave the bad records, and a body that isn't JSON, with the good ones
+    bodies = [*GOOD[:1], *BAD[:5], *GOOD[1:2], '{not json', *BAD[5:], *GOOD[2:]]
+    response = handler.lambda_handler(sqs_event(bodies), None)
+    assert response['statusCode'] == 200
+
+    results = json.loads(response['body'])['results']
+    good_ids = {f'msg-{bodies.index(body)}' for body in GOOD}
+    for i, (body, result) in enumerate(zip(bodies, results)):
+        assert result['messageId'] == f'msg-{i}'
+        if result['messageId'] in good_ids:
+            alone = handler.lambda_handler({'body': json.dumps(body)}, None)
+            assert result['statusCode'] == alone['statusCode'] == 200
+            assert result['body'] == json.loads(alone['body'])
+        else:
+            assert result['statusCode'] == 400, body
+            assert result['body']['error']
+
+    failed = {failure['itemIdentifier'] for failure in response['batchItemFailures']}
+    assert failed == {f'msg-{i}' for i in range(len(bodies))} - good_ids
+
+
+@pytest.mark.parametrize('body', BAD)
+def test_invalid_request_is_400(body):
+    assert handler.lambda_handler({'body': json.dumps(body)}, None)['statusCode'] == 400
+
+
+def test_scoring_failure_fails_valid_records(monkeypatch):
+    def broken(locations):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(handler, 'predict_need_batch', broken)
+    response = handler.lambda_handler(sqs_event([GOOD[0], BAD[0]]), None)
+    results = json.loads(response['body'])['results']
+    assert [result['statusCode'] for result in results] == [500, 400]
+    assert len(response['batchItemFailures']) == 2
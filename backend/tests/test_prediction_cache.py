@@ -0,0 +1,66 @@
+"""
+Prediction cache hits equal recomputations (models/cache.py, models/predict.py)
+"""
+
+import numpy as np
+import pytest
+
+from models import predict
+from models.cache import PredictionCache
+
+rng = np.random.default_rng(0)
+LATITUDES = np.round(rng.uniform(25, 49, 50), 6) + 1e-7
+LONGITUDES = np.round(rng.uniform(-124, -67, 50), 6) + 1e-7
+
+
+def pairs(offset: float) -> list:
+    """Each location, then one offset degrees north-east of it"""
+    return [
+        {'latitude': float(lat + shift), 'longitude': float(lng + shift), 'month': 1 + i % 12}
+        for i, (lat, lng) in enumerate(zip(LATITUDES, LONGITUDES))
+        for shift in (0.0, offset)
+    ]
+
+
+# 4e-7 degrees apart: the same key at 6 decimal places
+LOCATIONS = pairs(4e-7)
+
+
+def use_cache(monkeypatch, **settings) -> PredictionCache:
+    cache = PredictionCache(**settings)
+    monkeypatch.setattr(predict, 'prediction_cache', cache)
+    return cache
+
+
+def single(location: dict) -> float:
+    return predict.predict_need(**location)['predicted_need_score']
+
+
+def test_exact_coordinates_by_default(monkeypatch):
+    use_cache(monkeypatch, max_size=0)
+    uncached = [single(location) for location in LOCATIONS]
+    uncached_batch = predict.predict_need_batch(LOCATIONS)
+
+    cache = use_cache(monkeypatch)
+    assert cache.precision is None
+    for _ in range(2):
+        assert [single(location) for location in LOCATIONS] == uncached
+    assert predict.predict_need_batch(LOCATIONS) == uncached_batch
+    # Nearby locations never share an entry
+    assert cache.stats()['size'] == len(LOCATIONS)
+
+
+@pytest.mark.parametrize('precision, offset', [(0, 0.45), (6, 4e-7)])
+def test_rounded_hit_equals_recomputation(monkeypatch, precision, offset):
+    locations = pairs(offset)
+    cache = use_cache(monkeypatch, precision=precision)
+    first = [single(location) for location in locations]
+    batch = predict.predict_need_scores(locations).tolist()
+    assert cache.hits >= len(locations) / 2
+
+    # Each score again with an empty cache, so every one is computed
+    for i, location in enumerate(locations):
+        cache.clear()
+        assert single(location) == first[i]
+        cache.clear()
+        assert predict.predict_need_scores([location]).tolist() == [batch[i]]
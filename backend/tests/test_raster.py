@@ -0,0 +1,68 @@
+"""
+Sharing the need raster (models/raster.py) across processes
+
+Jobs sent to process workers carry the raster's path, not its memory map,
+and of several processes loading the same model only one builds the file.
+"""
+
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from api.app import _raster_bbox_json
+from models.raster import RasterStore, build_raster, open_raster, parse_bounds
+from models.registry import registry
+
+BOUNDS = '40,-75,41,-73'
+RESOLUTION = 0.25
+
+
+@pytest.fixture(scope='module')
+def raster(tmp_path_factory):
+    path = tmp_path_factory.mktemp('raster') / "need_raster.bundle"
+    return build_raster(registry.get(), path, parse_bounds(BOUNDS), RESOLUTION)
+
+
+def test_bbox_job_reopens_the_raster_in_a_worker_process(raster):
+    rows, cols = raster.window(40.2, -74.8, 40.9, -73.1)
+    args = (raster.path, raster.checksum, rows, cols, 6, 1)
+    # Only the path and checksum are pickled, not the mapped codes
+    assert len(pickle.dumps(args)) < 1000
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        in_worker = executor.submit(_raster_bbox_json, *args).result()
+    assert in_worker.body == _raster_bbox_json(*args).body
+
+
+def test_open_raster_remaps_a_replaced_file(raster):
+    assert open_raster(raster.path, raster.checksum).checksum == raster.checksum
+    replaced = build_raster(registry.get(), raster.path, parse_bounds('40,-75,41,-74'), RESOLUTION)
+    reopened = open_raster(raster.path, replaced.checksum)
+    assert reopened.checksum == replaced.checksum
+    assert reopened.cols == replaced.cols
+
+
+def build_in_process(path, results):
+    store = RasterStore(path, BOUNDS, RESOLUTION)
+    store._pending = registry.get()
+    store._build_pending()
+    results.put((store.status()['built_here'], store.is_current(store.get(), registry.get())))
+
+
+def test_only_one_process_builds(tmp_path):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(target=build_in_process, args=(tmp_path / "need_raster.bundle", results))
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert sum(built for built, _ in outcomes) == 1
+    assert all(current for _, current in outcomes)